@@ -0,0 +1,137 @@
+"""
+Input discovery and output naming shared by the batch entry points.
+
+Expands files, directories and glob patterns into image paths, reads JSONL
+manifests and maps each input to its output path. cli, image_resizer and
+watch_folder all use these helpers. The module only needs the standard
+library, so importing it does not pull in OpenCV, SciPy or any other image
+dependency.
+"""
+
+import glob
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, TextIO, Tuple
+
+
+# Constants
+# Extensions picked up from input directories (the formats image_io.FORMAT_BACKENDS knows)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".jpe", ".jfif", ".png", ".bmp", ".webp", ".tif", ".tiff", ".gif"}
+
+
+def iter_input_paths(spec: str, recursive: bool = False) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Expand an input specification into image paths, lazily.
+
+    Args:
+        spec: Image file, directory or glob pattern
+        recursive: Whether to descend into subdirectories of a directory
+
+    Yields:
+        (path, root) tuples; root is the directory the path was found under
+        (for a glob pattern, its leading directories without wildcards), if any
+    """
+    if os.path.isdir(spec):
+        directories = [spec]
+        while directories:
+            directory = directories.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        if recursive:
+                            directories.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                        yield entry.path, spec
+    elif glob.has_magic(spec):
+        # Paths are kept relative to the pattern's leading non-wildcard directories
+        root = spec
+        while glob.has_magic(root):
+            root = os.path.dirname(root)
+        for path in glob.iglob(spec, recursive=True):
+            if os.path.isfile(path):
+                yield path, root or os.curdir
+    else:
+        yield spec, None
+
+
+def iter_manifest(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    """
+    Read jobs from a JSONL manifest, one JSON object per line.
+
+    Each line needs an "input" key and may set "output", "operation" and
+    "params". Lines that cannot be parsed are yielded as jobs carrying an
+    "error" key so they are reported rather than aborting the run.
+
+    Args:
+        stream: Open text stream to read lines from
+
+    Yields:
+        Job dictionaries
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict) or "input" not in job:
+                raise ValueError("manifest entries must be objects with an 'input' key")
+        except ValueError as e:
+            yield {"input": None, "error": f"Invalid manifest line {line_number}: {str(e)}"}
+            continue
+        yield job
+
+
+def output_path_for(input_path: str, output_dir: str, root: Optional[str] = None,
+                    extension: Optional[str] = None) -> str:
+    """
+    Build the output path for an input, mirroring its location under a root.
+
+    Args:
+        input_path: Path to the input image
+        output_dir: Directory outputs are written to
+        root: Directory the input was found under; its relative path is kept (optional)
+        extension: Output extension such as '.png' (defaults to the input's)
+
+    Returns:
+        Output file path
+    """
+    if root:
+        relative = os.path.relpath(input_path, root)
+    else:
+        relative = os.path.basename(input_path)
+    stem, input_extension = os.path.splitext(relative)
+    if extension and not extension.startswith("."):
+        extension = "." + extension
+    return os.path.join(output_dir, stem + (extension or input_extension or ".png"))
+
+
+def _path_digest(path: str) -> int:
+    """Return a 64-bit digest of a path."""
+    return int.from_bytes(hashlib.blake2b(path.encode("utf-8", "surrogateescape"), digest_size=8).digest(), "big")
+
+
+def claim_output(claims: Dict[int, int], output_path: str, input_path: str) -> Optional[str]:
+    """
+    Record which input writes an output path, catching two inputs that map to the same output.
+
+    Claims are kept as 64-bit digests of the output and input paths rather
+    than the paths themselves, about 120 bytes per output however long the
+    paths are (roughly 120 MB for a million outputs). Two different paths
+    sharing a digest are practically impossible (about one chance in 30
+    million for a million outputs), and would only report a false collision.
+
+    Args:
+        claims: Output digests claimed so far in this run, mapped to their input's digest (updated in place)
+        output_path: Output the input will be written to
+        input_path: Input being processed
+
+    Returns:
+        An error message if another input already writes output_path, otherwise None
+    """
+    output_key = _path_digest(os.path.normcase(os.path.abspath(output_path)))
+    input_key = _path_digest(os.path.normcase(os.path.abspath(input_path)))
+    if claims.setdefault(output_key, input_key) != input_key:
+        return f"Output {output_path} is already written by another input"
+    return None
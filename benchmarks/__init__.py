@@ -0,0 +1,7 @@
+"""
+Benchmarks for the image processing package.
+
+Run a benchmark from the repository root as a module, for example::
+
+    python -m benchmarks.contact_sheet
+"""
@@ -0,0 +1,67 @@
+"""
+Compare the contact-sheet renderer against a matplotlib grid.
+
+Both paths lay out the same filter results in a 4x3 grid and write a PNG.
+
+Usage:
+    python -m benchmarks.contact_sheet [--image images/image.jpg] [--repeats 5]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from contact_sheet import save_contact_sheet
+from filters import apply_pil_filters
+
+
+def matplotlib_grid(images, titles, path):
+    """The previous rendering path: one axes per image, laid out by matplotlib."""
+    fig = Figure(figsize=(15, 15))
+    FigureCanvasAgg(fig)
+    for i in range(12):
+        ax = fig.add_subplot(4, 3, i + 1)
+        if i < len(images):
+            ax.imshow(images[i])
+            ax.set_title(titles[i])
+        ax.axis("off")
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def best_of(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image", default="images/image.jpg")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    filtered = apply_pil_filters(args.image)
+    images = list(filtered.values())
+    titles = list(filtered.keys())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mpl_time = best_of(lambda: matplotlib_grid(images, titles, os.path.join(tmp, "grid.png")), args.repeats)
+        sheet_time = best_of(lambda: save_contact_sheet(images, os.path.join(tmp, "sheet.png"), titles, cols=3),
+                             args.repeats)
+
+    print(f"Image: {args.image} ({images[0].width}x{images[0].height}), {len(images)} results")
+    print(f"matplotlib grid: {mpl_time * 1000:8.1f} ms")
+    print(f"contact sheet:   {sheet_time * 1000:8.1f} ms")
+    print(f"speedup:         {mpl_time / sheet_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark the image decoding backends for every file in images/.
+
+For each image, every backend that can read the format is timed at full
+resolution and at 1/2, 1/4 and 1/8 scale, in RGB and BGR order. The backend
+that decode_image picks by default is marked with '*'.
+
+Usage:
+    python -m benchmarks.decode [--images images] [--repeats 5]
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from image_io import DECODERS, REDUCE_FACTORS, backends_for, decode_image
+
+
+def time_decode(path, repeats, **kwargs):
+    """Return the median decode time in milliseconds and the decoded shape."""
+    timings = []
+    shape = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        image = decode_image(path, **kwargs)
+        timings.append((time.perf_counter() - start) * 1000)
+        shape = image.shape
+    return statistics.median(timings), shape
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", default="images", help="Directory of sample images")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = sorted(p for p in glob.glob(os.path.join(args.images, "*")) if os.path.isfile(p))
+    print(f"{'file':<34} {'backend':<9} {'order':<5} " + " ".join(f"{'1/' + str(r):>10}" for r in REDUCE_FACTORS))
+
+    for path in paths:
+        default_backend = backends_for(path)[0]
+        for backend in DECODERS:
+            for color_order in ("RGB", "BGR"):
+                cells = []
+                for reduce in REDUCE_FACTORS:
+                    try:
+                        ms, _ = time_decode(path, args.repeats, reduce=reduce, color_order=color_order,
+                                            backend=backend)
+                        cells.append(f"{ms:8.2f}ms")
+                    except ValueError:
+                        cells.append(f"{'n/a':>10}")
+                marker = "*" if backend == default_backend else " "
+                print(f"{os.path.basename(path):<34} {backend + marker:<9} {color_order:<5} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
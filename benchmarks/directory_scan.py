@@ -0,0 +1,155 @@
+"""
+Compare directory size scanning with os.walk against the parallel os.scandir scanner.
+
+A synthetic tree (by default 1M small files, FILES_PER_DIRECTORY per
+directory, FANOUT subdirectories per level) is created once under --path and
+reused by later runs. Each scanner then lists the top level of the tree with
+folder totals, the way the directory inspector does:
+
+  os.walk        the os.walk + os.path.islink/exists/getsize loop that
+                 directory_inspector.get_directory_items_improved used
+  scandir-N      directory_scanner.list_directory_items with N threads
+
+Every scanner must report the same folder totals. With --drop-caches (Linux,
+root) the page, dentry and inode caches are dropped before each run, which
+approximates a cold or network filesystem; otherwise runs measure a warm
+cache, where the system call count dominates.
+
+Usage:
+    python -m benchmarks.directory_scan [--files 1000000] [--path /tmp/scan-tree] [--workers 1 8 32]
+                                        [--repeats 3] [--drop-caches] [--output directory_scan.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+from directory_scanner import list_directory_items
+
+FILES_PER_DIRECTORY = 100
+FANOUT = 10
+MARKER = ".benchmark-tree"
+
+
+def create_tree(path: str, files: int) -> None:
+    """Create a tree of files small files, unless path already holds one that size."""
+    marker = os.path.join(path, MARKER)
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if int(f.read()) == files:
+                return
+        raise ValueError(f"{path} holds a tree of another size; remove it or pick another --path")
+    if os.path.exists(path) and os.listdir(path):
+        raise ValueError(f"{path} is not empty; remove it or pick another --path")
+
+    print(f"Creating {files} files under {path}...")
+    directories = -(-files // FILES_PER_DIRECTORY)
+    created = 0
+    for index in range(directories):
+        # Directory index in base FANOUT, one path component per digit
+        digits = []
+        value = index
+        while True:
+            digits.append(str(value % FANOUT))
+            value //= FANOUT
+            if not value:
+                break
+        directory = os.path.join(path, *(f"d{digit}" for digit in reversed(digits)))
+        os.makedirs(directory, exist_ok=True)
+        for i in range(min(FILES_PER_DIRECTORY, files - created)):
+            with open(os.path.join(directory, f"f{i}.dat"), "wb") as f:
+                f.write(b"x" * ((created + i) % 4096))
+        created += min(FILES_PER_DIRECTORY, files - created)
+    with open(marker, "w") as f:
+        f.write(str(files))
+
+
+def walk_items(base_path: str) -> list:
+    """The os.walk loop of directory_inspector.get_directory_items_improved before directory_scanner."""
+    items = []
+    folder_sizes = {}
+    for root, dirs, files in os.walk(base_path, topdown=False):
+        current_dir_size = 0
+        for f in files:
+            file_path = os.path.join(root, f)
+            try:
+                if os.path.islink(file_path) and not os.path.exists(file_path):
+                    if root == base_path:
+                        items.append((f, -2, "LINK (Broken)", file_path))
+                    continue
+                file_size = os.path.getsize(file_path)
+                current_dir_size += file_size
+                if root == base_path:
+                    items.append((f, file_size, "LINK" if os.path.islink(file_path) else "FILE", file_path))
+            except OSError:
+                if root == base_path:
+                    items.append((f, -1, "FILE (Error)", file_path))
+        for d in dirs:
+            dir_path = os.path.join(root, d)
+            sub_dir_size = folder_sizes.get(dir_path, 0)
+            current_dir_size += sub_dir_size
+            if root == base_path:
+                items.append((d, sub_dir_size, "FOLDER_LINK" if os.path.islink(dir_path) else "FOLDER", dir_path))
+        folder_sizes[root] = current_dir_size
+    return items
+
+
+def drop_caches() -> None:
+    """Drop the page, dentry and inode caches (Linux, root only)."""
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", type=int, default=1_000_000, help="Number of files in the synthetic tree")
+    parser.add_argument("--path", default=os.path.join("/tmp", "directory-scan-tree"),
+                        help="Where to create (or reuse) the tree")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32],
+                        help="Thread counts to run the scandir scanner with")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--drop-caches", action="store_true",
+                        help="Drop the filesystem caches before every run (Linux, needs root)")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    create_tree(args.path, args.files)
+    scanners = [("os.walk", walk_items)]
+    scanners += [(f"scandir-{workers}", lambda path, workers=workers: list_directory_items(path, workers)[0])
+                 for workers in args.workers]
+
+    print(f"{args.files} files under {args.path}, median of {args.repeats}"
+          f"{', cold cache' if args.drop_caches else ', warm cache'}")
+    print(f"  {'scanner':<12} {'seconds':>9} {'files/s':>11} {'speedup':>8}")
+    results = []
+    reference = None
+    for name, scan in scanners:
+        timings = []
+        for _ in range(args.repeats):
+            if args.drop_caches:
+                drop_caches()
+            start = time.perf_counter()
+            items = scan(args.path)
+            timings.append(time.perf_counter() - start)
+        totals = sorted((item[0], item[1]) for item in items if item[2] == "FOLDER")
+        if reference is None:
+            reference = totals
+        elif totals != reference:
+            raise SystemExit(f"{name} reported different folder totals than os.walk")
+        seconds = statistics.median(timings)
+        speedup = results[0]["seconds"] / seconds if results else 1.0
+        results.append({"scanner": name, "seconds": round(seconds, 4),
+                        "files_per_second": round(args.files / seconds), "speedup": round(speedup, 2)})
+        print(f"  {name:<12} {seconds:>9.2f} {args.files / seconds:>11,.0f} {speedup:>7.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"files": args.files, "path": args.path, "cold_cache": args.drop_caches,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Check the quality of draft (reduced) JPEG decoding against full decoding for resizes.
+
+Each JPEG is resized to several percentages twice, the way
+image_resizer.resize_file does it: once decoded at full size, and once
+decoded reduced by image_resizer.draft_for_size. Both go through the same
+LANCZOS pass. The table shows the decode scale, the median time of each
+path, and the PSNR of the draft output against the full-decode output.
+The exit status is 1 if any PSNR falls below --min-psnr, so the check can
+be rerun after changing DRAFT_MIN_FACTOR or upgrading Pillow.
+
+Without --images, a synthetic JPEG of --megapixels is generated first
+(see benchmarks.suite.synthetic_image).
+
+Usage:
+    python -m benchmarks.draft_psnr [--images photo1.jpg photo2.jpg] [--megapixels 40]
+                                    [--percentages 50 25 10 5] [--min-psnr 40] [--repeats 3]
+                                    [--output draft_psnr.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from image_resizer import draft_for_size, load_upright, oriented_size
+
+DEFAULT_PERCENTAGES = [50, 25, 10, 5]
+DEFAULT_MIN_PSNR = 40.0
+
+
+def resize_jpeg(path, percentage, draft):
+    """Decode (optionally reduced) and resize a JPEG; return the result and the decode scale."""
+    with Image.open(path) as img:
+        width, height = (max(1, round(side * percentage / 100)) for side in oriented_size(img))
+        scale = draft_for_size(img, width, height) if draft else 1
+        load_upright(img)
+        return img.resize((width, height), Image.Resampling.LANCZOS), scale
+
+
+def timed(path, percentage, draft, repeats):
+    """Return the median time in milliseconds, the last output and its decode scale."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        resized, scale = resize_jpeg(path, percentage, draft)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), resized, scale
+
+
+def psnr(reference, image):
+    """Return the PSNR in dB of an image against a reference of the same size (inf if identical)."""
+    error = np.mean((np.asarray(reference, dtype=np.float64) - np.asarray(image, dtype=np.float64)) ** 2)
+    return float("inf") if error == 0 else 10 * np.log10(255 ** 2 / error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", nargs="+", help="JPEGs to check (default: a synthetic one)")
+    parser.add_argument("--megapixels", type=float, default=40.0, help="Size of the synthetic JPEG")
+    parser.add_argument("--percentages", type=float, nargs="+", default=DEFAULT_PERCENTAGES,
+                        help="Resize percentages to check")
+    parser.add_argument("--min-psnr", type=float, default=DEFAULT_MIN_PSNR,
+                        help="Fail if a draft output is further than this from the full decode")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = args.images
+        if not paths:
+            from benchmarks.suite import synthetic_image
+            path = os.path.join(directory, f"synthetic-{args.megapixels:g}mp.jpg")
+            print(f"Generating a {args.megapixels:g} MP JPEG...")
+            Image.fromarray(synthetic_image(args.megapixels)).save(path, quality=90)
+            paths = [path]
+
+        print(f"Draft against full decode, median of {args.repeats}, minimum PSNR {args.min_psnr:g} dB")
+        print(f"  {'image':<28} {'size':>5} {'scale':>6} {'full':>10} {'draft':>10} {'speedup':>8} {'PSNR':>10}")
+        results = []
+        failures = 0
+        for path in paths:
+            for percentage in args.percentages:
+                full_ms, full, _ = timed(path, percentage, False, args.repeats)
+                draft_ms, drafted, scale = timed(path, percentage, True, args.repeats)
+                quality = psnr(full, drafted)
+                passed = quality >= args.min_psnr
+                failures += not passed
+                results.append({"image": path, "percentage": percentage, "decode_scale": scale,
+                                "full_ms": round(full_ms, 3), "draft_ms": round(draft_ms, 3),
+                                "psnr": None if quality == float("inf") else round(quality, 2),
+                                "passed": passed})
+                shown = "identical" if quality == float("inf") else f"{quality:.2f} dB"
+                print(f"  {os.path.basename(path):<28} {percentage:>4g}% {'1/' + str(scale):>6} "
+                      f"{full_ms:>8.1f}ms {draft_ms:>8.1f}ms {full_ms / draft_ms:>7.2f}x "
+                      f"{shown:>10}{'' if passed else '  BELOW MINIMUM'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"min_psnr": args.min_psnr, "results": results}, f, indent=2)
+    if failures:
+        print(f"{failures} case(s) below {args.min_psnr:g} dB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
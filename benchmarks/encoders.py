@@ -0,0 +1,94 @@
+"""
+Measure encode time against output size for each encoder profile and format.
+
+A sample image is resized to the requested size and encoded in memory with
+every profile (see image_resizer.ENCODER_PROFILES) and output format. Each
+combination reports the median encode time, the output size in bytes and
+bits per pixel, and the PSNR of the decoded output against the image that was
+encoded (lossless formats show 'lossless').
+
+Usage:
+    python -m benchmarks.encoders [--image images/background_landscape.png] [--megapixels 2]
+                                  [--formats JPEG WEBP AVIF PNG] [--profiles web small] [--repeats 3]
+                                  [--output encoders.json]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, features
+
+from image_resizer import ENCODER_PROFILES, encoder_options
+
+FORMATS = ("JPEG", "WEBP", "AVIF", "PNG")
+FEATURES = {"WEBP": "webp", "AVIF": "avif"}
+
+
+def psnr(reference, data):
+    """Return the PSNR in dB of an encoded image against the reference (inf if identical)."""
+    with Image.open(BytesIO(data)) as decoded:
+        decoded = np.asarray(decoded.convert(reference.mode), dtype=np.float64)
+    error = np.mean((np.asarray(reference, dtype=np.float64) - decoded) ** 2)
+    return float("inf") if error == 0 else 10 * np.log10(255 ** 2 / error)
+
+
+def measure(image, image_format, profile, repeats):
+    """Encode repeatedly and return the median time in milliseconds and the last encoding."""
+    options = encoder_options(image_format, profile)
+    timings = []
+    data = b""
+    for _ in range(repeats):
+        buffer = BytesIO()
+        start = time.perf_counter()
+        image.save(buffer, format=image_format, **options)
+        timings.append((time.perf_counter() - start) * 1000)
+        data = buffer.getvalue()
+    return statistics.median(timings), data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image", default="images/background_landscape.png", help="Sample image")
+    parser.add_argument("--megapixels", type=float, default=2.0, help="Resize the sample to this size first")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--profiles", nargs="+", default=list(ENCODER_PROFILES), choices=list(ENCODER_PROFILES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    with Image.open(args.image) as source:
+        image = source.convert("RGB")
+    scale = (args.megapixels * 1e6 / (image.width * image.height)) ** 0.5
+    image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                         Image.Resampling.LANCZOS)
+    pixels = image.width * image.height
+    print(f"{args.image} at {image.width}x{image.height}, median of {args.repeats}")
+    print(f"  {'format':<6} {'profile':<8} {'encode':>10} {'bytes':>10} {'bpp':>6} {'PSNR':>10}")
+
+    results = []
+    for image_format in args.formats:
+        if image_format in FEATURES and not features.check(FEATURES[image_format]):
+            print(f"  {image_format:<6} skipped: Pillow was built without {image_format} support")
+            continue
+        for profile in args.profiles:
+            ms, data = measure(image, image_format, profile, args.repeats)
+            quality = psnr(image, data)
+            results.append({"format": image_format, "profile": profile, "encode_ms": round(ms, 3),
+                            "bytes": len(data), "bits_per_pixel": round(len(data) * 8 / pixels, 4),
+                            "psnr": None if quality == float("inf") else round(quality, 2)})
+            shown = "lossless" if quality == float("inf") else f"{quality:.2f} dB"
+            print(f"  {image_format:<6} {profile:<8} {ms:>8.1f}ms {len(data):>10} "
+                  f"{len(data) * 8 / pixels:>6.2f} {shown:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"image": args.image, "width": image.width, "height": image.height,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
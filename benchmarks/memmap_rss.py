@@ -0,0 +1,127 @@
+"""
+Measure resident memory for full decodes versus memory-mapped region access.
+
+A large uncompressed RGB TIFF is generated (streamed to disk, never held in
+memory), then each scenario runs in a fresh subprocess and reports RSS
+before and after:
+
+  full-load      load_image() of the whole file
+  mmap-sharpen   load_image(mmap=True) + apply_unsharp_mask on one region
+  mmap-edges     load_image(mmap=True) + canny_edge_detector on one region
+  mmap-filter    load_image(mmap=True) + filter_image on one region
+
+Usage:
+    python -m benchmarks.memmap_rss [--size-gb 2] [--region 1024] [--path big.tif]
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import current_rss, format_bytes, peak_rss
+
+SCENARIOS = ("full-load", "mmap-sharpen", "mmap-edges", "mmap-filter")
+
+
+def create_tiff(path: str, size_gb: float) -> tuple:
+    """Write an uncompressed RGB TIFF of roughly size_gb gigabytes, one strip at a time."""
+    import numpy as np
+    import tifffile
+
+    side = int(math.sqrt(size_gb * 1024 ** 3 / 3))
+    shape = (side, side, 3)
+    image = tifffile.memmap(path, shape=shape, dtype=np.uint8, photometric="rgb")
+    rng = np.random.default_rng(0)
+    strip = 1024
+    for top in range(0, side, strip):
+        rows = min(strip, side - top)
+        image[top:top + rows] = rng.integers(0, 256, size=(rows, side, 3), dtype=np.uint8)
+        image.flush()
+    del image
+    return shape
+
+
+def run_scenario(path: str, scenario: str, region: int) -> dict:
+    """Run one scenario in this process and return the RSS measurements."""
+    from image_io import to_grayscale
+    from image_utils import load_image
+
+    before = current_rss()
+    start = time.perf_counter()
+
+    if scenario == "full-load":
+        image = load_image(path)
+        checksum = int(image[::997, ::997].sum())
+    else:
+        image = load_image(path, mmap=True)
+        height, width = image.shape[:2]
+        top, left = height // 2, width // 2
+        view = image[top:top + region, left:left + region]
+        if scenario == "mmap-sharpen":
+            from sharpening import apply_unsharp_mask
+            result = apply_unsharp_mask(view)
+        elif scenario == "mmap-edges":
+            from edge_detection import canny_edge_detector
+            # The Canny implementation is pure Python, keep its region small
+            small = min(region, 256)
+            result = canny_edge_detector(to_grayscale(image[top:top + small, left:left + small]))
+        else:
+            from filters import filter_image
+            result = filter_image(view, "sharpen")
+        import numpy as np
+        checksum = int(np.asarray(result, dtype=np.int64).sum())
+
+    return {
+        "scenario": scenario,
+        "rss_before": before,
+        "rss_after": current_rss(),
+        "peak_rss": peak_rss(),
+        "seconds": time.perf_counter() - start,
+        "checksum": checksum,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-gb", type=float, default=2.0, help="Size of the generated TIFF")
+    parser.add_argument("--region", type=int, default=1024, help="Side of the processed region in pixels")
+    parser.add_argument("--path", help="Use (or create) this TIFF instead of a temporary file")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("create",), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario == "create":
+        create_tiff(args.path, args.size_gb)
+        return
+    if args.scenario:
+        print(json.dumps(run_scenario(args.path, args.scenario, args.region)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or os.path.join(tmp, "large.tif")
+        if not os.path.exists(path):
+            print(f"Creating {args.size_gb:.1f} GB TIFF at {path}...")
+            # Generate in a child process: peak RSS is inherited by subprocesses on Linux
+            subprocess.run([sys.executable, "-m", "benchmarks.memmap_rss", "--path", path,
+                            "--size-gb", str(args.size_gb), "--scenario", "create"], check=True)
+        print(f"File size: {format_bytes(os.path.getsize(path))}, region: {args.region}x{args.region}")
+        print(f"{'scenario':<14} {'rss before':>12} {'rss after':>12} {'peak rss':>12} {'time':>9}")
+
+        for scenario in SCENARIOS:
+            command = [sys.executable, "-m", "benchmarks.memmap_rss", "--path", path,
+                       "--region", str(args.region), "--scenario", scenario]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"{scenario:<14} failed: {completed.stderr.strip().splitlines()[-1]}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{scenario:<14} {format_bytes(result['rss_before']):>12} {format_bytes(result['rss_after']):>12} "
+                  f"{format_bytes(result['peak_rss']):>12} {result['seconds']:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
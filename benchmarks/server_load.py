@@ -0,0 +1,158 @@
+"""
+Load-test the local HTTP processing service.
+
+Sends the same image to /process/<operation> from several client threads
+over keep-alive connections and reports throughput, latency percentiles,
+status codes and the mean batch size the server formed. With --spawn the
+server is started on a free local port for the duration of the run, so the
+benchmark needs no network access.
+
+Usage:
+    python -m benchmarks.server_load --spawn [--workers 2] [--max-batch 8]
+    python -m benchmarks.server_load --port 8080 --operation sharpen --requests 500 --concurrency 32
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+SHUTDOWN_TIMEOUT = 30.0  # seconds a spawned server gets to stop its workers before it is killed
+
+
+def free_port() -> int:
+    """Return a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(host, port, timeout=60.0):
+    """Poll /health until the server answers or the timeout expires."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on {host}:{port} did not start within {timeout:.0f}s")
+
+
+def run_client(host, port, path, body, count, latencies, statuses, batch_sizes, lock):
+    """Send `count` requests on one keep-alive connection."""
+    connection = http.client.HTTPConnection(host, port, timeout=120)
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            connection.request("POST", path, body=body, headers={"Content-Type": "application/octet-stream"})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            batch_size = response.getheader("X-Batch-Size")
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=120)
+            status, batch_size = "conn-error", None
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(elapsed)
+                batch_sizes.append(int(batch_size))
+    connection.close()
+
+
+def percentile(values, fraction):
+    """Return the given percentile (0-1) of a list of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Port of a running server (default: spawn one)")
+    parser.add_argument("--spawn", action="store_true", help="Start a server for the run")
+    parser.add_argument("--workers", type=int, default=2, help="Workers for a spawned server")
+    parser.add_argument("--max-batch", type=int, default=8, help="Batch limit for a spawned server")
+    parser.add_argument("--queue-depth", type=int, default=64, help="Queue depth for a spawned server")
+    parser.add_argument("--image", default="images/image.jpg")
+    parser.add_argument("--operation", default="edge")
+    parser.add_argument("--param", action="append", default=[], help="Operation parameter as name=value")
+    parser.add_argument("--format", default="png", help="Output format")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+    if args.spawn or port is None:
+        port = free_port()
+        command = [sys.executable, "server.py", "--host", args.host, "--port", str(port),
+                   "--workers", str(args.workers), "--max-batch", str(args.max_batch),
+                   "--queue-depth", str(args.queue_depth)]
+        server = subprocess.Popen(command, cwd=os.getcwd(), stdout=subprocess.DEVNULL)
+
+    try:
+        wait_for_server(args.host, port)
+        with open(args.image, "rb") as f:
+            body = f.read()
+        query = dict(param.split("=", 1) for param in args.param)
+        query["format"] = args.format
+        path = f"/process/{args.operation}?{urlencode(query)}"
+
+        latencies, batch_sizes = [], []
+        statuses = Counter()
+        lock = threading.Lock()
+        per_client = [args.requests // args.concurrency + (i < args.requests % args.concurrency)
+                      for i in range(args.concurrency)]
+        threads = [threading.Thread(target=run_client,
+                                    args=(args.host, port, path, body, count, latencies, statuses,
+                                          batch_sizes, lock))
+                   for count in per_client if count]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        connection = http.client.HTTPConnection(args.host, port, timeout=5)
+        connection.request("GET", "/health")
+        health = json.loads(connection.getresponse().read())
+
+        print(f"{args.requests} x {args.operation} on {os.path.basename(args.image)} "
+              f"({len(body) / 1024:.1f} KB), concurrency {args.concurrency}")
+        print(f"  throughput  {args.requests / elapsed:8.1f} req/s ({elapsed:.2f}s)")
+        if latencies:
+            print(f"  latency     p50 {statistics.median(latencies):.1f} ms, "
+                  f"p95 {percentile(latencies, 0.95):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms")
+            print(f"  batch size  mean {statistics.mean(batch_sizes):.2f}, max {max(batch_sizes)}")
+        print(f"  statuses    {dict(statuses)}")
+        print(f"  server      {health['batches']} batches, {health['rejected']} rejected")
+    finally:
+        if server is not None:
+            # Like Ctrl-C: the server shuts its worker pool down before exiting
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(timeout=SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
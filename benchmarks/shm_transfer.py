@@ -0,0 +1,90 @@
+"""
+Compare handing large images to worker processes by pickling vs shared memory.
+
+A 50 MP RGB array is sent to a worker and returned unchanged, so the timings
+measure only the cost of moving pixels between processes:
+
+    pickle          ProcessPoolExecutor.submit(identity, array)
+    shm (copy-in)   SharedMemoryWorkerPool.submit with a private ndarray,
+                    which is first copied into a pooled block
+    shm (zero-copy) SharedMemoryWorkerPool.submit with a SharedImage the
+                    caller filled directly (e.g. decoded into)
+
+Usage:
+    python -m benchmarks.shm_transfer [--megapixels 50] [--repeats 5]
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from shared_memory_pool import SharedMemoryWorkerPool
+
+
+def identity(image):
+    """Return the image unchanged (the work being benchmarked is the transfer)."""
+    return image
+
+
+def time_runs(run, repeats):
+    """Return the median wall time of run() in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, default=50.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    width = int((args.megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(args.megapixels * 1e6 / width)
+    image = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    megabytes = image.nbytes / 1024 ** 2
+    print(f"{width}x{height} RGB uint8 ({megabytes:.0f} MB), median of {args.repeats} round trips")
+
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        executor.submit(identity, np.zeros(1)).result()  # start the worker
+
+        def pickled():
+            result = executor.submit(identity, image).result()
+            assert result.shape == image.shape
+
+        results["pickle"] = time_runs(pickled, args.repeats)
+
+    with SharedMemoryWorkerPool(workers=1) as pool:
+        pool.submit(identity, np.zeros(1)).result().release()  # start the worker
+
+        def copy_in():
+            pool.submit(identity, image).result().release()
+
+        results["shm (copy-in)"] = time_runs(copy_in, args.repeats)
+
+        shared = pool.allocate(image.shape, image.dtype)
+        np.copyto(shared.array, image)
+
+        def zero_copy():
+            pool.submit(identity, shared).result().release()
+
+        results["shm (zero-copy)"] = time_runs(zero_copy, args.repeats)
+        shared.release()
+        stats = pool.slabs.stats()
+
+    baseline = results["pickle"]
+    for name, ms in results.items():
+        print(f"  {name:<16} {ms:9.1f} ms  {2 * megabytes / (ms / 1000):8.0f} MB/s  {baseline / ms:5.1f}x")
+    print(f"  slab pool: {stats['created']} blocks created, {stats['reused']} reused")
+
+
+if __name__ == "__main__":
+    main()
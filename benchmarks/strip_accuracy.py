@@ -0,0 +1,87 @@
+"""
+Check strip_resize against Pillow's Image.resize for grayscale, RGB and RGBA.
+
+Random images (the worst case for rounding) and an RGBA image with a fully
+transparent red half next to an opaque blue half are resized to several
+sizes, both with strip_resize.resize_array (reducing_gap=None, the exact
+LANCZOS resample) and with Image.resize(..., Image.Resampling.LANCZOS).
+The table shows the largest difference per case in gray levels; RGBA
+colours are compared premultiplied by alpha, i.e. as they are seen, since
+dividing by a small alpha magnifies rounding in nearly transparent pixels.
+The exit status is 1 if any case differs by more than --tolerance, or if
+transparent colour bleeds into the visible edge of the red/blue image.
+
+Usage:
+    python -m benchmarks.strip_accuracy [--tolerance 2] [--strip-height 128]
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from strip_resize import DEFAULT_STRIP_HEIGHT, resize_array
+
+DEFAULT_TOLERANCE = 2.0
+CASES = [((300, 500), (77, 120)), ((777, 333), (400, 200)), ((1000, 1000), (103, 97)), ((900, 1200), (600, 450))]
+CHANNELS = {"L": (), "RGB": (3,), "RGBA": (4,)}
+
+
+def visible(image):
+    """Return an image's values as seen: RGBA colours premultiplied by alpha, others unchanged."""
+    image = image.astype(np.float64)
+    if image.ndim == 3 and image.shape[2] == 4:
+        return np.concatenate([image[..., :3] * image[..., 3:] / 255, image[..., 3:]], axis=2)
+    return image
+
+
+def compare(source, mode, size, strip_height):
+    """Resize with both implementations; return the largest visible difference and the strip result."""
+    start = time.perf_counter()
+    strips = resize_array(source, size[0], size[1], strip_height=strip_height, reducing_gap=None)
+    seconds = time.perf_counter() - start
+    reference = np.asarray(Image.fromarray(source, mode).resize(size, Image.Resampling.LANCZOS))
+    return float(np.abs(visible(strips) - visible(reference)).max()), strips, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest allowed difference in gray levels")
+    parser.add_argument("--strip-height", type=int, default=DEFAULT_STRIP_HEIGHT)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    failures = 0
+    print(f"strip_resize against Image.resize, tolerance {args.tolerance:g} gray levels")
+    print(f"  {'mode':<5} {'source':>11} {'output':>9} {'max diff':>9} {'strips':>9}")
+    for mode, channels in CHANNELS.items():
+        for (height, width), size in CASES:
+            source = rng.integers(0, 256, (height, width) + channels, dtype=np.uint8)
+            difference, _, seconds = compare(source, mode, size, args.strip_height)
+            passed = difference <= args.tolerance
+            failures += not passed
+            print(f"  {mode:<5} {f'{width}x{height}':>11} {f'{size[0]}x{size[1]}':>9} {difference:>9.2f} "
+                  f"{seconds * 1000:>7.1f}ms{'' if passed else '  ABOVE TOLERANCE'}")
+
+    # Transparent red must not tint the edge of the opaque blue half
+    edge = np.zeros((400, 400, 4), dtype=np.uint8)
+    edge[:, :200] = (255, 0, 0, 0)
+    edge[:, 200:] = (0, 0, 255, 255)
+    difference, strips, _ = compare(edge, "RGBA", (100, 100), args.strip_height)
+    bleed = int(strips[..., 0][strips[..., 3] > 0].max())
+    passed = difference <= args.tolerance and bleed == 0
+    failures += not passed
+    print(f"  RGBA transparent red / opaque blue edge: max diff {difference:.2f}, "
+          f"red in visible pixels {bleed}{'' if passed else '  FAILED'}")
+
+    if failures:
+        print(f"{failures} case(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
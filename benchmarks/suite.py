@@ -0,0 +1,382 @@
+"""
+Time every public image operation at several resolutions and check for regressions.
+
+Synthetic images (smooth gradients, hard-edged shapes and sensor-like noise)
+are generated at each size, by default 1, 12 and 48 megapixels, and saved
+once (as .npy, or as TIFF for file-based operations). Each (operation, size)
+case runs in its own subprocess that only loads its input, so earlier cases
+cannot warm caches for later ones. Peak RSS is the peak while the operation
+runs: on Linux it is reset after setup, elsewhere it also covers the
+interpreter, the imports and the loaded input (see setup_rss).
+A case runs its warmup iterations, then its timed repeats, within a
+per-case time budget; slow cases stop early with fewer samples (always at
+least one).
+
+Results (p50/p95/min/mean in milliseconds, peak RSS, sample counts and the
+environment) are written as JSON. Given --baseline, each case's p50 and
+peak RSS are compared with the stored run, and the exit status is 1 if any
+got worse by more than --threshold or a case that was ok in the baseline now
+fails, times out or is skipped.
+
+Cases that need an unavailable dependency (TensorFlow) are recorded as
+skipped rather than failing the run.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1 12 48] [--operations canny unsharp_mask] [--output results.json]
+    python -m benchmarks.suite --baseline baseline.json [--threshold 0.1]
+    python -m benchmarks.suite --save-baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.common import current_rss, format_bytes, peak_rss, reset_peak_rss
+
+
+# Constants
+DEFAULT_SIZES = [1, 12, 48]
+DEFAULT_WARMUP = 1
+DEFAULT_REPEATS = 5
+DEFAULT_MAX_SECONDS = 60.0
+DEFAULT_THRESHOLD = 0.10
+DEFAULT_OUTPUT = "benchmark_results.json"
+WARMUP_BUDGET_SHARE = 0.25  # warmup stops early once it has used this share of the budget
+RESULTS_FORMAT_VERSION = 2  # 2: peak_rss excludes input generation and setup
+# Input each operation runs on; everything else takes an RGB array
+OPERATION_INPUTS = {"canny": "gray", "pil_filters": "tiff", "resize": "tiff"}
+
+
+def synthetic_image(megapixels: float, grayscale: bool = False, seed: int = 0) -> np.ndarray:
+    """
+    Generate a deterministic 3:2 test image with gradients, shapes and noise.
+
+    Args:
+        megapixels: Image size in millions of pixels
+        grayscale: Whether to return a single channel
+        seed: Random seed
+
+    Returns:
+        uint8 image array (RGB or grayscale)
+    """
+    import cv2
+
+    width = int((megapixels * 1e6 * 3 / 2) ** 0.5)
+    height = int(megapixels * 1e6 / width)
+    rng = np.random.default_rng(seed)
+
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    for channel, (fx, fy) in enumerate(((1.0, 0.3), (0.4, 1.0), (0.7, 0.7))):
+        image[:, :, channel] = (127 + 100 * np.sin(2 * np.pi * (fx * x + fy * y))).astype(np.uint8)
+
+    # Hard edges at every scale
+    for _ in range(int(40 * max(1.0, megapixels) ** 0.5)):
+        x0, y0 = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(8, max(16, min(width, height) // 6)))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        if rng.random() < 0.5:
+            cv2.rectangle(image, (x0, y0), (x0 + size, y0 + size), color, -1)
+        else:
+            cv2.circle(image, (x0, y0), size // 2, color, -1)
+
+    noise = rng.integers(-8, 9, (height, width, 1), dtype=np.int16)
+    image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if grayscale else image
+
+
+def write_input(operation: str, megapixels: float, directory: str) -> str:
+    """
+    Generate the input of a case and save it, unless an earlier case already did.
+
+    Arrays are saved as .npy; file-based operations get an uncompressed TIFF,
+    so decoding is cheap and constant.
+
+    Returns:
+        Path of the saved input
+    """
+    kind = OPERATION_INPUTS.get(operation, "rgb")
+    path = os.path.join(directory, f"input-{megapixels:g}mp-{kind}.{'tif' if kind == 'tiff' else 'npy'}")
+    if not os.path.exists(path):
+        image = synthetic_image(megapixels, grayscale=kind == "gray")
+        if kind == "tiff":
+            from PIL import Image
+            Image.fromarray(image).save(path)
+        else:
+            np.save(path, image)
+    return path
+
+
+def setup_case(operation: str, input_path: str, directory: str) -> Callable[[], object]:
+    """
+    Load the input for a case and return the callable to time.
+
+    Args:
+        operation: Case name (see OPERATIONS)
+        input_path: Input written by write_input
+        directory: Scratch directory for outputs
+
+    Returns:
+        Zero-argument callable running the operation once
+
+    Raises:
+        ImportError: If the operation's dependency is unavailable
+    """
+    if operation == "canny":
+        from edge_detection import canny_edge_detector
+        image = np.load(input_path)
+        return lambda: canny_edge_detector(image)
+
+    if operation == "unsharp_mask":
+        from sharpening import apply_unsharp_mask
+        image = np.load(input_path)
+        return lambda: apply_unsharp_mask(image)
+
+    if operation == "sharpen_cv2":
+        from sharpening import sharpen_with_cv2
+        image = np.load(input_path)
+        return lambda: sharpen_with_cv2(image)
+
+    if operation == "sharpen_tensorflow":
+        import tensorflow  # noqa: F401  (skip the case cleanly when missing)
+        from sharpening import sharpen_with_tensorflow
+        image = np.load(input_path)
+        return lambda: sharpen_with_tensorflow(image)
+
+    if operation == "pil_filters":
+        from filters import apply_pil_filters
+        return lambda: apply_pil_filters(input_path)
+
+    if operation == "resize":
+        from image_resizer import ImageResizer
+        resizer = ImageResizer()
+        output = os.path.join(directory, "resized.jpg")
+        return lambda: resizer.resize_image(input_path, output, "percentage", percentage="50")
+
+    raise ValueError(f"Unknown benchmark operation: {operation}")
+
+
+OPERATIONS = ["canny", "unsharp_mask", "sharpen_cv2", "sharpen_tensorflow", "pil_filters", "resize"]
+
+
+def run_case(operation: str, megapixels: float, warmup: int, repeats: int, max_seconds: float,
+             input_path: Optional[str] = None) -> dict:
+    """
+    Run one case in this process and return its measurements.
+
+    Args:
+        operation: Case name
+        megapixels: Image size
+        warmup: Untimed iterations before measuring
+        repeats: Timed iterations
+        max_seconds: Time budget for warmup and timed iterations together
+        input_path: Input written by write_input (generated here if omitted,
+            which then counts towards peak_rss where it cannot be reset)
+
+    Returns:
+        Result record for the JSON report
+    """
+    record = {"operation": operation, "megapixels": megapixels}
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            run = setup_case(operation, input_path or write_input(operation, megapixels, directory), directory)
+        except ImportError as e:
+            record.update(status="skipped", reason=f"missing dependency: {e.name or str(e)}")
+            return record
+        setup_rss = current_rss()
+        peak_reset = reset_peak_rss()
+
+        started = time.perf_counter()
+        warmups = 0
+        while warmups < warmup:
+            run()
+            warmups += 1
+            if time.perf_counter() - started > max_seconds * WARMUP_BUDGET_SHARE:
+                break
+
+        samples: List[float] = []
+        while len(samples) < repeats:
+            start = time.perf_counter()
+            run()
+            samples.append((time.perf_counter() - start) * 1000)
+            if time.perf_counter() - started > max_seconds:
+                break
+
+    timings = np.array(samples)
+    record.update(
+        status="ok",
+        warmup=warmups,
+        samples=len(samples),
+        p50_ms=round(float(np.percentile(timings, 50)), 3),
+        p95_ms=round(float(np.percentile(timings, 95)), 3),
+        min_ms=round(float(timings.min()), 3),
+        mean_ms=round(float(timings.mean()), 3),
+        setup_rss=setup_rss,
+        peak_rss=peak_rss(),
+        peak_includes_setup=not peak_reset,
+    )
+    return record
+
+
+def run_case_subprocess(operation: str, megapixels: float, input_path: str, args: argparse.Namespace) -> dict:
+    """Run a case on a saved input in a fresh interpreter and parse its JSON record."""
+    command = [sys.executable, "-m", "benchmarks.suite", "--case", operation,
+               "--megapixels", str(megapixels), "--input", input_path, "--warmup", str(args.warmup),
+               "--repeats", str(args.repeats), "--max-seconds", str(args.max_seconds)]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {"operation": operation, "megapixels": megapixels, "status": "error",
+                "reason": f"timed out after {args.timeout}s"}
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"operation": operation, "megapixels": megapixels, "status": "error",
+                "reason": lines[-1] if lines else f"exit status {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment() -> dict:
+    """Describe the machine and library versions the results were measured with."""
+    from result_cache import LIBRARY_VERSIONS
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "libraries": LIBRARY_VERSIONS,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results: List[dict], baseline: dict, threshold: float) -> List[Tuple[dict, str, float]]:
+    """
+    Compare results with a baseline report.
+
+    Args:
+        results: Result records of this run
+        baseline: A previously written report
+        threshold: Allowed relative increase, e.g. 0.1 for 10%
+
+    Returns:
+        (record, metric, relative change) for each regression; a case that
+        was ok in the baseline but did not finish now (error, timeout or
+        skipped) counts as a "status" regression with an infinite change
+    """
+    previous: Dict[Tuple[str, float], dict] = {
+        (record["operation"], float(record["megapixels"])): record
+        for record in baseline.get("results", []) if record.get("status") == "ok"
+    }
+    metrics = ["p50_ms", "peak_rss"]
+    if baseline.get("version") != RESULTS_FORMAT_VERSION:
+        # Older reports measured peak RSS including input generation
+        metrics.remove("peak_rss")
+        print("Note: the baseline measured peak RSS differently; comparing p50 only")
+    regressions = []
+    print(f"\nComparison with baseline (threshold {threshold:.0%}):")
+    for record in results:
+        old = previous.get((record["operation"], float(record["megapixels"])))
+        if old is None:
+            continue
+        if record.get("status") != "ok":
+            regressions.append((record, "status", float("inf")))
+            print(f"  {record['operation']:<20} {record['megapixels']:>5g} MP  ok -> {record.get('status')}: "
+                  f"{record.get('reason', '')}  REGRESSION")
+            continue
+        changes = []
+        for metric in metrics:
+            if not old.get(metric):
+                continue
+            change = record[metric] / old[metric] - 1
+            changes.append(f"{metric} {change:+.1%}")
+            if change > threshold:
+                regressions.append((record, metric, change))
+        flag = "  REGRESSION" if any(r[0] is record for r in regressions) else ""
+        print(f"  {record['operation']:<20} {record['megapixels']:>5g} MP  {', '.join(changes)}{flag}")
+    return regressions
+
+
+def print_record(record: dict) -> None:
+    """Print one result line."""
+    label = f"  {record['operation']:<20} {record['megapixels']:>5g} MP"
+    if record["status"] != "ok":
+        print(f"{label}  {record['status']}: {record.get('reason', '')}")
+        return
+    print(f"{label}  p50 {record['p50_ms']:>10.1f} ms  p95 {record['p95_ms']:>10.1f} ms  "
+          f"peak RSS {format_bytes(record['peak_rss']):>9}  ({record['samples']} samples)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES, help="Image sizes in megapixels")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS,
+                        help="Time budget per case; slow cases record fewer samples")
+    parser.add_argument("--timeout", type=float, help="Abort a case after this many seconds")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file")
+    parser.add_argument("--baseline", help="Report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown or memory growth before failing")
+    parser.add_argument("--save-baseline", help="Also write the results to this baseline file")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--megapixels", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--input", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        # Child process: run a single case and report it on stdout
+        print(json.dumps(run_case(args.case, args.megapixels, args.warmup, args.repeats, args.max_seconds,
+                                  args.input)))
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"Benchmarking {len(args.operations)} operations at {', '.join(f'{s:g}' for s in args.sizes)} MP "
+          f"({args.warmup} warmup, {args.repeats} repeats, {args.max_seconds:g}s budget per case)")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for operation in args.operations:
+            for megapixels in args.sizes:
+                record = run_case_subprocess(operation, megapixels,
+                                             write_input(operation, megapixels, directory), args)
+                print_record(record)
+                results.append(record)
+
+    report = {"version": RESULTS_FORMAT_VERSION, "environment": environment(), "results": results}
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+
+    if baseline is not None:
+        if baseline.get("environment", {}).get("machine") != report["environment"]["machine"]:
+            print("Warning: the baseline was recorded on a different machine type")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Measure sustained frame rates of the video pipeline on a 1080p clip.
+
+A synthetic 1920x1080 clip (shapes over noise, moving half the time) is written once and
+then run through several operation chains, executors and worker counts.
+Sustained fps is measured from the first to the last written frame, so
+pool start-up and the initial pipeline fill are excluded.
+
+Edge detection uses the pure-Python Canny implementation and runs at well
+under one frame per second at 1080p; pass --steps edge to include it.
+
+With --skip-threshold each case runs a second time through a FrameDiffGate
+(tiled with --tile-size). The clip's background is static, so unchanged
+tiles are reused.
+
+Usage:
+    python -m benchmarks.video_fps [--frames 120] [--workers 1 2] [--steps sharpen filter:filter_name=blur]
+                                   [--skip-threshold 3 --tile-size 128]
+"""
+
+import argparse
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from video_pipeline import FrameDiffGate, parse_step, process_video
+
+
+def write_clip(path, frames, width=1920, height=1080, fps=30):
+    """Write a synthetic clip with shapes that move for a second, then pause, over a static noise texture."""
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        frame = background.copy()
+        moving = (i // fps) * fps // 2 + min(i % fps, fps // 2)  # frames spent moving so far
+        x = (moving * 34) % (width - 400)
+        cv2.rectangle(frame, (x, 200), (x + 400, 600), (40, 180, 240), -1)
+        cv2.circle(frame, (width - x - 200, 700), 150, (220, 220, 220), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--executors", nargs="+", default=["process", "thread"])
+    parser.add_argument("--steps", nargs="+", default=["sharpen", "sharpen:method=cv2", "filter:filter_name=blur"])
+    parser.add_argument("--skip-threshold", type=float)
+    parser.add_argument("--tile-size", type=int)
+    args = parser.parse_args()
+    gates = [False, True] if args.skip_threshold is not None else [False]
+
+    with tempfile.TemporaryDirectory() as directory:
+        clip = os.path.join(directory, "clip.mp4")
+        write_clip(clip, args.frames)
+        print(f"1920x1080 clip, {args.frames} frames, {os.cpu_count()} CPUs")
+        print(f"  {'chain':<26} {'executor':<8} {'workers':>7} {'gate':>5} {'overall':>9} {'sustained':>10}")
+
+        for spec in args.steps:
+            for executor in args.executors:
+                for workers in sorted(set(args.workers)):
+                    for gated in gates:
+                        gate = FrameDiffGate(args.skip_threshold, tile_size=args.tile_size) if gated else None
+                        stats = process_video(clip, os.path.join(directory, "out.mp4"), [parse_step(spec)],
+                                              workers=workers, executor=executor, writer="cv2", gate=gate)
+                        skipped = (f"  skip {stats['skip_ratio']:.0%}, "
+                                   f"tiles {stats['tiles_processed_ratio']:.0%}") if gated else ""
+                        print(f"  {spec:<26} {executor:<8} {workers:>7} {'on' if gated else 'off':>5} "
+                              f"{stats['fps']:>7.1f}  {stats['sustained_fps']:>8.1f} fps{skipped}")
+
+
+if __name__ == "__main__":
+    main()
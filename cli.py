@@ -0,0 +1,351 @@
+"""
+Command-line interface for batch image processing.
+
+Jobs come from input paths (files, directories or glob patterns) and/or a
+JSONL manifest, run on a pool of worker processes, and produce one JSON
+result line on stdout per image as soon as it finishes. Inputs are read
+lazily and only a bounded number of jobs is in flight at any time, so
+memory use stays flat no matter how many images are processed.
+
+Examples:
+    python main.py --input images/image.jpg --output output/edges.jpg edge
+    python main.py --input "photos/**/*.jpg" --output output/sharp --workers 4 sharpen
+    cat jobs.jsonl | python main.py --manifest - --output output
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from batch_inputs import IMAGE_EXTENSIONS, claim_output, iter_input_paths, iter_manifest, output_path_for
+from memory_profiling import MemoryProfiler, format_table, merge_stages
+from operations import OPERATIONS, OPERATION_PARAMS, process_file
+from result_cache import ResultCache
+
+
+# Constants
+DEFAULT_OUTPUT_DIR = "output"
+IN_FLIGHT_PER_WORKER = 2
+
+
+def _is_file_output(args: argparse.Namespace) -> bool:
+    """Whether --output names a single file rather than a directory."""
+    return (bool(args.output)
+            and len(args.input) == 1
+            and os.path.isfile(args.input[0])
+            and os.path.splitext(args.output)[1].lower() in IMAGE_EXTENSIONS)
+
+
+def iter_jobs(args: argparse.Namespace) -> Iterator[Dict[str, Any]]:
+    """
+    Build jobs from the parsed command line, lazily.
+
+    Args:
+        args: Parsed command-line arguments
+
+    Yields:
+        Job dictionaries with index, input, output, operation and params
+    """
+    cli_params = _operation_params(args)
+    output_dir = args.output or DEFAULT_OUTPUT_DIR
+    claims: Dict[int, int] = {}
+    index = 0
+
+    for spec in args.input:
+        for path, root in iter_input_paths(spec, recursive=args.recursive):
+            if _is_file_output(args):
+                output = args.output
+            else:
+                output = output_path_for(path, output_dir, root=root, extension=args.format)
+            job = {"index": index, "input": path, "output": output,
+                   "operation": args.operation, "params": cli_params}
+            collision = claim_output(claims, output, path)
+            if collision:
+                job["error"] = collision
+            yield job
+            index += 1
+
+    if args.manifest:
+        stream = sys.stdin if args.manifest == "-" else open(args.manifest, "r", encoding="utf-8")
+        try:
+            for job in iter_manifest(stream):
+                job["index"] = index
+                job.setdefault("operation", args.operation)
+                # Command-line parameters belong to the command-line operation only
+                defaults = cli_params if job["operation"] == args.operation else {}
+                job["params"] = {**defaults, **(job.get("params") or {})}
+                if job.get("input") and not job.get("output"):
+                    job["output"] = output_path_for(job["input"], output_dir, extension=args.format)
+                if job.get("input") and not job.get("error"):
+                    collision = claim_output(claims, job["output"], job["input"])
+                    if collision:
+                        job["error"] = collision
+                yield job
+                index += 1
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def _operation_params(args: argparse.Namespace) -> Dict[str, Any]:
+    """Collect the operation parameters that were given on the command line."""
+    if not args.operation:
+        return {}
+    return {name: getattr(args, name) for name in OPERATION_PARAMS[args.operation]
+            if getattr(args, name, None) is not None}
+
+
+_caches: Dict[Tuple[str, int], ResultCache] = {}
+
+
+def _get_cache(cache_dir: Optional[str], max_bytes: int) -> Optional[ResultCache]:
+    """Return this process's result cache for a directory, creating it on first use."""
+    if not cache_dir:
+        return None
+    key = (cache_dir, max_bytes)
+    if key not in _caches:
+        _caches[key] = ResultCache(cache_dir, max_bytes=max_bytes)
+    return _caches[key]
+
+
+def run_job(job: Dict[str, Any], quality: Optional[int] = None,
+            cache_dir: Optional[str] = None, cache_max_bytes: int = 0,
+            profile_memory: bool = False) -> Dict[str, Any]:
+    """
+    Run a single job and turn any failure into an error record.
+
+    Args:
+        job: Job dictionary (see iter_jobs)
+        quality: JPEG/WebP quality for the output (optional)
+        cache_dir: Result cache directory (optional)
+        cache_max_bytes: Size budget of the result cache
+        profile_memory: Record peak memory per stage under "memory"
+
+    Returns:
+        Result record with a "status" of "ok" or "error"
+    """
+    record = {"index": job.get("index"), "input": job.get("input"),
+              "output": job.get("output"), "operation": job.get("operation")}
+    try:
+        if job.get("error"):
+            raise ValueError(job["error"])
+        if not job.get("operation"):
+            raise ValueError(f"No operation given. Available operations: {', '.join(OPERATIONS)}")
+        profiler = MemoryProfiler(job["input"]) if profile_memory else None
+        try:
+            record.update(process_file(job["input"], job.get("output"), job["operation"],
+                                       params=job.get("params"), quality=quality,
+                                       cache=_get_cache(cache_dir, cache_max_bytes),
+                                       profiler=profiler))
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                if profiler.stages:
+                    record["memory"] = profiler.stages
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    return record
+
+
+def _init_worker() -> None:
+    """Configure a worker process for batch use."""
+    import cv2
+    from display import set_display_mode
+
+    set_display_mode("off")
+    # Parallelism comes from the process pool; avoid oversubscribing cores
+    cv2.setNumThreads(1)
+
+
+def run_jobs(jobs: Iterator[Dict[str, Any]],
+             workers: int = 1,
+             max_in_flight: Optional[int] = None,
+             quality: Optional[int] = None,
+             stream: Optional[TextIO] = None,
+             cache_dir: Optional[str] = None,
+             cache_max_bytes: int = 0,
+             profile_memory: bool = False) -> Dict[str, Any]:
+    """
+    Process jobs and write one JSON result line per job to a stream.
+
+    Results are written in completion order; use the "index" field to match
+    them to inputs. No more than max_in_flight jobs are submitted at once,
+    so the job iterator is consumed only as fast as workers finish.
+
+    Args:
+        jobs: Iterator of job dictionaries
+        workers: Number of worker processes (1 runs jobs in this process)
+        max_in_flight: Maximum number of queued jobs (defaults to 2 per worker)
+        quality: JPEG/WebP quality for the outputs (optional)
+        stream: Text stream to write result lines to (defaults to stdout)
+        cache_dir: Result cache directory shared by all workers (optional)
+        cache_max_bytes: Size budget of the result cache
+        profile_memory: Profile peak memory per stage of every job
+
+    Returns:
+        Summary with job, success, failure and cache-hit counts, bytes served
+        from the cache, elapsed time and, when profiling, each job's memory stages
+    """
+    stream = stream or sys.stdout
+    summary = {"jobs": 0, "succeeded": 0, "failed": 0, "cache_hits": 0, "bytes_saved": 0}
+    if profile_memory:
+        summary["memory"] = []
+    start = time.perf_counter()
+
+    def emit(record: Dict[str, Any]) -> None:
+        summary["jobs"] += 1
+        summary["succeeded" if record["status"] == "ok" else "failed"] += 1
+        if record.get("cached"):
+            summary["cache_hits"] += 1
+            summary["bytes_saved"] += record.get("output_bytes") or 0
+        if record.get("memory"):
+            summary["memory"].append({"input": record["input"], "stages": record["memory"]})
+        stream.write(json.dumps(record) + "\n")
+        stream.flush()
+
+    if workers <= 1:
+        for job in jobs:
+            emit(run_job(job, quality, cache_dir, cache_max_bytes, profile_memory))
+    else:
+        max_in_flight = max_in_flight or workers * IN_FLIGHT_PER_WORKER
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            pending = {}
+
+            def drain(block_until: int) -> None:
+                while len(pending) > block_until:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = pending.pop(future)
+                        try:
+                            record = future.result()
+                        except Exception as e:
+                            # The worker died (e.g. killed for memory); report and carry on
+                            record = {"index": job.get("index"), "input": job.get("input"),
+                                      "output": job.get("output"), "operation": job.get("operation"),
+                                      "status": "error", "error": f"Worker failed: {str(e)}"}
+                        emit(record)
+
+            for job in jobs:
+                drain(max_in_flight - 1)
+                pending[executor.submit(run_job, job, quality, cache_dir, cache_max_bytes,
+                                        profile_memory)] = job
+            drain(0)
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="image-processor",
+        description="Batch image processing: edge detection, sharpening and filters. "
+                    "Writes one JSON result line per image to stdout."
+    )
+    parser.add_argument("--input", "-i", action="append", default=[],
+                        help="Image file, directory or glob pattern (can be repeated)")
+    parser.add_argument("--manifest", "-m",
+                        help="JSONL manifest of jobs ('-' reads from stdin)")
+    parser.add_argument("--output", "-o",
+                        help="Output file (single input) or directory (default: output)")
+    parser.add_argument("--format", help="Output format extension, e.g. png (default: same as input)")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP output quality")
+    parser.add_argument("--recursive", "-r", action="store_true",
+                        help="Descend into subdirectories of input directories")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Maximum number of queued jobs (default: 2 per worker)")
+    parser.add_argument("--cache-dir",
+                        help="Reuse outputs of identical earlier runs from this result cache directory")
+    parser.add_argument("--cache-max-mb", type=float, default=2048,
+                        help="Size budget of the result cache in MB (default: 2048)")
+    parser.add_argument("--profile-memory", nargs="?", const="", metavar="JSON",
+                        help="Report peak memory per stage (decode, blur, gradient, nms, hysteresis, "
+                             "save) on stderr, and optionally write every job's profile to a JSON file")
+    parser.add_argument("--interactive", action="store_true", help="Launch the GUI")
+
+    subparsers = parser.add_subparsers(dest="operation", metavar="OPERATION")
+
+    edge = subparsers.add_parser("edge", help="Canny edge detection")
+    edge.add_argument("--method", help="Edge detection method (canny)")
+    edge.add_argument("--blur", type=float, help="Gaussian blur sigma")
+    edge.add_argument("--high-threshold", type=int, help="High hysteresis threshold")
+    edge.add_argument("--low-threshold", type=int, help="Low hysteresis threshold")
+
+    sharpen = subparsers.add_parser("sharpen", help="Image sharpening")
+    sharpen.add_argument("--method", choices=["unsharp_mask", "cv2", "tensorflow"],
+                         help="Sharpening method")
+    sharpen.add_argument("--blur-kernel-size", type=int, help="Blur kernel size for unsharp masking")
+    sharpen.add_argument("--sharpening-amount", type=float, help="Sharpening strength")
+    sharpen.add_argument("--threshold", type=int, help="Noise threshold")
+
+    filters = subparsers.add_parser("filter", help="PIL filter")
+    filters.add_argument("--filter-name", help="Filter to apply, e.g. find_edges")
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the command-line interface.
+
+    With no inputs, manifest or operation the GUI is launched instead.
+
+    Args:
+        argv: Command-line arguments (defaults to sys.argv[1:])
+
+    Returns:
+        Process exit code: 0 if every job succeeded, 1 otherwise
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.interactive or not (args.input or args.manifest or args.operation):
+        from main import ImageProcessingGUI
+
+        app = ImageProcessingGUI()
+        app.window.mainloop()
+        return 0
+
+    if not (args.input or args.manifest):
+        parser.error("no jobs given; use --input and/or --manifest")
+
+    try:
+        summary = run_jobs(iter_jobs(args), workers=args.workers,
+                           max_in_flight=args.max_in_flight, quality=args.quality,
+                           cache_dir=args.cache_dir,
+                           cache_max_bytes=int(args.cache_max_mb * 1024 ** 2),
+                           profile_memory=args.profile_memory is not None)
+    except BrokenPipeError:
+        # The consumer of our output went away (e.g. piped into head)
+        sys.stderr.close()
+        return 1
+
+    rate = summary["jobs"] / summary["seconds"] if summary["seconds"] else 0.0
+    print(f"Processed {summary['jobs']} images ({summary['failed']} failed) "
+          f"in {summary['seconds']:.2f}s ({rate:.1f} images/s)", file=sys.stderr)
+    if args.cache_dir:
+        hit_rate = summary["cache_hits"] / summary["jobs"] if summary["jobs"] else 0.0
+        print(f"Result cache: {summary['cache_hits']} hits ({hit_rate:.0%}), "
+              f"{summary['bytes_saved'] / 1024 ** 2:.1f} MB served from cache", file=sys.stderr)
+    if args.profile_memory is not None:
+        runs = summary["memory"]
+        worst = merge_stages(run["stages"] for run in runs)
+        print(f"Memory by stage (worst of {len(runs)} profiled jobs):", file=sys.stderr)
+        print(format_table(worst), file=sys.stderr)
+        if args.profile_memory:
+            with open(args.profile_memory, "w") as f:
+                json.dump({"worst": worst, "jobs": runs}, f, indent=2)
+            print(f"Wrote memory profile to {args.profile_memory}", file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Fast contact-sheet rendering for groups of result images.
+
+A contact sheet is a single preallocated image canvas holding downscaled
+copies of several images, each with a text label underneath. Building one
+costs a resize and a copy per image, which is far cheaper than laying out a
+matplotlib figure with one axes per image.
+"""
+
+import os
+from typing import Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+# Constants
+DEFAULT_CELL_SIZE = (320, 240)
+DEFAULT_MAX_COLS = 4
+LABEL_HEIGHT = 24
+CELL_PADDING = 8
+BACKGROUND_VALUE = 255
+LABEL_COLOR = (0, 0, 0)
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+LABEL_FONT_SCALE = 0.5
+
+
+def _fit_size(width: int, height: int, max_width: int, max_height: int) -> Tuple[int, int]:
+    """Return the largest size with the same aspect ratio that fits the cell, never upscaling."""
+    scale = min(max_width / width, max_height / height, 1.0)
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+
+def _to_rgb_uint8(image: np.ndarray) -> np.ndarray:
+    """Convert a bool, float, 16-bit, grayscale or RGBA array to 8-bit RGB."""
+    if image.dtype == bool:
+        image = image.astype(np.uint8) * 255
+    elif image.dtype == np.uint16:
+        image = (image >> 8).astype(np.uint8)
+    elif image.dtype != np.uint8:
+        image = np.asarray(image, dtype=np.float32)
+        if image.size and image.max() <= 1.0:
+            image = image * 255
+        image = np.clip(image, 0, 255).astype(np.uint8)
+
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    if image.shape[2] == 4:
+        return image[:, :, :3]
+    return image
+
+
+def _thumbnail(image: Union[np.ndarray, Image.Image], max_width: int, max_height: int) -> np.ndarray:
+    """Downscale an image to fit the cell and return it as 8-bit RGB."""
+    if isinstance(image, Image.Image):
+        size = _fit_size(image.width, image.height, max_width, max_height)
+        # Resize before converting so the mode conversion only touches the small image
+        small = image.resize(size, Image.Resampling.BOX) if size != image.size else image
+        if small.mode not in ("RGB", "L"):
+            small = small.convert("RGB")
+        return _to_rgb_uint8(np.asarray(small))
+
+    image = _to_rgb_uint8(np.asarray(image))
+    height, width = image.shape[:2]
+    size = _fit_size(width, height, max_width, max_height)
+    if size != (width, height):
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _fit_label(text: str, max_width: int) -> str:
+    """Truncate a label with an ellipsis so it fits in the given pixel width."""
+    if cv2.getTextSize(text, LABEL_FONT, LABEL_FONT_SCALE, 1)[0][0] <= max_width:
+        return text
+    while text and cv2.getTextSize(text + "...", LABEL_FONT, LABEL_FONT_SCALE, 1)[0][0] > max_width:
+        text = text[:-1]
+    return text + "..."
+
+
+def build_contact_sheet(images: Sequence[Union[np.ndarray, Image.Image]],
+                        titles: Optional[Sequence[str]] = None,
+                        cols: Optional[int] = None,
+                        cell_size: Tuple[int, int] = DEFAULT_CELL_SIZE) -> np.ndarray:
+    """
+    Build a labelled contact sheet from a list of images.
+
+    Args:
+        images: Images as numpy arrays or PIL images (any size, mode or dtype)
+        titles: Label for each image (optional)
+        cols: Number of columns (calculated automatically if None)
+        cell_size: Maximum (width, height) of each thumbnail
+
+    Returns:
+        Contact sheet as an RGB uint8 numpy array
+    """
+    n_images = len(images)
+    if n_images == 0:
+        raise ValueError("At least one image is required to build a contact sheet")
+    titles = list(titles) if titles is not None else [""] * n_images
+
+    cols = cols or min(DEFAULT_MAX_COLS, n_images)
+    rows = (n_images + cols - 1) // cols
+    cell_width, cell_height = cell_size
+    slot_width = cell_width + 2 * CELL_PADDING
+    slot_height = cell_height + LABEL_HEIGHT + 2 * CELL_PADDING
+
+    canvas = np.full((rows * slot_height, cols * slot_width, 3), BACKGROUND_VALUE, dtype=np.uint8)
+
+    for index, image in enumerate(images):
+        row, col = divmod(index, cols)
+        thumb = _thumbnail(image, cell_width, cell_height)
+        thumb_height, thumb_width = thumb.shape[:2]
+
+        # Centre the thumbnail in its cell
+        top = row * slot_height + CELL_PADDING + (cell_height - thumb_height) // 2
+        left = col * slot_width + CELL_PADDING + (cell_width - thumb_width) // 2
+        canvas[top:top + thumb_height, left:left + thumb_width] = thumb
+
+        if index < len(titles) and titles[index]:
+            label = _fit_label(str(titles[index]), cell_width)
+            text_width = cv2.getTextSize(label, LABEL_FONT, LABEL_FONT_SCALE, 1)[0][0]
+            baseline_y = row * slot_height + CELL_PADDING + cell_height + LABEL_HEIGHT - 8
+            text_x = col * slot_width + CELL_PADDING + (cell_width - text_width) // 2
+            cv2.putText(canvas, label, (text_x, baseline_y), LABEL_FONT, LABEL_FONT_SCALE,
+                        LABEL_COLOR, 1, cv2.LINE_AA)
+
+    return canvas
+
+
+def save_contact_sheet(images: Sequence[Union[np.ndarray, Image.Image]],
+                       output_path: str,
+                       titles: Optional[Sequence[str]] = None,
+                       cols: Optional[int] = None,
+                       cell_size: Tuple[int, int] = DEFAULT_CELL_SIZE) -> str:
+    """
+    Build a contact sheet and write it straight to disk.
+
+    Args:
+        images: Images as numpy arrays or PIL images
+        output_path: File path for the sheet (format chosen by extension)
+        titles: Label for each image (optional)
+        cols: Number of columns (calculated automatically if None)
+        cell_size: Maximum (width, height) of each thumbnail
+
+    Returns:
+        The path the sheet was written to
+
+    Raises:
+        IOError: If the sheet cannot be written
+    """
+    sheet = build_contact_sheet(images, titles, cols=cols, cell_size=cell_size)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if not cv2.imwrite(output_path, cv2.cvtColor(sheet, cv2.COLOR_RGB2BGR)):
+        raise IOError(f"Unable to write contact sheet to {output_path}")
+    return output_path
+
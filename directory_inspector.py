@@ -8,86 +8,52 @@ from tkinter import filedialog, messagebox, simpledialog
 import customtkinter as ctk
 from customtkinter import ThemeManager  # To get theme colors
 
+from directory_index import DirectoryIndex
+from directory_scanner import list_directory_items
+
 
 # --- Core Logic (Improved Efficiency) ---
-def get_directory_items_improved(base_path, status_callback=None):
+def get_directory_items_improved(base_path, status_callback=None, index=None, full=False):
     """
     Gets items directly under base_path and calculates folder sizes efficiently.
 
+    Folder sizes come from directory_scanner, which sizes each entry with a
+    single stat from os.scandir and reads subtrees on several threads. With
+    an index, only folders that changed since the last scan are read again.
+
     Args:
         base_path (str): The directory path to inspect.
         status_callback (callable, optional): Function to call with status updates.
+        index (DirectoryIndex, optional): Persistent index of folder sizes.
+        full (bool): Read every folder again instead of trusting unchanged ones.
 
     Returns:
         list: A list of tuples: (name, size, type, path).
               Returns None if base_path is invalid or inaccessible.
     """
-    items = []
-    folder_sizes = {}  # Store calculated sizes {path: size}
-    permission_errors = []  # Collect permission errors
-
-    def onerror(os_error):
-        # Custom error handler for os.walk to report errors without stopping
-        print(f"PermissionError accessing: {os_error.filename} - {os_error.strerror}")
-        permission_errors.append(os_error.filename)
+    def progress(files, size, directories):
         if status_callback:
-            # Update status briefly about permission issue
-            status_callback(f"Permission denied: {os.path.basename(os_error.filename)}...")
+            status_callback(f"Scanning: {base_path}... {files:,} files, {format_size(size)}")
 
     try:
-        # Check if path is valid and accessible before walking
+        # Check if path is valid and accessible before scanning
         if not os.path.isdir(base_path):
             if status_callback: status_callback(f"Error: Path not found or not a directory: {base_path}")
             return None
-        # Attempt a listing to check permissions early
-        os.listdir(base_path)
 
         if status_callback: status_callback(f"Scanning: {base_path}...")
+        items, errors = list_directory_items(base_path, progress=progress, index=index, full=full)
 
-        # Use topdown=False to calculate directory sizes after their contents
-        for root, dirs, files in os.walk(base_path, topdown=False, onerror=onerror):
-            current_dir_size = 0
-
-            # Calculate size of files in the current directory
-            for f in files:
-                file_path = os.path.join(root, f)
-                try:
-                    # Check if it's a symbolic link, skip if broken
-                    if os.path.islink(file_path) and not os.path.exists(file_path):
-                        print(f"Skipping broken link: {file_path}")
-                        if root == base_path:
-                            items.append((f, -2, "LINK (Broken)", file_path))  # Indicate broken link
-                        continue
-
-                    file_size = os.path.getsize(file_path)
-                    current_dir_size += file_size
-                    # If the file is directly in the base_path, add it to items
-                    if root == base_path:
-                        item_type = "LINK" if os.path.islink(file_path) else "FILE"
-                        items.append((f, file_size, item_type, file_path))
-                except OSError as e:
-                    print(f"Could not get size for file: {file_path} - {e}")
-                    # Optionally add file with size 0 or -1 to indicate error
-                    if root == base_path:
-                        items.append((f, -1, "FILE (Error)", file_path))  # Indicate error with -1
-
-            # Add sizes of subdirectories already calculated
-            for d in dirs:
-                dir_path = os.path.join(root, d)
-                sub_dir_size = folder_sizes.get(dir_path, 0)  # Get calculated size
-                current_dir_size += sub_dir_size
-                # If the folder is directly in the base_path, add it to items
-                if root == base_path:
-                    item_type = "FOLDER_LINK" if os.path.islink(dir_path) else "FOLDER"
-                    items.append((d, sub_dir_size, item_type, dir_path))
-
-            # Store the total size of the current directory
-            folder_sizes[root] = current_dir_size
+        # Report unreadable entries without stopping the scan
+        for path, message in errors:
+            print(f"Could not read: {path} - {message}")
 
         if status_callback:
             final_msg = "Scan complete."
-            if permission_errors:
-                final_msg += f" ({len(permission_errors)} permission error(s))"
+            if index is not None and index.last_scan and index.last_scan.directories:
+                final_msg += f" {index.last_scan.reused:,} of {index.last_scan.directories:,} folders unchanged."
+            if errors:
+                final_msg += f" ({len(errors)} item(s) could not be read)"
             status_callback(final_msg)
         return items
 
@@ -169,7 +135,11 @@ class DirectoryInspectorApp(ctk.CTk):
 
         self.current_items = []
         self.scan_thread = None
-        self.path_history = {}
+        try:
+            self.index = DirectoryIndex()  # Persistent folder sizes for incremental rescans
+        except Exception as e:
+            print(f"Directory index unavailable, scanning in full: {e}")
+            self.index = None
         self.current_path = ""
         self.sort_ascending = False  # Default: descending for size, ascending for name
 
@@ -192,6 +162,10 @@ class DirectoryInspectorApp(ctk.CTk):
         self.browse_button = ctk.CTkButton(self.top_frame, text="Browse...", command=self.browse_directory, width=80)
         self.browse_button.grid(row=0, column=2, padx=5, pady=5)
 
+        self.full_rescan_var = ctk.BooleanVar(value=False)
+        self.full_rescan_check = ctk.CTkCheckBox(self.top_frame, text="Full rescan", variable=self.full_rescan_var)
+        self.full_rescan_check.grid(row=0, column=3, padx=5, pady=5)
+
         # --- Breadcrumb Frame ---
         self.breadcrumb_frame = ctk.CTkFrame(self)
         self.breadcrumb_frame.grid(row=1, column=0, padx=10, pady=(0, 5), sticky="ew")
@@ -404,7 +378,7 @@ class DirectoryInspectorApp(ctk.CTk):
             self.back_button.configure(state="disabled")
 
     def navigate_to_folder(self, folder_path):
-        """Navigate to the specified folder path (scan if not cached)."""
+        """Navigate to the specified folder path (rescans only what changed when indexed)."""
         if not os.path.isdir(folder_path):
             messagebox.showerror("Error", f"Cannot navigate: Not a valid directory.\n{folder_path}")
             return
@@ -418,15 +392,7 @@ class DirectoryInspectorApp(ctk.CTk):
         can_go_back = parent_of_target != self.current_path and os.path.isdir(parent_of_target)
         self.back_button.configure(state="normal" if can_go_back else "disabled")
 
-        # Check cache
-        if folder_path in self.path_history:
-            self.current_items = self.path_history[folder_path]
-            self.sort_and_display()
-            self.update_status(
-                f"Loaded {len(self.current_items)} items from cache for {os.path.basename(folder_path)}.")
-        else:
-            # Scan the new folder
-            self.start_scan()  # This will also update current_path and breadcrumb
+        self.start_scan()
 
     def _set_controls_state(self, state):
         """Enable/disable controls during scan. state='disabled' or 'normal'"""
@@ -458,8 +424,10 @@ class DirectoryInspectorApp(ctk.CTk):
         self.status_label_var.set("Scanning...")
         self.progress_bar.set(0)
         self._clear_results()
+        full = self.full_rescan_var.get()
         def scan():
-            items = get_directory_items_improved(path, status_callback=self.update_status)
+            items = get_directory_items_improved(path, status_callback=self.update_status,
+                                                 index=self.index, full=full)
             self.current_items = items if items else []
             self.sort_and_display()
             self.status_label_var.set("Scan complete.")
@@ -471,10 +439,10 @@ class DirectoryInspectorApp(ctk.CTk):
         items = None
         error_occurred = False
         try:
-            items = get_directory_items_improved(base_path, status_callback=self.update_status)
+            items = get_directory_items_improved(base_path, status_callback=self.update_status,
+                                                 index=self.index, full=self.full_rescan_var.get())
             if items is not None:
                 self.current_items = items
-                self.path_history[base_path] = items  # Cache results
                 # Schedule GUI update back on the main thread
                 self.after(0, self.sort_and_display)
             else:
@@ -0,0 +1,221 @@
+"""
+Parallel directory size scanning with os.scandir.
+
+os.walk plus os.path.getsize/islink/exists costs three or four system calls
+per file on top of the directory listing. Here every entry is classified
+from the listing itself (DirEntry.is_dir and is_symlink use the file type
+the directory read already returned) and sized with a single
+DirEntry.stat(follow_symlinks=False), which on Windows needs no extra
+system call at all.
+
+Subtrees are walked concurrently by a pool of threads that share one work
+list of directories. scandir and stat release the GIL while they wait on the
+filesystem, so on network storage many directory reads are in flight at
+once instead of one after another.
+
+Symlinks are never followed: a link counts as the link itself, so a linked
+file is not counted twice and linked directories cannot form cycles. Only
+the totals per scanned root are kept, so memory use does not grow with the
+size of the tree.
+
+This module only needs the standard library, so it can run headless
+without customtkinter.
+
+Example:
+    items, errors = list_directory_items("/mnt/nas/projects", workers=32)
+    for name, size, item_type, path in sorted(items, key=lambda item: item[1], reverse=True):
+        print(f"{size:>15} {item_type:<12} {name}")
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+# Constants
+DEFAULT_WORKERS = 16  # directory reads in flight; network filesystems benefit from more
+PROGRESS_INTERVAL = 0.5  # seconds between progress callbacks
+BROKEN_LINK_SIZE = -2
+ERROR_SIZE = -1
+
+
+class ScanResult(NamedTuple):
+    """Totals of a scan_sizes or walk_parallel run."""
+    totals: Dict[str, Tuple[int, int]]  # root -> (files, bytes) of its whole subtree
+    files: int
+    bytes: int
+    directories: int
+    errors: List[Tuple[str, str]]  # (path, message) of entries that could not be read
+    seconds: float
+    reused: int = 0  # directories whose listing came from an index instead of the filesystem
+
+
+def _scan_directory(path: str) -> Tuple[int, int, List[str], List[Tuple[str, str]]]:
+    """
+    List one directory.
+
+    Returns:
+        (files, bytes, subdirectories, errors); everything that is not a
+        real directory (files, symlinks, special files) counts as a file
+    """
+    files = 0
+    size = 0
+    subdirectories = []
+    errors = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.path)
+                    else:
+                        size += entry.stat(follow_symlinks=False).st_size
+                        files += 1
+                except OSError as e:
+                    errors.append((entry.path, e.strerror or str(e)))
+    except OSError as e:
+        errors.append((path, e.strerror or str(e)))
+    return files, size, subdirectories, errors
+
+
+def walk_parallel(roots: List[str],
+                  visit: Callable[[str], Tuple[int, int, List[str], List[Tuple[str, str]]]],
+                  workers: int = DEFAULT_WORKERS,
+                  progress: Optional[Callable[[int, int, int], None]] = None) -> ScanResult:
+    """
+    Visit every directory below several roots on a pool of threads.
+
+    Args:
+        roots: Directories to start from
+        visit: Called from the worker threads with each directory; returns
+            (files, bytes, subdirectories, errors) like _scan_directory.
+            Only the returned subdirectories are visited next.
+        workers: Number of threads visiting directories concurrently
+        progress: Called from the calling thread every PROGRESS_INTERVAL
+            seconds with the files, bytes and directories visited so far
+
+    Returns:
+        ScanResult with the totals of each root's subtree
+    """
+    start = time.perf_counter()
+    condition = threading.Condition()
+    pending = [(root, root) for root in roots]  # (directory, root it counts towards)
+    totals = {root: [0, 0] for root in roots}
+    errors: List[Tuple[str, str]] = []
+    counts = [0, 0, 0]  # files, bytes, directories
+    unfinished = len(pending)
+
+    def work() -> None:
+        nonlocal unfinished
+        while True:
+            with condition:
+                while not pending and unfinished:
+                    condition.wait()
+                if not unfinished:
+                    return
+                path, root = pending.pop()  # depth first keeps the work list short
+            try:
+                files, size, subdirectories, directory_errors = visit(path)
+            except Exception as e:
+                files, size, subdirectories, directory_errors = 0, 0, [], [(path, str(e))]
+            with condition:
+                pending.extend((subdirectory, root) for subdirectory in subdirectories)
+                totals[root][0] += files
+                totals[root][1] += size
+                counts[0] += files
+                counts[1] += size
+                counts[2] += 1
+                errors.extend(directory_errors)
+                unfinished += len(subdirectories) - 1
+                if not unfinished:
+                    condition.notify_all()
+                elif subdirectories:
+                    condition.notify(len(subdirectories))
+
+    threads = [threading.Thread(target=work, name=f"directory-scanner-{i}", daemon=True)
+               for i in range(max(1, workers) if roots else 0)]
+    for thread in threads:
+        thread.start()
+    with condition:
+        while unfinished:
+            condition.wait(PROGRESS_INTERVAL)
+            if progress and unfinished:
+                progress(*counts)
+    for thread in threads:
+        thread.join()
+
+    return ScanResult({root: (files, size) for root, (files, size) in totals.items()},
+                      counts[0], counts[1], counts[2], errors, time.perf_counter() - start)
+
+
+def scan_sizes(roots: List[str], workers: int = DEFAULT_WORKERS,
+               progress: Optional[Callable[[int, int, int], None]] = None) -> ScanResult:
+    """
+    Total the files and bytes below each of several directories.
+
+    Args:
+        roots: Directories to total
+        workers: Number of threads reading directories concurrently
+        progress: See walk_parallel
+
+    Returns:
+        ScanResult with per-root totals; unreadable directories and entries
+        are listed in its errors and left out of the totals
+    """
+    return walk_parallel(roots, _scan_directory, workers, progress)
+
+
+def list_directory_items(base_path: str, workers: int = DEFAULT_WORKERS,
+                         progress: Optional[Callable[[int, int, int], None]] = None,
+                         index=None, full: bool = False) -> Tuple[List[Tuple[str, int, str, str]], List[Tuple[str, str]]]:
+    """
+    List the items directly under a directory with the total size of each folder.
+
+    Args:
+        base_path: Directory to inspect
+        workers: Number of threads reading directories concurrently
+        progress: See walk_parallel
+        index: directory_index.DirectoryIndex to take folder sizes from,
+            re-reading only directories that changed since they were indexed
+            (optional; folders are scanned in full without one)
+        full: With an index, read every directory again instead of trusting unchanged ones
+
+    Returns:
+        (items, errors): items are (name, size, type, path) tuples, where type is
+        FILE, LINK, FOLDER or FOLDER_LINK (linked folders are not followed and
+        have size 0), 'LINK (Broken)' with size BROKEN_LINK_SIZE or
+        'FILE (Error)' with size ERROR_SIZE; errors are (path, message) pairs
+        for entries below base_path that could not be read
+
+    Raises:
+        OSError: If base_path cannot be listed (FileNotFoundError, PermissionError, ...)
+    """
+    items = []
+    folders = []
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_symlink():
+                    if entry.is_dir():
+                        items.append((entry.name, 0, "FOLDER_LINK", entry.path))
+                    else:
+                        try:
+                            items.append((entry.name, entry.stat().st_size, "LINK", entry.path))
+                        except OSError:
+                            items.append((entry.name, BROKEN_LINK_SIZE, "LINK (Broken)", entry.path))
+                elif entry.is_dir():
+                    folders.append(entry)
+                else:
+                    items.append((entry.name, entry.stat(follow_symlinks=False).st_size, "FILE", entry.path))
+            except OSError:
+                items.append((entry.name, ERROR_SIZE, "FILE (Error)", entry.path))
+
+    roots = [entry.path for entry in folders]
+    if index is not None:
+        result = index.scan(roots, workers, progress, full=full)
+    else:
+        result = scan_sizes(roots, workers, progress)
+    for entry in folders:
+        items.append((entry.name, result.totals[entry.path][1], "FOLDER", entry.path))
+    return items, result.errors
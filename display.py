@@ -0,0 +1,219 @@
+"""
+Display backends for showing processing results.
+
+This module decides how result figures are presented: in an interactive
+matplotlib window, rendered headlessly to PNG files on a background thread,
+or not at all. Headless rendering draws on matplotlib's Agg canvas (or a
+contact sheet) directly and never imports ``pyplot``, so it does not pull
+in a GUI toolkit and is safe to use from batch jobs and servers.
+
+The mode defaults to ``"window"`` and can be changed with
+:func:`set_display_mode` or the ``IMAGE_PROCESSING_DISPLAY`` environment
+variable.
+"""
+
+import atexit
+import os
+import queue
+import re
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+# Constants
+DISPLAY_MODE_ENV = "IMAGE_PROCESSING_DISPLAY"
+PREVIEW_DIR_ENV = "IMAGE_PROCESSING_PREVIEW_DIR"
+DISPLAY_MODES = ("window", "headless", "off")
+DEFAULT_PREVIEW_DIR = os.path.join("output", "previews")
+RENDER_QUEUE_SIZE = 16
+RENDER_DPI = 100
+
+_display_mode = os.environ.get(DISPLAY_MODE_ENV, "window").lower()
+if _display_mode not in DISPLAY_MODES:
+    _display_mode = "window"
+_preview_dir = os.environ.get(PREVIEW_DIR_ENV, DEFAULT_PREVIEW_DIR)
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def set_display_mode(mode: str, preview_dir: Optional[str] = None) -> None:
+    """
+    Select how results are displayed.
+
+    Args:
+        mode: 'window' (interactive matplotlib window), 'headless' (render PNG
+            files on a background thread) or 'off' (skip display entirely)
+        preview_dir: Directory where headless renders are written (optional)
+
+    Raises:
+        ValueError: If the mode is not supported
+    """
+    global _display_mode, _preview_dir
+
+    mode = mode.lower()
+    if mode not in DISPLAY_MODES:
+        raise ValueError(f"Unsupported display mode: {mode}. Available modes: {', '.join(DISPLAY_MODES)}")
+
+    _display_mode = mode
+    if preview_dir:
+        _preview_dir = preview_dir
+        if _renderer is not None:
+            _renderer.output_dir = preview_dir
+
+
+def get_display_mode() -> str:
+    """Return the current display mode."""
+    return _display_mode
+
+
+def build_comparison_figure(original: np.ndarray, processed: np.ndarray,
+                            original_title: str, processed_title: str,
+                            figsize: Tuple[int, int] = (12, 6)):
+    """
+    Build a side-by-side comparison figure on an Agg canvas.
+
+    Args:
+        original: Original image as numpy array
+        processed: Processed image as numpy array
+        original_title: Title for the original image
+        processed_title: Title for the processed image
+        figsize: Figure size in inches
+
+    Returns:
+        matplotlib Figure attached to an Agg canvas
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+
+    for index, (image, title) in enumerate([(original, original_title), (processed, processed_title)]):
+        ax = fig.add_subplot(1, 2, index + 1)
+        ax.set_title(title)
+        ax.imshow(image)
+        ax.axis('off')
+
+    fig.tight_layout()
+    return fig
+
+
+def save_figure(fig, path: str) -> None:
+    """Write an Agg-backed figure to a PNG file."""
+    fig.savefig(path, dpi=RENDER_DPI)
+
+
+def _slugify(text: str) -> str:
+    """Turn a title into a short file-name friendly string."""
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_").lower()
+    return slug[:40] or "render"
+
+
+class HeadlessRenderer:
+    """
+    Renders previews to PNG files on a background thread.
+
+    Each job is a callable that draws and writes one file, so figure layout
+    and PNG encoding both happen on the worker thread and callers only pay
+    for putting a job on a bounded queue. When the queue is full, ``submit``
+    blocks until the worker catches up, which keeps memory bounded in long
+    batch runs.
+
+    Images passed to the renderer are not copied and must not be modified
+    until the render has finished (see :meth:`flush`).
+    """
+
+    def __init__(self, output_dir: str = DEFAULT_PREVIEW_DIR,
+                 max_pending: int = RENDER_QUEUE_SIZE):
+        self.output_dir = output_dir
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.rendered_count = 0
+        self.failed_count = 0
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="headless-renderer", daemon=True)
+                self._thread.start()
+
+    def _next_path(self, title: str) -> str:
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+        filename = f"{int(time.time() * 1000)}_{counter:04d}_{_slugify(title)}.png"
+        return os.path.join(self.output_dir, filename)
+
+    def submit(self, render: Callable[[str], None], title: str = "render",
+               output_path: Optional[str] = None) -> str:
+        """
+        Queue a preview for rendering.
+
+        Args:
+            render: Callable that draws the preview and writes it to the given path
+            title: Title used to name the output file
+            output_path: Explicit PNG path (optional, generated if omitted)
+
+        Returns:
+            Path the PNG will be written to
+        """
+        path = output_path or self._next_path(title)
+        self._ensure_worker()
+        self._queue.put((render, path))
+        return path
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                render, path = job
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                render(path)
+                self.rendered_count += 1
+            except Exception as e:
+                self.failed_count += 1
+                print(f"Error rendering preview: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued render has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending renders and stop the worker thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+
+def get_renderer() -> HeadlessRenderer:
+    """Return the process-wide headless renderer, creating it on first use."""
+    global _renderer
+
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = HeadlessRenderer(output_dir=_preview_dir)
+        return _renderer
+
+
+def flush_renders() -> None:
+    """Block until all headless renders queued so far have been written."""
+    if _renderer is not None:
+        _renderer.flush()
+
+
+@atexit.register
+def _close_renderer() -> None:
+    if _renderer is not None:
+        _renderer.close()
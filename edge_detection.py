@@ -5,17 +5,25 @@ This module provides implementations of various edge detection algorithms
 including Canny edge detection.
 """
 
+import os
+
 import numpy as np
 from scipy.ndimage import convolve, gaussian_filter
 from typing import Tuple, Optional
 
+from image_io import AsyncImageWriter
+from image_pyramid import get_pyramid
 from image_utils import load_image, save_image, display_comparison
+from memory_profiling import MemoryProfiler, profile_stage
+from result_cache import ResultCache
+from roi import ROI, operation_halo, process_roi, roi_key
 
 
 def canny_edge_detector(image: np.ndarray, 
                         blur: float = 1.0, 
                         high_threshold: int = 91, 
-                        low_threshold: int = 31) -> np.ndarray:
+                        low_threshold: int = 31,
+                        profiler: Optional[MemoryProfiler] = None) -> np.ndarray:
     """
     Apply Canny edge detection algorithm to an image.
     
@@ -24,88 +32,94 @@ def canny_edge_detector(image: np.ndarray,
         blur: Gaussian blur sigma value
         high_threshold: High threshold for edge detection
         low_threshold: Low threshold for edge detection
+        profiler: Records peak memory of the blur, gradient, nms and
+            hysteresis stages (optional)
         
     Returns:
         Binary edge map as numpy array
     """
-    # Convert to float to prevent clipping values
-    image = np.array(image, dtype=float)
-
-    # Gaussian blur to reduce noise
-    blurred = gaussian_filter(image, blur)
-
-    # Use sobel filters to get horizontal and vertical gradients
-    gradient_h = convolve(blurred, [[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
-    gradient_v = convolve(blurred, [[1, 2, 1], [0, 0, 0], [-1, -2, -1]])
-
-    # Get gradient magnitude and direction
-    gradient = np.power(np.power(gradient_h, 2.0) + np.power(gradient_v, 2.0), 0.5)
-    theta = np.arctan2(gradient_v, gradient_h)
-    # Quantize direction into 4 directions (0, 45, 90, 135 degrees)
-    theta_quantized = (np.round(theta * (5.0 / np.pi)) + 5) % 5
-
-    # Non-maximum suppression
-    gradient_suppressed = gradient.copy()
-    for r in range(image.shape[0]):
-        for c in range(image.shape[1]):
-            # Suppress pixels at the image edge
-            if r == 0 or r == image.shape[0] - 1 or c == 0 or c == image.shape[1] - 1:
-                gradient_suppressed[r, c] = 0
-                continue
-                
-            tq = theta_quantized[r, c] % 4
-
-            if tq == 0:  # 0 is E-W (horizontal)
-                if gradient[r, c] <= gradient[r, c-1] or gradient[r, c] <= gradient[r, c+1]:
-                    gradient_suppressed[r, c] = 0
-            elif tq == 1:  # 1 is NE-SW
-                if gradient[r, c] <= gradient[r-1, c+1] or gradient[r, c] <= gradient[r+1, c-1]:
-                    gradient_suppressed[r, c] = 0
-            elif tq == 2:  # 2 is N-S (vertical)
-                if gradient[r, c] <= gradient[r-1, c] or gradient[r, c] <= gradient[r+1, c]:
-                    gradient_suppressed[r, c] = 0
-            elif tq == 3:  # 3 is NW-SE
-                if gradient[r, c] <= gradient[r-1, c-1] or gradient[r, c] <= gradient[r+1, c+1]:
+    with profile_stage(profiler, "blur"):
+        # Convert to float to prevent clipping values
+        image = np.array(image, dtype=float)
+
+        # Gaussian blur to reduce noise
+        blurred = gaussian_filter(image, blur)
+
+    with profile_stage(profiler, "gradient"):
+        # Use sobel filters to get horizontal and vertical gradients
+        gradient_h = convolve(blurred, [[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
+        gradient_v = convolve(blurred, [[1, 2, 1], [0, 0, 0], [-1, -2, -1]])
+
+        # Get gradient magnitude and direction
+        gradient = np.power(np.power(gradient_h, 2.0) + np.power(gradient_v, 2.0), 0.5)
+        theta = np.arctan2(gradient_v, gradient_h)
+        # Quantize direction into 4 directions (0, 45, 90, 135 degrees)
+        theta_quantized = (np.round(theta * (5.0 / np.pi)) + 5) % 5
+
+    with profile_stage(profiler, "nms"):
+        # Non-maximum suppression
+        gradient_suppressed = gradient.copy()
+        for r in range(image.shape[0]):
+            for c in range(image.shape[1]):
+                # Suppress pixels at the image edge
+                if r == 0 or r == image.shape[0] - 1 or c == 0 or c == image.shape[1] - 1:
                     gradient_suppressed[r, c] = 0
-
-    # Double threshold
-    strong_edges = (gradient_suppressed > high_threshold)
-
-    # Strong has value 2, weak has value 1
-    thresholded_edges = np.array(strong_edges, dtype=np.uint8) + (gradient_suppressed > low_threshold)
-
-    # Tracing edges with hysteresis
-    # Find weak edge pixels near strong edge pixels
-    final_edges = strong_edges.copy()
-    current_pixels = []
-    
-    for r in range(1, image.shape[0] - 1):
-        for c in range(1, image.shape[1] - 1):
-            if thresholded_edges[r, c] != 1:
-                continue  # Not a weak pixel
-
-            # Get 3x3 patch
-            local_patch = thresholded_edges[r-1:r+2, c-1:c+2]
-            patch_max = local_patch.max()
-            if patch_max == 2:
-                current_pixels.append((r, c))
-                final_edges[r, c] = 1
-
-    # Extend strong edges based on current pixels
-    while len(current_pixels) > 0:
-        new_pixels = []
-        for r, c in current_pixels:
-            for dr in range(-1, 2):
-                for dc in range(-1, 2):
-                    if dr == 0 and dc == 0:
-                        continue
-                    r2 = r + dr
-                    c2 = c + dc
-                    if thresholded_edges[r2, c2] == 1 and final_edges[r2, c2] == 0:
-                        # Copy this weak pixel to final result
-                        new_pixels.append((r2, c2))
-                        final_edges[r2, c2] = 1
-        current_pixels = new_pixels
+                    continue
+
+                tq = theta_quantized[r, c] % 4
+
+                if tq == 0:  # 0 is E-W (horizontal)
+                    if gradient[r, c] <= gradient[r, c-1] or gradient[r, c] <= gradient[r, c+1]:
+                        gradient_suppressed[r, c] = 0
+                elif tq == 1:  # 1 is NE-SW
+                    if gradient[r, c] <= gradient[r-1, c+1] or gradient[r, c] <= gradient[r+1, c-1]:
+                        gradient_suppressed[r, c] = 0
+                elif tq == 2:  # 2 is N-S (vertical)
+                    if gradient[r, c] <= gradient[r-1, c] or gradient[r, c] <= gradient[r+1, c]:
+                        gradient_suppressed[r, c] = 0
+                elif tq == 3:  # 3 is NW-SE
+                    if gradient[r, c] <= gradient[r-1, c-1] or gradient[r, c] <= gradient[r+1, c+1]:
+                        gradient_suppressed[r, c] = 0
+
+    with profile_stage(profiler, "hysteresis"):
+        # Double threshold
+        strong_edges = (gradient_suppressed > high_threshold)
+
+        # Strong has value 2, weak has value 1
+        thresholded_edges = np.array(strong_edges, dtype=np.uint8) + (gradient_suppressed > low_threshold)
+
+        # Tracing edges with hysteresis
+        # Find weak edge pixels near strong edge pixels
+        final_edges = strong_edges.copy()
+        current_pixels = []
+
+        for r in range(1, image.shape[0] - 1):
+            for c in range(1, image.shape[1] - 1):
+                if thresholded_edges[r, c] != 1:
+                    continue  # Not a weak pixel
+
+                # Get 3x3 patch
+                local_patch = thresholded_edges[r-1:r+2, c-1:c+2]
+                patch_max = local_patch.max()
+                if patch_max == 2:
+                    current_pixels.append((r, c))
+                    final_edges[r, c] = 1
+
+        # Extend strong edges based on current pixels
+        while len(current_pixels) > 0:
+            new_pixels = []
+            for r, c in current_pixels:
+                for dr in range(-1, 2):
+                    for dc in range(-1, 2):
+                        if dr == 0 and dc == 0:
+                            continue
+                        r2 = r + dr
+                        c2 = c + dc
+                        if thresholded_edges[r2, c2] == 1 and final_edges[r2, c2] == 0:
+                            # Copy this weak pixel to final result
+                            new_pixels.append((r2, c2))
+                            final_edges[r2, c2] = 1
+            current_pixels = new_pixels
 
     return final_edges
 
@@ -116,7 +130,13 @@ def detect_edges(image_path: str,
                 blur: float = 1.0,
                 high_threshold: int = 91,
                 low_threshold: int = 31,
-                display_result: bool = True) -> np.ndarray:
+                display_result: bool = False,
+                writer: Optional[AsyncImageWriter] = None,
+                level: int = 0,
+                cache: Optional[ResultCache] = None,
+                roi: Optional[ROI] = None,
+                composite: bool = False,
+                profiler: Optional[MemoryProfiler] = None) -> np.ndarray:
     """
     Detect edges in an image using the specified method.
     
@@ -128,31 +148,75 @@ def detect_edges(image_path: str,
         high_threshold: High threshold for edge detection
         low_threshold: Low threshold for edge detection
         display_result: Whether to display the result
+        writer: Background writer used to save the output without blocking (optional)
+        level: Pyramid level to process at (0 is full resolution, each level
+            halves both dimensions); decoded levels are cached across calls
+        cache: Result cache; with an output path, an identical earlier run is
+            reused and the output is written synchronously (optional)
+        roi: Only detect edges in this (x, y, width, height) box or boolean
+            mask, given in full-resolution pixels (optional)
+        composite: With an ROI, return a full-size edge map that is empty
+            outside the ROI (True) instead of only the ROI crop (False)
+        profiler: Records peak memory per stage (decode, blur, gradient,
+            nms, hysteresis, save); see memory_profiling (optional)
         
     Returns:
-        Edge map as numpy array
+        Edge map as numpy array (decoded from the cached output on a cache hit)
     """
-    # Load the image
-    image = load_image(image_path, as_grayscale=True)
-    
-    # Apply edge detection
-    if method.lower() == "canny":
-        edges = canny_edge_detector(
+    if method.lower() != "canny":
+        raise ValueError(f"Unsupported edge detection method: {method}")
+
+    # Reuse the output of an identical earlier run
+    cache_key = None
+    if cache is not None and output_path:
+        params = {"method": method, "blur": blur, "high_threshold": high_threshold,
+                  "low_threshold": low_threshold, "level": level}
+        if roi is not None:
+            params.update(roi=roi_key(roi), composite=composite)
+        cache_key = cache.key(image_path, "edge", params, os.path.splitext(output_path)[1])
+        if cache.fetch(cache_key, output_path):
+            edges = load_image(output_path, as_grayscale=True) > 127
+            if display_result and roi is None:
+                image = get_pyramid(image_path, as_grayscale=True).level(level)
+                display_comparison(image, edges, "Original", f"{method.capitalize()} Edges (cached)")
+            return edges
+
+    def detect(image: np.ndarray) -> np.ndarray:
+        return canny_edge_detector(
             image, 
             blur=blur, 
             high_threshold=high_threshold, 
-            low_threshold=low_threshold
+            low_threshold=low_threshold,
+            profiler=profiler
         )
+
+    if roi is None:
+        # Load the image (shared with other operations through the pyramid cache)
+        with profile_stage(profiler, "decode"):
+            image = get_pyramid(image_path, as_grayscale=True).level(level)
+        edges = detect(image)
+        shown = edges
     else:
-        raise ValueError(f"Unsupported edge detection method: {method}")
+        # Only read and process the ROI plus the halo the detector needs
+        with profile_stage(profiler, "roi"):
+            region = process_roi(image_path, roi, detect, operation_halo("edge", blur=blur),
+                                 as_grayscale=True, composite=composite, blank_background=True, level=level)
+        image, edges = region.original, region.image
+        x0, y0, x1, y1 = region.bounds
+        shown = edges[y0:y1, x0:x1] if composite else edges
     
     # Display the result if requested
     if display_result:
-        display_comparison(image, edges, "Original", f"{method.capitalize()} Edges")
+        display_comparison(image, shown, "Original", f"{method.capitalize()} Edges")
     
     # Save the result if an output path is provided
     if output_path:
-        save_image(edges, output_path)
+        with profile_stage(profiler, "save"):
+            if cache_key is not None:
+                if save_image(edges, output_path):
+                    cache.store(cache_key, output_path)
+            else:
+                save_image(edges, output_path, writer=writer)
     
     return edges
 
@@ -5,20 +5,40 @@ This module provides functions for applying various PIL filters to images
 and displaying the results.
 """
 
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, Union
 import numpy as np
 from PIL import Image, ImageFilter
 
+from contact_sheet import save_contact_sheet
+from image_pyramid import get_pyramid
 from image_utils import display_multiple_images, display_comparison
-
-
-def apply_pil_filters(image_path: str, display_result: bool = True) -> Dict[str, Image.Image]:
+from roi import ROI, operation_halo, process_roi
+
+
+FILTER_MAP = {
+    "blur": ImageFilter.BLUR,
+    "contour": ImageFilter.CONTOUR,
+    "detail": ImageFilter.DETAIL,
+    "edge_enhance": ImageFilter.EDGE_ENHANCE,
+    "edge_enhance_more": ImageFilter.EDGE_ENHANCE_MORE,
+    "emboss": ImageFilter.EMBOSS,
+    "find_edges": ImageFilter.FIND_EDGES,
+    "sharpen": ImageFilter.SHARPEN,
+    "smooth": ImageFilter.SMOOTH,
+    "smooth_more": ImageFilter.SMOOTH_MORE,
+    "gaussian_blur": ImageFilter.GaussianBlur(radius=10)
+}
+
+
+def apply_pil_filters(image_path: str, display_result: bool = False,
+                      sheet_path: Optional[str] = None) -> Dict[str, Image.Image]:
     """
     Apply various PIL filters to an image and optionally display the results.
 
     Args:
         image_path: Path to the input image
         display_result: Whether to display the filtered images
+        sheet_path: Path to write a contact sheet of all results to (optional)
 
     Returns:
         Dictionary mapping filter names to filtered images
@@ -44,23 +64,54 @@ def apply_pil_filters(image_path: str, display_result: bool = True) -> Dict[str,
         "Gaussian Blur": img.filter(ImageFilter.GaussianBlur(radius=10))
     }
 
+    images = list(filtered_images.values())
+    titles = list(filtered_images.keys())
+
+    # Write the contact sheet if requested
+    if sheet_path:
+        save_contact_sheet(images, sheet_path, titles)
+
     # Display the results if requested
     if display_result:
-        # Convert PIL images to numpy arrays for display
-        images = [np.array(img) for img in filtered_images.values()]
-        titles = list(filtered_images.keys())
-
-        # Display the images in a grid
         display_multiple_images(images, titles)
 
     return filtered_images
 
 
+def filter_image(image: Union[Image.Image, np.ndarray], filter_name: str) -> Image.Image:
+    """
+    Apply a single PIL filter to an in-memory image.
+
+    Accepts numpy arrays as well as PIL images, so a region sliced from a
+    memory-mapped image can be filtered without loading the whole file.
+
+    Args:
+        image: Input image as PIL image or numpy array
+        filter_name: Name of the filter to apply
+
+    Returns:
+        Filtered image
+    """
+    filter_name_lower = filter_name.lower()
+    if filter_name_lower not in FILTER_MAP:
+        raise ValueError(f"Unsupported filter: {filter_name}. Available filters: {', '.join(FILTER_MAP.keys())}")
+
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(np.ascontiguousarray(image))
+    if image.mode == 'P':
+        image = image.convert('RGB')
+
+    return image.filter(FILTER_MAP[filter_name_lower])
+
+
 def apply_single_filter(
         image_path: str, 
         filter_name: str, 
         output_path: Optional[str] = None,
-        display_result: bool = True
+        display_result: bool = False,
+        level: int = 0,
+        roi: Optional[ROI] = None,
+        composite: bool = False
 ) -> Image.Image:
     """
     Apply a single PIL filter to an image.
@@ -70,35 +121,38 @@ def apply_single_filter(
         filter_name: Name of the filter to apply
         output_path: Path to save the filtered image (optional)
         display_result: Whether to display the result
+        level: Pyramid level to process at (0 is full resolution, each level
+            halves both dimensions); every level comes from the shared cache,
+            EXIF-oriented and converted to RGB
+        roi: Only filter this (x, y, width, height) box or boolean mask, given
+            in full-resolution pixels (optional)
+        composite: With an ROI, return the full image with the region
+            filtered (True) instead of only the filtered crop (False);
+            this reads and copies the whole frame (see roi.process_roi)
 
     Returns:
         Filtered image
     """
-    # Load the image
-    img = Image.open(image_path)
-    if img.mode == 'P':
-        img = img.convert('RGB')
+    if roi is not None:
+        # Only read and process the ROI plus the halo the filter kernel needs
+        region = process_roi(image_path, roi, lambda image: np.asarray(filter_image(image, filter_name)),
+                             operation_halo("filter", filter_name=filter_name),
+                             composite=composite, level=level)
+        filtered_img = Image.fromarray(region.image)
+
+        if display_result:
+            x0, y0, x1, y1 = region.bounds
+            shown = region.image[y0:y1, x0:x1] if composite else region.image
+            display_comparison(region.original, shown, "Original", f"Filtered ({filter_name})")
+        if output_path:
+            filtered_img.save(output_path)
+        return filtered_img
+
+    # Load the image from the pyramid, EXIF-oriented RGB at every level
+    img = Image.fromarray(get_pyramid(image_path).level(level))
 
     # Apply the specified filter
-    filter_map = {
-        "blur": ImageFilter.BLUR,
-        "contour": ImageFilter.CONTOUR,
-        "detail": ImageFilter.DETAIL,
-        "edge_enhance": ImageFilter.EDGE_ENHANCE,
-        "edge_enhance_more": ImageFilter.EDGE_ENHANCE_MORE,
-        "emboss": ImageFilter.EMBOSS,
-        "find_edges": ImageFilter.FIND_EDGES,
-        "sharpen": ImageFilter.SHARPEN,
-        "smooth": ImageFilter.SMOOTH,
-        "smooth_more": ImageFilter.SMOOTH_MORE,
-        "gaussian_blur": ImageFilter.GaussianBlur(radius=10)
-    }
-
-    filter_name_lower = filter_name.lower()
-    if filter_name_lower not in filter_map:
-        raise ValueError(f"Unsupported filter: {filter_name}. Available filters: {', '.join(filter_map.keys())}")
-
-    filtered_img = img.filter(filter_map[filter_name_lower])
+    filtered_img = filter_image(img, filter_name)
 
     # Display the result if requested
     if display_result:
@@ -115,7 +169,7 @@ def apply_single_filter(
 if __name__ == "__main__":
     # Example usage
     # Apply all filters and display them
-    apply_pil_filters("images/image.jpg")
+    apply_pil_filters("images/image.jpg", display_result=True)
 
     # Apply a single filter
     apply_single_filter(
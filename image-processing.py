@@ -5,7 +5,6 @@ import cv2
 import numpy as np
 from PIL import Image
 from utils import save_image
-import imageio.v3 as iio
 
 # Constants
 KERNEL_SIZE = 3
@@ -42,7 +41,7 @@ class ImageSharpener:
         
         sharpening_kernel = self.create_sharpening_kernel_cv2()
         sharpened_image = cv2.filter2D(image, -1, sharpening_kernel)
-        save_image(output_image_path, sharpened_image)
+        save_image(cv2.cvtColor(sharpened_image, cv2.COLOR_BGR2RGB), output_image_path)
         print(f"Sharpened image saved to {output_image_path}")
 
     def sharpen_with_tensorflow(self, input_image_path: str, output_image_path: str) -> None:
@@ -62,7 +61,7 @@ class ImageSharpener:
             sess.run(tf.compat.v1.global_variables_initializer())
             output = sess.run(out, feed_dict={x: reshaped_img})
             normalized = self._normalize_output(output)
-            iio.imwrite(output_image_path, normalized, plugin='tifffile')
+            save_image(normalized, output_image_path)
 
     def _normalize_output(self, output):
         max_value = np.amax(output)
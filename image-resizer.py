@@ -1,12 +1,15 @@
 import os
-import time
 import tkinter as tk  # Keep tk for standard widgets like Canvas, messagebox, filedialog
+from concurrent.futures import Future, ThreadPoolExecutor
 from tkinter import filedialog, messagebox
 from typing import Optional, Tuple
 
 import customtkinter as ctk  # Import customtkinter
 from PIL import Image, ImageTk
 
+from image_pyramid import get_pyramid
+from image_resizer import DEFAULT_PROFILE, ENCODER_PROFILES, ImageResizer
+
 # --- Constants ---
 WINDOW_TITLE = "Image Resizer"
 DEFAULT_WINDOW_GEOMETRY = "1280x720"
@@ -15,150 +18,27 @@ DEFAULT_WINDOW_GEOMETRY = "1280x720"
 BACKGROUND_COLOR = "#f5f5f5" # Used by standard tk.Canvas
 
 
+PREVIEW_DEBOUNCE_MS = 150  # wait for the canvas to stop resizing before re-rendering
+PREVIEW_POLL_MS = 30  # how often the main loop checks for a finished preview
+PREVIEW_MARGIN = 20
+
 DEFAULT_PERCENTAGE = "50"
+DEFAULT_TARGET_KB = "200"
 DEFAULT_RESIZE_MODE = "percentage"
 
 # File type filters for dialogs (standard tkinter, unchanged)
 IMAGE_FILETYPES = [
-    ("Image files", "*.jpg *.jpeg *.png *.bmp *.gif *.webp"),
+    ("Image files", "*.jpg *.jpeg *.png *.bmp *.gif *.webp *.avif *.tif *.tiff"),
     ("All files", "*.*")
 ]
 SAVE_FILETYPES = [
     ("JPEG files", "*.jpg"),
     ("PNG files", "*.png"),
+    ("WebP files", "*.webp"),
+    ("AVIF files", "*.avif"),
     ("All files", "*.*")
 ]
 
-# --- Image Processing Helper (Unchanged) ---
-class ImageResizer:
-    """Handles the core image resizing logic."""
-
-    def resize_image(
-            self,
-            input_path: str,
-            output_path: Optional[str],
-            resize_mode: str,
-            percentage: Optional[str] = None,
-            width: Optional[str] = None,
-            height: Optional[str] = None,
-            maintain_aspect: bool = True
-    ) -> Tuple[int, int, int, int, str]:
-        """
-        Resizes an image based on provided parameters.
-
-        Args:
-            input_path: Path to the input image file.
-            output_path: Path to save the output image. If None, generates one.
-            resize_mode: 'percentage' or 'dimensions'.
-            percentage: Percentage value (as string) if mode is 'percentage'.
-            width: Target width (as string) if mode is 'dimensions'.
-            height: Target height (as string) if mode is 'dimensions'.
-            maintain_aspect: Whether to maintain aspect ratio if mode is 'dimensions'.
-
-        Returns:
-            A tuple: (original_width, original_height, new_width, new_height, actual_output_path)
-
-        Raises:
-            ValueError: If input parameters are invalid.
-            FileNotFoundError: If input file does not exist.
-            IOError: If image processing fails.
-        """
-        if not os.path.exists(input_path):
-            raise FileNotFoundError(f"Input file not found: {input_path}")
-
-        try:
-            img = Image.open(input_path)
-            orig_width, orig_height = img.size
-        except Exception as e:
-            raise IOError(f"Could not open image file: {e}")
-
-        new_width, new_height = None, None
-
-        if resize_mode == "percentage":
-            if percentage is None:
-                raise ValueError("Percentage value is required for percentage mode.")
-            try:
-                percent_val = float(percentage)
-                if percent_val <= 0:
-                    raise ValueError("Percentage must be greater than 0.")
-                new_width = int(orig_width * percent_val / 100)
-                new_height = int(orig_height * percent_val / 100)
-            except ValueError:
-                raise ValueError("Invalid percentage value.")
-
-        elif resize_mode == "dimensions":
-            width_val: Optional[int] = None
-            height_val: Optional[int] = None
-
-            try:
-                if width and width.strip():
-                    width_val = int(width.strip())
-                    if width_val <= 0:
-                        raise ValueError("Width must be greater than 0.")
-                if height and height.strip():
-                    height_val = int(height.strip())
-                    if height_val <= 0:
-                        raise ValueError("Height must be greater than 0.")
-            except ValueError:
-                raise ValueError("Invalid dimension value (width or height must be integers).")
-
-            if width_val is None and height_val is None:
-                raise ValueError("Please provide at least one dimension (width or height).")
-
-            if maintain_aspect:
-                if width_val is not None and height_val is None:
-                    new_width = width_val
-                    new_height = int(width_val * orig_height / orig_width)
-                elif height_val is not None and width_val is None:
-                    new_height = height_val
-                    new_width = int(new_height * orig_width / orig_height)
-                elif width_val is not None and height_val is not None:
-                    # If both provided, resize to fit within these dimensions while maintaining aspect ratio
-                    ratio_w = width_val / orig_width
-                    ratio_h = height_val / orig_height
-                    if ratio_w < ratio_h:
-                        new_width = width_val
-                        new_height = int(orig_height * ratio_w)
-                    else:
-                        new_height = height_val
-                        new_width = int(orig_width * ratio_h)
-            else:
-                # No aspect ratio maintenance, just use provided values, defaulting to original if None
-                new_width = width_val if width_val is not None else orig_width
-                new_height = height_val if height_val is not None else orig_height
-
-        else:
-            raise ValueError(f"Unknown resize mode: {resize_mode}")
-
-        # Ensure valid dimensions result
-        if new_width <= 0 or new_height <= 0:
-            raise ValueError("Calculated dimensions are invalid.")
-
-
-        # Determine output path if not specified
-        actual_output_path = output_path
-        if not actual_output_path:
-            directory = os.path.dirname(input_path) if os.path.dirname(input_path) else "."
-            filename, ext = os.path.splitext(os.path.basename(input_path))
-            timestamp = int(time.time())
-            actual_output_path = os.path.join(directory, f"{filename}_resized_{timestamp}{ext if ext else '.jpg'}")
-
-        try:
-            # Use LANCZOS filter which is good for downsizing
-            resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            # Ensure the output directory exists
-            output_dir = os.path.dirname(actual_output_path)
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-
-            resized_img.save(actual_output_path)
-        except Exception as e:
-            raise IOError(f"Could not save resized image: {e}")
-
-        return orig_width, orig_height, new_width, new_height, actual_output_path
-
-
 # --- GUI Application (Refactored to CustomTkinter) ---
 class ImageResizerGUI:
     def __init__(self):
@@ -188,7 +68,15 @@ class ImageResizerGUI:
         self.width_var = tk.StringVar(value="")
         self.height_var = tk.StringVar(value="")
         self.maintain_aspect = tk.BooleanVar(value=True) # Tkinter variable still works
+        self.target_kb_var = tk.StringVar(value=DEFAULT_TARGET_KB)
+        self.profile_var = tk.StringVar(value=DEFAULT_PROFILE)
         self.preview_photo: Optional[ImageTk.PhotoImage] = None # Keep a reference
+        # Previews are decoded on one background thread; only the newest request is drawn
+        self._preview_executor = ThreadPoolExecutor(max_workers=1)
+        self._preview_future: Optional[Future] = None
+        self._preview_after_id: Optional[str] = None
+        self._preview_generation = 0
+        self._preview_cache: Optional[tuple] = None  # ((path, width, height), (image, original size))
 
     def _create_widgets(self):
         """Creates all the main widgets and frames using CustomTkinter."""
@@ -239,12 +127,21 @@ class ImageResizerGUI:
                            value="percentage", command=self.update_options).pack(side="left", padx=10, pady=5)
         ctk.CTkRadioButton(mode_frame, text="Resize by Dimensions", variable=self.resize_mode,
                            value="dimensions", command=self.update_options).pack(side="left", padx=10, pady=5)
+        ctk.CTkRadioButton(mode_frame, text="Resize to File Size", variable=self.resize_mode,
+                           value="target_bytes", command=self.update_options).pack(side="left", padx=10, pady=5)
         mode_frame.pack(fill="x")
 
         # Options container (holds percentage or dimension widgets)
         self.options_container = ctk.CTkFrame(self.options_frame, fg_color="transparent")
         self.options_container.pack(fill="x", pady=10)
 
+        # Encoder profile (the output format follows the output file's extension)
+        profile_frame = ctk.CTkFrame(self.options_frame, fg_color="transparent")
+        ctk.CTkLabel(profile_frame, text="Encoder profile:").pack(side="left", padx=(0, 10), pady=5)
+        ctk.CTkOptionMenu(profile_frame, variable=self.profile_var, values=list(ENCODER_PROFILES),
+                          width=120).pack(side="left", pady=5)
+        profile_frame.pack(fill="x")
+
         # Process button frame (placed below scrollable frame in layout)
         self.button_frame = ctk.CTkFrame(self.left_frame, fg_color="transparent")
         process_btn = ctk.CTkButton(self.button_frame, text="Resize Image", command=self.process_image)
@@ -299,10 +196,12 @@ class ImageResizerGUI:
         # Mouse wheel scrolling on CTkScrollableFrame is handled automatically.
 
     def _on_preview_canvas_configure(self, event):
-        """Triggers a preview update when the preview canvas size changes."""
+        """Schedules a preview update once the preview canvas stops changing size."""
         if self.input_path:
-            # Use window.after to avoid potential issues during resize events
-            self.window.after(10, self.update_preview)
+            # Dragging the window fires many events; only the last one renders
+            if self._preview_after_id is not None:
+                self.window.after_cancel(self._preview_after_id)
+            self._preview_after_id = self.window.after(PREVIEW_DEBOUNCE_MS, self.update_preview)
 
 
     def create_percentage_options(self):
@@ -360,10 +259,28 @@ class ImageResizerGUI:
         aspect_frame.pack(fill="x", pady=5)
 
 
+    def create_target_size_options(self):
+        """Creates widgets for resizing to a maximum file size."""
+        for widget in self.options_container.winfo_children():
+            widget.destroy()
+
+        frame = ctk.CTkFrame(self.options_container, fg_color="transparent")
+        frame.pack(fill="x")
+
+        ctk.CTkLabel(frame, text="At most:").pack(side="left", padx=(0, 10), pady=5)
+        ctk.CTkEntry(frame, textvariable=self.target_kb_var, width=80).pack(side="left", pady=5)
+        ctk.CTkLabel(frame, text="KB").pack(side="left", padx=5, pady=5)
+
+        ctk.CTkLabel(self.options_container, text="Quality is lowered first, then the image is scaled down.",
+                     anchor="w").pack(fill="x", pady=5)
+
+
     def update_options(self):
-        """Switches between percentage and dimension options view."""
+        """Switches between percentage, dimension and file size options view."""
         if self.resize_mode.get() == "percentage":
             self.create_percentage_options()
+        elif self.resize_mode.get() == "target_bytes":
+            self.create_target_size_options()
         else:
             self.create_dimension_options()
 
@@ -401,7 +318,20 @@ class ImageResizerGUI:
 
 
     def update_preview(self):
-        """Updates the image preview on the canvas."""
+        """
+        Updates the image preview on the canvas without blocking the UI.
+
+        The image is decoded and scaled on the preview thread and drawn by
+        _poll_preview once it is ready; a request made meanwhile (another
+        file or canvas size) supersedes it. The last preview is cached, so
+        redrawing at the same size does not touch the image again.
+        """
+        self._preview_after_id = None
+        self._preview_generation += 1
+        if self._preview_future is not None:
+            self._preview_future.cancel()  # no-op if it is already running
+            self._preview_future = None
+
         if not self.input_path:
             self.preview_canvas.delete("all")
             self.preview_photo = None
@@ -417,48 +347,80 @@ class ImageResizerGUI:
                 )
             return
 
-        try:
-            img = Image.open(self.input_path)
-            orig_width, orig_height = img.size
-
-            canvas_width = self.preview_canvas.winfo_width()
-            canvas_height = self.preview_canvas.winfo_height()
-
-            if canvas_width <= 1 or canvas_height <= 1:
-                print("Canvas not ready for preview...")
-                return
-
-            max_preview_width = canvas_width - 20
-            max_preview_height = canvas_height - 20
-
-            max_preview_width = max(1, max_preview_width)
-            max_preview_height = max(1, max_preview_height)
+        canvas_width = self.preview_canvas.winfo_width()
+        canvas_height = self.preview_canvas.winfo_height()
 
+        if canvas_width <= 1 or canvas_height <= 1:
+            print("Canvas not ready for preview...")
+            return
 
-            img_copy = img.copy()
-            img_copy.thumbnail((max_preview_width, max_preview_height))
+        max_preview_width = max(1, canvas_width - PREVIEW_MARGIN)
+        max_preview_height = max(1, canvas_height - PREVIEW_MARGIN)
 
-            photo = ImageTk.PhotoImage(img_copy)
-            self.preview_photo = photo
+        key = (self.input_path, max_preview_width, max_preview_height)
+        if self._preview_cache is not None and self._preview_cache[0] == key:
+            self._show_preview(*self._preview_cache[1])
+            return
 
-            self.preview_canvas.delete("all")
-            self.preview_canvas.create_image(
-                canvas_width // 2,
-                canvas_height // 2,
-                image=photo,
-                anchor="center"
-            )
+        self._preview_future = self._preview_executor.submit(
+            self._render_preview, self.input_path, max_preview_width, max_preview_height)
+        self._poll_preview(self._preview_future, self._preview_generation, key)
 
-            size_text = f"Original: {orig_width} × {orig_height} pixels"
-            self.preview_canvas.create_text(10, 10, text=size_text, anchor="nw", fill="black")
+    @staticmethod
+    def _render_preview(input_path: str, max_width: int, max_height: int) -> Tuple[Image.Image, Tuple[int, int]]:
+        """Decodes and scales the preview image; runs on the preview thread."""
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(input_path)
+        # Decoded levels are cached, so resizes of the window reuse them
+        pyramid = get_pyramid(input_path)
+        img_copy = Image.fromarray(pyramid.image_for_size(max_width, max_height))
+        img_copy.thumbnail((max_width, max_height))
+        return img_copy, pyramid.size
+
+    def _poll_preview(self, future: Future, generation: int, key: tuple):
+        """Draws a finished preview, or checks again shortly; runs on the Tk main thread."""
+        if generation != self._preview_generation:
+            return  # superseded by a newer request
+        if not future.done():
+            self.window.after(PREVIEW_POLL_MS, self._poll_preview, future, generation, key)
+            return
+        self._preview_future = None
 
+        try:
+            img_copy, original_size = future.result()
         except FileNotFoundError:
             messagebox.showerror("Preview Error", "Input file not found.")
             self.input_path = ""
             self.input_label.configure(text="No file selected")
             self.update_preview()
+            return
         except Exception as e:
             messagebox.showerror("Preview Error", f"Could not load or preview image: {str(e)}")
+            return
+
+        self._preview_cache = (key, (img_copy, original_size))
+        self._show_preview(img_copy, original_size)
+
+    def _show_preview(self, img_copy: Image.Image, original_size: Tuple[int, int]):
+        """Draws a rendered preview and the original size on the canvas."""
+        canvas_width = self.preview_canvas.winfo_width()
+        canvas_height = self.preview_canvas.winfo_height()
+
+        # PhotoImage must be created on the Tk thread
+        photo = ImageTk.PhotoImage(img_copy)
+        self.preview_photo = photo
+
+        self.preview_canvas.delete("all")
+        self.preview_canvas.create_image(
+            canvas_width // 2,
+            canvas_height // 2,
+            image=photo,
+            anchor="center"
+        )
+
+        orig_width, orig_height = original_size
+        size_text = f"Original: {orig_width} × {orig_height} pixels"
+        self.preview_canvas.create_text(10, 10, text=size_text, anchor="nw", fill="black")
 
 
     def process_image(self):
@@ -472,6 +434,13 @@ class ImageResizerGUI:
         width = self.width_var.get() if resize_mode == "dimensions" else None
         height = self.height_var.get() if resize_mode == "dimensions" else None
         maintain_aspect = self.maintain_aspect.get() if resize_mode == "dimensions" else True
+        target_bytes = None
+        if resize_mode == "target_bytes":
+            try:
+                target_bytes = str(int(float(self.target_kb_var.get()) * 1024))
+            except ValueError:
+                messagebox.showerror("Error", "Please enter the maximum file size in KB.")
+                return
 
         try:
             orig_width, orig_height, new_width, new_height, actual_output_path = self.image_resizer.resize_image(
@@ -481,7 +450,9 @@ class ImageResizerGUI:
                 percentage=percentage,
                 width=width,
                 height=height,
-                maintain_aspect=maintain_aspect
+                maintain_aspect=maintain_aspect,
+                target_bytes=target_bytes,
+                profile=self.profile_var.get()
             )
 
             self.output_path = actual_output_path
@@ -515,6 +486,7 @@ class ImageResizerGUI:
     def run(self):
         """Starts the Tkinter main loop."""
         self.window.mainloop()
+        self._preview_executor.shutdown(wait=False)
 
 
 # --- Application Entry Point ---
@@ -0,0 +1,629 @@
+"""
+Image decoding and encoding backends for the image processing package.
+
+This module picks the fastest available decoder for each file format and
+supports reduced-resolution decoding, which for JPEG files happens inside
+the decoder (DCT scaling) and therefore costs a fraction of a full decode.
+On the output side it chooses the encoder from the file extension and offers
+a background writer so encoding overlaps with processing. It is the layer
+underneath image_utils.load_image and image_utils.save_image.
+"""
+
+import atexit
+import io
+import os
+import queue
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+# Constants
+REDUCE_FACTORS = (1, 2, 4, 8)
+COLOR_ORDERS = ("RGB", "BGR")
+
+_CV2_REDUCED_COLOR = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+_CV2_REDUCED_GRAYSCALE = {
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Preferred decoders per extension, fastest first (see benchmarks/decode.py).
+# Formats that are not listed fall back to DEFAULT_BACKEND_ORDER.
+FORMAT_BACKENDS: Dict[str, List[str]] = {
+    ".jpg": ["cv2", "pil"],
+    ".jpeg": ["cv2", "pil"],
+    ".jpe": ["cv2", "pil"],
+    ".jfif": ["cv2", "pil"],
+    ".png": ["cv2", "pil"],
+    ".bmp": ["cv2", "pil"],
+    ".webp": ["cv2", "pil"],
+    ".tif": ["cv2", "pil", "imageio"],
+    ".tiff": ["cv2", "pil", "imageio"],
+    ".gif": ["pil", "imageio"],
+}
+DEFAULT_BACKEND_ORDER = ["cv2", "pil", "imageio"]
+EXIF_ORIENTATION_TAG = 0x0112
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}  # orientations that swap width and height
+
+
+def _exif_orientation(img: Image.Image) -> int:
+    """Return an opened image's EXIF orientation (1 if absent or unreadable)."""
+    try:
+        return int(img.getexif().get(EXIF_ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def _apply_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """Rotate or flip decoded pixels upright for an EXIF orientation, as cv2.imread does."""
+    if orientation in (2, 4):
+        image = image[:, ::-1] if orientation == 2 else image[::-1]
+    elif orientation == 3:
+        image = image[::-1, ::-1]
+    elif orientation in TRANSPOSED_ORIENTATIONS:
+        image = image.swapaxes(0, 1)
+        if orientation in (6, 7):
+            image = image[:, ::-1]
+        if orientation in (7, 8):
+            image = image[::-1]
+    else:
+        return image
+    return np.ascontiguousarray(image)
+
+
+def image_size(image_path: str) -> Tuple[int, int]:
+    """
+    Return an image's (width, height) as decode_image returns it, from the header alone.
+
+    Decoders apply the EXIF orientation, so a portrait phone photo stored
+    as landscape pixels reports its upright size.
+
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        (width, height) at full resolution
+
+    Raises:
+        ValueError: If the header cannot be read
+    """
+    try:
+        with Image.open(image_path) as img:
+            width, height = img.size
+            if _exif_orientation(img) in TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+    except Exception as e:
+        raise ValueError(f"Error reading image header {image_path}: {str(e)}")
+    return width, height
+
+
+def _decode_cv2(image_path: str, as_grayscale: bool, reduce: int, color_order: str) -> Optional[np.ndarray]:
+    """Decode with OpenCV, using IMREAD_REDUCED_* for scaled decodes."""
+    if reduce == 1:
+        flags = cv2.IMREAD_GRAYSCALE if as_grayscale else cv2.IMREAD_COLOR
+    else:
+        flags = _CV2_REDUCED_GRAYSCALE[reduce] if as_grayscale else _CV2_REDUCED_COLOR[reduce]
+
+    image = cv2.imread(image_path, flags)
+    if image is None:
+        return None
+    if not as_grayscale and color_order == "RGB":
+        # Convert in place instead of allocating a second full-size buffer
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    return image
+
+
+def _decode_pil(image_path: str, as_grayscale: bool, reduce: int, color_order: str) -> Optional[np.ndarray]:
+    """Decode with Pillow, using draft mode for scaled JPEG decodes."""
+    with Image.open(image_path) as img:
+        orientation = _exif_orientation(img)
+        mode = "L" if as_grayscale else "RGB"
+        target_width = -(-img.width // reduce)
+        if reduce > 1:
+            # draft() scales JPEGs inside the decoder and is a no-op for other formats
+            img.draft(mode, (target_width, -(-img.height // reduce)))
+        if img.mode != mode:
+            img = img.convert(mode)
+        remaining = round(img.width / target_width)
+        if remaining > 1:
+            img = img.reduce(remaining)
+        image = _apply_orientation(np.asarray(img), orientation)
+
+    if not as_grayscale and color_order == "BGR":
+        image = np.ascontiguousarray(image[:, :, ::-1])
+    return image
+
+
+def _decode_imageio(image_path: str, as_grayscale: bool, reduce: int, color_order: str) -> Optional[np.ndarray]:
+    """Decode with imageio; scaled decodes are resized after a full decode."""
+    import imageio.v3 as iio
+
+    image = iio.imread(image_path, mode="L" if as_grayscale else "RGB")
+    try:
+        with Image.open(image_path) as img:
+            orientation = _exif_orientation(img)
+    except Exception:
+        orientation = 1  # a format only imageio reads
+    image = _apply_orientation(image, orientation)
+    if reduce > 1:
+        size = (-(-image.shape[1] // reduce), -(-image.shape[0] // reduce))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    if not as_grayscale and color_order == "BGR":
+        image = np.ascontiguousarray(image[:, :, ::-1])
+    return image
+
+
+DECODERS: Dict[str, Callable[[str, bool, int, str], Optional[np.ndarray]]] = {
+    "cv2": _decode_cv2,
+    "pil": _decode_pil,
+    "imageio": _decode_imageio,
+}
+
+
+def backends_for(image_path: str) -> List[str]:
+    """
+    Return the decoder backends to try for a file, fastest first.
+
+    Args:
+        image_path: Path to the image file
+
+    Returns:
+        List of backend names
+    """
+    extension = os.path.splitext(image_path)[1].lower()
+    return FORMAT_BACKENDS.get(extension, DEFAULT_BACKEND_ORDER)
+
+
+def decode_image(image_path: str,
+                 as_grayscale: bool = False,
+                 reduce: int = 1,
+                 color_order: str = "RGB",
+                 backend: Optional[str] = None) -> np.ndarray:
+    """
+    Decode an image file into a numpy array.
+
+    Args:
+        image_path: Path to the image file
+        as_grayscale: Whether to decode to a single luminance channel
+        reduce: Decode at 1/reduce of the full resolution (1, 2, 4 or 8). JPEG
+            files are scaled inside the decoder; other formats are decoded and
+            then downscaled. Sizes may differ by a pixel between backends.
+        color_order: 'RGB', or 'BGR' for consumers such as OpenCV that accept
+            BGR, which skips the channel swap for the OpenCV decoder
+        backend: Force a decoder ('cv2', 'pil' or 'imageio'); by default the
+            fastest available decoder for the format is used
+
+    Returns:
+        Image as a numpy array (H x W for grayscale, H x W x 3 otherwise)
+
+    Raises:
+        ValueError: If the arguments are invalid or no backend can decode the file
+    """
+    if reduce not in REDUCE_FACTORS:
+        raise ValueError(f"Unsupported reduce factor: {reduce}. Supported factors: {REDUCE_FACTORS}")
+    if color_order not in COLOR_ORDERS:
+        raise ValueError(f"Unsupported color order: {color_order}. Supported orders: {', '.join(COLOR_ORDERS)}")
+
+    if backend is not None:
+        if backend not in DECODERS:
+            raise ValueError(f"Unsupported decoder backend: {backend}. Available backends: {', '.join(DECODERS)}")
+        candidates = [backend]
+    else:
+        candidates = backends_for(image_path)
+
+    errors = []
+    for name in candidates:
+        try:
+            image = DECODERS[name](image_path, as_grayscale, reduce, color_order)
+        except Exception as e:
+            errors.append(f"{name}: {str(e)}")
+            continue
+        if image is not None:
+            return image
+        errors.append(f"{name}: unsupported or corrupt file")
+
+    raise ValueError(f"Failed to decode image {image_path} ({'; '.join(errors)})")
+
+
+def decode_image_bytes(data: bytes,
+                       as_grayscale: bool = False,
+                       color_order: str = "RGB") -> np.ndarray:
+    """
+    Decode an encoded image held in memory (e.g. an upload).
+
+    Args:
+        data: Encoded image bytes in any format OpenCV or Pillow can read
+        as_grayscale: Whether to decode to a single luminance channel
+        color_order: 'RGB' or 'BGR'
+
+    Returns:
+        Image as a numpy array (H x W for grayscale, H x W x 3 otherwise)
+
+    Raises:
+        ValueError: If the data cannot be decoded
+    """
+    if color_order not in COLOR_ORDERS:
+        raise ValueError(f"Unsupported color order: {color_order}. Supported orders: {', '.join(COLOR_ORDERS)}")
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    image = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE if as_grayscale else cv2.IMREAD_COLOR)
+    if image is not None:
+        if not as_grayscale and color_order == "RGB":
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+        return image
+
+    # Formats OpenCV cannot read (e.g. GIF) go through Pillow
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            image = np.asarray(img.convert("L" if as_grayscale else "RGB"))
+    except Exception as e:
+        raise ValueError(f"Failed to decode image data ({len(data)} bytes): {str(e)}")
+    if not as_grayscale and color_order == "BGR":
+        image = np.ascontiguousarray(image[:, :, ::-1])
+    return image
+
+
+# --- Memory-mapped access ---
+
+RAW_EXTENSIONS = {".raw", ".bin"}
+PNM_EXTENSIONS = {".pgm", ".ppm"}
+
+
+def _read_pnm_header(image_path: str):
+    """
+    Parse a binary PGM (P5) or PPM (P6) header.
+
+    Returns:
+        Tuple of (shape, dtype, data offset)
+    """
+    with open(image_path, "rb") as f:
+        header = f.read(512)
+
+    tokens = []
+    position = 0
+    while len(tokens) < 4:
+        # Skip whitespace and comments between header tokens
+        while position < len(header) and header[position:position + 1].isspace():
+            position += 1
+        if header[position:position + 1] == b"#":
+            position = header.index(b"\n", position) + 1
+            continue
+        end = position
+        while end < len(header) and not header[end:end + 1].isspace():
+            end += 1
+        if end == position:
+            raise ValueError(f"Truncated PNM header in {image_path}")
+        tokens.append(header[position:end])
+        position = end
+
+    magic, width, height, maxval = tokens[0], int(tokens[1]), int(tokens[2]), int(tokens[3])
+    if magic not in (b"P5", b"P6"):
+        raise ValueError(f"Only binary PGM/PPM files can be memory-mapped, got {magic.decode(errors='replace')}")
+
+    shape = (height, width) if magic == b"P5" else (height, width, 3)
+    dtype = np.dtype(np.uint8) if maxval < 256 else np.dtype(">u2")
+    # Exactly one whitespace byte separates the header from the pixel data
+    return shape, dtype, position + 1
+
+
+def memmap_image(image_path: str,
+                 shape: Optional[tuple] = None,
+                 dtype: Optional[str] = None,
+                 offset: int = 0,
+                 planar: bool = False) -> np.ndarray:
+    """
+    Map an uncompressed image file into memory without reading it.
+
+    The returned array is a read-only, zero-copy view of the file: pages are
+    only read when the corresponding pixels are touched, so slicing a region
+    and processing it costs memory proportional to the region, not the file.
+
+    Supported inputs are uncompressed TIFF (via tifffile), ``.npy`` files,
+    binary PGM/PPM files and headerless raw files (``shape`` and ``dtype``
+    required).
+
+    Args:
+        image_path: Path to the image file
+        shape: Raw files only: (height, width) or (height, width, channels);
+            for planar files (channels, height, width)
+        dtype: Raw files only: pixel data type, e.g. 'uint8' or '<u2'
+        offset: Raw files only: byte offset of the pixel data
+        planar: Raw files only: whether channels are stored as separate
+            planes; the result is still returned as height x width x channels
+
+    Returns:
+        Read-only numpy array backed by the file
+
+    Raises:
+        ValueError: If the file cannot be memory-mapped
+    """
+    if not os.path.exists(image_path):
+        raise ValueError(f"Image file not found: {image_path}")
+
+    extension = os.path.splitext(image_path)[1].lower()
+
+    if shape is not None:
+        if dtype is None:
+            raise ValueError("dtype is required when memory-mapping a raw file")
+        image = np.memmap(image_path, dtype=np.dtype(dtype), mode="r", offset=offset, shape=tuple(shape))
+        if planar and image.ndim == 3:
+            image = image.transpose(1, 2, 0)
+        return image
+
+    if extension in (".tif", ".tiff"):
+        try:
+            import tifffile
+        except ImportError:
+            raise ValueError("Memory-mapping TIFF files requires the tifffile package")
+        try:
+            return tifffile.memmap(image_path, mode="r")
+        except ValueError as e:
+            raise ValueError(f"TIFF file cannot be memory-mapped (compressed or tiled?): {str(e)}")
+
+    if extension == ".npy":
+        return np.load(image_path, mmap_mode="r")
+
+    if extension in PNM_EXTENSIONS:
+        pnm_shape, pnm_dtype, data_offset = _read_pnm_header(image_path)
+        return np.memmap(image_path, dtype=pnm_dtype, mode="r", offset=data_offset, shape=pnm_shape)
+
+    if extension in RAW_EXTENSIONS:
+        raise ValueError("shape and dtype are required when memory-mapping a raw file")
+    raise ValueError(f"Unsupported format for memory-mapping: {extension or image_path}")
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """
+    Convert an RGB image (or region of one) to grayscale.
+
+    Only the pixels of the given array are read, so this is safe to call on
+    a slice of a memory-mapped image.
+
+    Args:
+        image: Grayscale or RGB image as numpy array
+
+    Returns:
+        Grayscale image as numpy array
+    """
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(np.ascontiguousarray(image[:, :, :3]), cv2.COLOR_RGB2GRAY)
+
+
+# --- Encoding ---
+
+DEFAULT_JPEG_QUALITY = 95
+DEFAULT_WEBP_QUALITY = 90
+DEFAULT_PNG_COMPRESSION = 3
+WRITE_QUEUE_SIZE = 8
+
+# cv2.imwrite parameter builders per extension: (quality, compression) -> params
+_CV2_ENCODER_PARAMS: Dict[str, Callable[[Optional[int], Optional[int]], List[int]]] = {
+    ".jpg": lambda q, c: [cv2.IMWRITE_JPEG_QUALITY, DEFAULT_JPEG_QUALITY if q is None else q],
+    ".jpeg": lambda q, c: [cv2.IMWRITE_JPEG_QUALITY, DEFAULT_JPEG_QUALITY if q is None else q],
+    ".png": lambda q, c: [cv2.IMWRITE_PNG_COMPRESSION, DEFAULT_PNG_COMPRESSION if c is None else c],
+    ".webp": lambda q, c: [cv2.IMWRITE_WEBP_QUALITY, DEFAULT_WEBP_QUALITY if q is None else q],
+    # TIFF: compression 0 writes uncompressed strips, anything else uses LZW
+    ".tif": lambda q, c: [cv2.IMWRITE_TIFF_COMPRESSION, 1 if c == 0 else 5],
+    ".tiff": lambda q, c: [cv2.IMWRITE_TIFF_COMPRESSION, 1 if c == 0 else 5],
+    ".bmp": lambda q, c: [],
+    ".ppm": lambda q, c: [],
+    ".pgm": lambda q, c: [],
+}
+
+
+def prepare_for_encoding(image: np.ndarray) -> np.ndarray:
+    """
+    Convert an array to a dtype that image encoders accept.
+
+    Boolean masks (such as edge maps) become 0/255, floats in [0, 1] are
+    scaled to 0-255, and other types are clipped to uint8. uint8 and uint16
+    arrays are returned unchanged.
+
+    Args:
+        image: Image as a numpy array
+
+    Returns:
+        uint8 or uint16 image array
+    """
+    image = np.asarray(image)
+    if image.dtype in (np.uint8, np.uint16):
+        return image
+    if image.dtype == bool:
+        return image.astype(np.uint8) * 255
+    if np.issubdtype(image.dtype, np.floating) and image.size and image.max() <= 1.0:
+        image = image * 255
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def encode_image(image: np.ndarray, extension: str,
+                 quality: Optional[int] = None,
+                 compression: Optional[int] = None,
+                 color_order: str = "RGB") -> bytes:
+    """
+    Encode an image in memory in the format given by a file extension.
+
+    Args:
+        image: Image as a numpy array (grayscale, RGB or RGBA)
+        extension: Target format extension such as '.png' or 'jpg'
+        quality: JPEG/WebP quality 1-100 (defaults to 95 / 90)
+        compression: PNG zlib level 0-9 (default 3); for TIFF, 0 disables LZW
+        color_order: Channel order of the input, 'RGB' or 'BGR'
+
+    Returns:
+        Encoded image bytes
+
+    Raises:
+        IOError: If the image cannot be encoded
+    """
+    extension = extension.lower()
+    if not extension.startswith("."):
+        extension = "." + extension
+    image = prepare_for_encoding(image)
+
+    if extension in _CV2_ENCODER_PARAMS:
+        if image.ndim == 3 and color_order == "RGB":
+            code = cv2.COLOR_RGBA2BGRA if image.shape[2] == 4 else cv2.COLOR_RGB2BGR
+            image = cv2.cvtColor(image, code)
+        params = _CV2_ENCODER_PARAMS[extension](quality, compression)
+        success, encoded = cv2.imencode(extension, image, params)
+        if not success:
+            raise IOError(f"Unable to encode image as {extension}")
+        return encoded.tobytes()
+
+    # Formats OpenCV cannot write (e.g. GIF) go through Pillow
+    if image.ndim == 3 and color_order == "BGR":
+        image = image[:, :, ::-1]
+    image_format = Image.registered_extensions().get(extension)
+    if image_format is None:
+        raise IOError(f"Unsupported output format: {extension}")
+    buffer = io.BytesIO()
+    try:
+        Image.fromarray(image).save(buffer, format=image_format)
+    except Exception as e:
+        raise IOError(f"Unable to encode image as {extension}: {str(e)}")
+    return buffer.getvalue()
+
+
+def write_image(image: np.ndarray, output_path: str,
+                quality: Optional[int] = None,
+                compression: Optional[int] = None,
+                color_order: str = "RGB") -> int:
+    """
+    Encode an image in the format given by the file extension and write it.
+
+    Args:
+        image: Image as a numpy array (grayscale, RGB or RGBA)
+        output_path: Destination path; the extension selects the encoder
+        quality: JPEG/WebP quality 1-100 (defaults to 95 / 90)
+        compression: PNG zlib level 0-9 (default 3); for TIFF, 0 disables LZW
+        color_order: Channel order of the input, 'RGB' or 'BGR'
+
+    Returns:
+        Number of bytes written
+
+    Raises:
+        IOError: If the image cannot be encoded or written
+    """
+    extension = os.path.splitext(output_path)[1]
+    try:
+        data = encode_image(image, extension, quality, compression, color_order)
+    except IOError as e:
+        raise IOError(f"{str(e)} to {output_path}")
+
+    # Write to a temporary file and rename it into place, so readers never see
+    # a partial file and an existing output (e.g. a hardlinked cache entry) is
+    # replaced rather than overwritten in place
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f".{os.path.basename(output_path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, output_path)
+    except OSError as e:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise IOError(f"Unable to write image to {output_path}: {str(e)}")
+    return len(data)
+
+
+class AsyncImageWriter:
+    """
+    Writes images on a background thread through a bounded queue.
+
+    Encoding and disk I/O run while the caller processes the next image.
+    When ``max_pending`` images are waiting, ``submit`` blocks, so memory
+    stays bounded. Pending writes are flushed by :meth:`close`, when used as
+    a context manager, and at interpreter exit.
+
+    Arrays passed to ``submit`` are not copied and must not be modified
+    afterwards.
+    """
+
+    def __init__(self, max_pending: int = WRITE_QUEUE_SIZE, workers: int = 1):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._threads = [
+            threading.Thread(target=self._run, name=f"image-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self._closed = False
+        self._lock = threading.Lock()  # guards the counters, which every writer thread updates
+        self.written_count = 0
+        self.bytes_written = 0
+        self.errors: List[str] = []
+        for thread in self._threads:
+            thread.start()
+        _open_writers.append(self)
+
+    def submit(self, image: np.ndarray, output_path: str,
+               quality: Optional[int] = None,
+               compression: Optional[int] = None,
+               color_order: str = "RGB") -> None:
+        """
+        Queue an image to be written; see write_image for the arguments.
+
+        Raises:
+            RuntimeError: If the writer has been closed
+        """
+        if self._closed:
+            raise RuntimeError("Cannot submit to a closed AsyncImageWriter")
+        self._queue.put((image, output_path, quality, compression, color_order))
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                image, output_path, quality, compression, color_order = job
+                size = write_image(image, output_path, quality, compression, color_order)
+                with self._lock:
+                    self.written_count += 1
+                    self.bytes_written += size
+            except Exception as e:
+                with self._lock:
+                    self.errors.append(f"{job[1]}: {str(e)}")
+                print(f"Error saving image to {job[1]}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued image has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending writes and stop the writer threads."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self in _open_writers:
+            _open_writers.remove(self)
+
+    def __enter__(self) -> "AsyncImageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+_open_writers: List[AsyncImageWriter] = []
+
+
+@atexit.register
+def _close_writers() -> None:
+    for writer in list(_open_writers):
+        writer.close()
@@ -1,10 +1,13 @@
-import matplotlib.pyplot as plt
-from IPython.display import Image
+from typing import Optional
+
 from PIL import Image, ImageFilter
 
+from contact_sheet import save_contact_sheet
+from image_utils import display_multiple_images
+
 
-def image_processing():
-    img = Image.open("images/image.jpg")
+def image_processing(image_path: str = "images/image.jpg", output_path: Optional[str] = None):
+    img = Image.open(image_path)
     if img.mode == 'P':
         img = img.convert('RGB')
     blurred = img.filter(ImageFilter.BLUR)
@@ -19,9 +22,6 @@ def image_processing():
     smooth_more = img.filter(ImageFilter.SMOOTH_MORE)
     gaussian_blur = img.filter(ImageFilter.GaussianBlur(radius=10))
 
-    fig, axes = plt.subplots(4, 3, figsize=(15, 15))
-    axes = axes.flatten()
-
     filters = [
         ("Blurred", blurred),
         ("Contour", contour),
@@ -35,18 +35,14 @@ def image_processing():
         ("Smooth More", smooth_more),
         ("Gaussian Blur", gaussian_blur),
     ]
+    titles = [title for title, _ in filters]
+    images = [image for _, image in filters]
 
-    for ax, (title, image) in zip(axes, filters):
-        ax.imshow(image)
-        ax.set_title(title)
-        ax.axis("off")
-
-    # Hide any unused subplots
-    for ax in axes[len(filters):]:
-        ax.axis("off")
-
-    plt.tight_layout()
-    plt.show()
+    # Write the 4x3 contact sheet straight to disk, or show it
+    if output_path:
+        save_contact_sheet(images, output_path, titles, cols=3)
+    else:
+        display_multiple_images(images, titles, cols=3)
 
 if __name__ =="__main__":
-    image_processing()
\ No newline at end of file
+    image_processing()
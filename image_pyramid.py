@@ -0,0 +1,262 @@
+"""
+Multi-resolution image pyramids shared across operations.
+
+An ImagePyramid decodes its source at most once per level: level 0 is the
+full-resolution image and every further level halves both dimensions with
+area interpolation. Levels are built lazily, and a level that is requested
+before the full image has been decoded is decoded directly at reduced scale
+(which JPEG decoders do much faster than a full decode).
+
+Pyramids live in a process-wide LRU cache keyed by path and modification
+time with a memory budget, so previews, thumbnails and downscaled
+processing of the same file all reuse the same decoded pixels.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from image_io import image_size
+from image_utils import load_image
+
+
+# Constants
+PYRAMID_CACHE_ENV = "IMAGE_PROCESSING_PYRAMID_CACHE_MB"
+DEFAULT_CACHE_BYTES = int(os.environ.get(PYRAMID_CACHE_ENV, "512")) * 1024 ** 2
+MAX_DIRECT_DECODE_LEVEL = 3  # decoders support 1/2, 1/4 and 1/8 scale
+
+
+class ImagePyramid:
+    """
+    Lazily built power-of-two pyramid for a single image file.
+
+    Levels are read-only numpy arrays; copy a level before modifying it.
+    """
+
+    def __init__(self, image_path: str, as_grayscale: bool = False,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.image_path = image_path
+        self.as_grayscale = as_grayscale
+        self._levels: Dict[int, np.ndarray] = {}
+        self._lock = threading.RLock()
+        self._on_change = on_change
+
+        # Read the dimensions from the header without decoding pixels; like the
+        # decoders, image_size applies the EXIF orientation
+        self.width, self.height = image_size(image_path)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """Full-resolution (width, height)."""
+        return self.width, self.height
+
+    @property
+    def max_level(self) -> int:
+        """Index of the smallest level (the first one that is 1 pixel on its short side)."""
+        level = 0
+        while min(self.level_size(level)) > 1:
+            level += 1
+        return level
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the levels decoded so far."""
+        with self._lock:
+            return sum(level.nbytes for level in self._levels.values())
+
+    def level_size(self, level: int) -> Tuple[int, int]:
+        """
+        Return the (width, height) of a level without building it.
+
+        Args:
+            level: Pyramid level (0 is full resolution)
+
+        Returns:
+            (width, height) of the level, rounded up as the decoders do
+        """
+        scale = 2 ** level
+        return -(-self.width // scale), -(-self.height // scale)
+
+    def level_for_size(self, max_width: int, max_height: int) -> int:
+        """
+        Return the smallest level that still covers the requested size.
+
+        Args:
+            max_width: Width the image will be displayed or processed at
+            max_height: Height the image will be displayed or processed at
+
+        Returns:
+            Pyramid level index
+        """
+        level = 0
+        while level < self.max_level:
+            width, height = self.level_size(level + 1)
+            if width < max_width and height < max_height:
+                break
+            level += 1
+        return level
+
+    def level(self, level: int = 0) -> np.ndarray:
+        """
+        Return a pyramid level, decoding or downscaling it on first use.
+
+        Args:
+            level: Pyramid level (0 is full resolution)
+
+        Returns:
+            Read-only image as numpy array
+
+        Raises:
+            ValueError: If the level is out of range or the image cannot be decoded
+        """
+        if level < 0 or level > self.max_level:
+            raise ValueError(f"Pyramid level {level} out of range (0-{self.max_level})")
+
+        with self._lock:
+            image = self._levels.get(level)
+            if image is not None:
+                return image
+            image = self._build(level)
+
+        # Notify the cache outside our lock so it can trim without lock-order issues
+        if self._on_change is not None:
+            self._on_change()
+        return image
+
+    def _build(self, level: int) -> np.ndarray:
+        """Build a level (and any missing levels above it); the caller holds the lock."""
+        finer = [index for index in self._levels if index < level]
+        if not finer:
+            # Nothing decoded yet: decode straight at the closest scale the decoder supports
+            source_level = min(level, MAX_DIRECT_DECODE_LEVEL)
+            image = load_image(self.image_path, as_grayscale=self.as_grayscale, reduce=2 ** source_level)
+            expected = self.level_size(source_level)
+            if (image.shape[1], image.shape[0]) != expected:
+                # Some decoders round scaled sizes down; keep level sizes consistent
+                image = cv2.resize(image, expected, interpolation=cv2.INTER_AREA)
+            self._store(source_level, image)
+        else:
+            source_level = max(finer)
+
+        image = self._levels[source_level]
+        for current in range(source_level + 1, level + 1):
+            image = cv2.resize(image, self.level_size(current), interpolation=cv2.INTER_AREA)
+            self._store(current, image)
+        return image
+
+    def image_for_size(self, max_width: int, max_height: int) -> np.ndarray:
+        """Return the smallest level covering the requested size (see level_for_size)."""
+        return self.level(self.level_for_size(max_width, max_height))
+
+    def _store(self, level: int, image: np.ndarray) -> None:
+        image.flags.writeable = False
+        self._levels[level] = image
+
+    def drop_levels(self, keep: Optional[List[int]] = None) -> None:
+        """Release decoded levels, optionally keeping some of them."""
+        with self._lock:
+            for index in list(self._levels):
+                if keep is None or index not in keep:
+                    del self._levels[index]
+
+
+class PyramidCache:
+    """
+    Process-wide LRU cache of image pyramids with a memory budget.
+
+    Entries are keyed by absolute path, modification time and file size, so
+    a file that changes on disk is decoded again. The most recently used
+    pyramid is never evicted, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, ImagePyramid]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, image_path: str, as_grayscale: bool = False) -> ImagePyramid:
+        """
+        Return the cached pyramid for a file, creating it if needed.
+
+        Args:
+            image_path: Path to the image file
+            as_grayscale: Whether the pyramid holds grayscale levels
+
+        Returns:
+            ImagePyramid for the current version of the file
+
+        Raises:
+            ValueError: If the file does not exist
+        """
+        path = os.path.abspath(image_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise ValueError(f"Image file not found: {image_path}")
+        key = (path, stat.st_mtime_ns, stat.st_size, as_grayscale)
+
+        with self._lock:
+            pyramid = self._entries.get(key)
+            if pyramid is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return pyramid
+
+            self.misses += 1
+            # Drop pyramids for older versions of the same file
+            for stale in [k for k in self._entries if k[0] == path and k[3] == as_grayscale]:
+                del self._entries[stale]
+
+            pyramid = ImagePyramid(path, as_grayscale=as_grayscale, on_change=self.trim)
+            self._entries[key] = pyramid
+            return pyramid
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by all cached pyramids."""
+        with self._lock:
+            return sum(pyramid.nbytes for pyramid in self._entries.values())
+
+    def trim(self) -> None:
+        """Evict least recently used pyramids until the cache fits its budget."""
+        with self._lock:
+            while len(self._entries) > 1 and self.nbytes > self.max_bytes:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached pyramid."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and memory use."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_cache = PyramidCache()
+
+
+def get_pyramid(image_path: str, as_grayscale: bool = False) -> ImagePyramid:
+    """Return the process-wide cached pyramid for an image file."""
+    return _cache.get(image_path, as_grayscale=as_grayscale)
+
+
+def get_pyramid_cache() -> PyramidCache:
+    """Return the process-wide pyramid cache."""
+    return _cache
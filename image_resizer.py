@@ -0,0 +1,1101 @@
+"""
+Image resizing, for single files and whole catalogs.
+
+ImageResizer holds the resizing logic used by the image-resizer GUI. The
+batch engine below resizes directories, glob patterns or JSONL manifests
+into one or more sizes on a pool of worker processes, mirroring each
+input's location under its directory in the output. Each image is decoded
+once for all of its sizes, and smaller sizes are cascaded from larger
+renditions (see resize_file); outputs are written atomically, so an
+interrupted run never leaves truncated files behind, and --skip-existing
+resumes it.
+
+Uncompressed inputs over STRIP_MIN_PIXELS (large scans and panoramas) are
+memory-mapped and resized in strips (see strip_resize), so memory use does
+not grow with the input size; TIFF outputs of such inputs are also written
+progressively.
+
+The batch engine only needs Pillow, so it can run on headless machines
+without customtkinter; strip resizing also uses NumPy, tifffile and
+image_io (OpenCV), and inputs are decoded normally when those are missing.
+
+Example:
+    python image_resizer.py --input catalog --recursive --output resized --size 1600x1600 --size 400x400
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from io import BytesIO
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from PIL import Image, ImageOps
+
+from batch_inputs import claim_output, iter_input_paths, iter_manifest, output_path_for
+
+
+# Constants
+DEFAULT_OUTPUT_DIR = "output"
+DEFAULT_PROFILE = "web"
+# Pillow save options per profile and format; quality can be overridden per call
+ENCODER_PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "web": {  # balanced size and quality for delivery
+        "JPEG": {"quality": 85, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+        "WEBP": {"quality": 80, "method": 4},
+        "AVIF": {"quality": 60, "speed": 8},
+        "PNG": {"compress_level": 6},
+    },
+    "quality": {  # archival and print: no chroma subsampling
+        "JPEG": {"quality": 92, "optimize": True, "progressive": True, "subsampling": "4:4:4"},
+        "WEBP": {"quality": 90, "method": 6},
+        "AVIF": {"quality": 80, "speed": 6, "subsampling": "4:4:4"},
+        "PNG": {"compress_level": 6},
+    },
+    "small": {  # smallest files at acceptable quality; slowest encodes
+        "JPEG": {"quality": 75, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+        "WEBP": {"quality": 70, "method": 6},
+        "AVIF": {"quality": 50, "speed": 6},
+        "PNG": {"optimize": True, "compress_level": 9},
+    },
+    "fast": {  # fastest encodes, larger files
+        "JPEG": {"quality": 85, "subsampling": "4:2:0"},
+        "WEBP": {"quality": 80, "method": 0},
+        "AVIF": {"quality": 60, "speed": 10},
+        "PNG": {"compress_level": 1},
+    },
+}
+QUALITY_FORMATS = {"JPEG", "WEBP", "AVIF"}
+JPEG_MODES = {"RGB", "L", "CMYK"}
+FORMAT_MODES = {"JPEG": JPEG_MODES, "WEBP": {"RGB", "RGBA"}, "AVIF": {"RGB", "RGBA"}}
+IN_FLIGHT_PER_WORKER = 4
+CASCADE_MIN_FACTOR = 2.0  # a rendition is a cascade source for targets at most half its size
+DRAFT_MIN_FACTOR = 3.0  # JPEGs are decoded reduced to no less than this multiple of the target
+TARGET_MIN_QUALITY = 60  # below this, target-size outputs are scaled down instead
+TARGET_TOLERANCE = 0.05  # stop searching once an encoding is within 5% under the target
+TARGET_SHRINK_MARGIN = 0.95  # undershoot scale estimates slightly to avoid another miss
+TARGET_PROBE_PIXELS = 1_000_000  # larger images estimate their starting scale from a copy this size
+SIZE_UNITS = {"kb": 1024, "mb": 1024 ** 2}
+STRIP_MIN_PIXELS = 100_000_000  # larger uncompressed inputs are memory-mapped and resized in strips
+STRIP_EXTENSIONS = {".tif", ".tiff", ".npy", ".pgm", ".ppm"}
+EXIF_ORIENTATION_TAG = 0x0112
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}  # orientations that swap width and height
+STRIP_SEARCH_MAX_PIXELS = 16_000_000  # file size targets of strip-resized inputs start from this size
+PROGRESS_INTERVAL = 2.0  # seconds between progress lines
+
+
+class ImageResizer:
+    """Handles the core image resizing logic."""
+
+    def resize_image(
+            self,
+            input_path: str,
+            output_path: Optional[str],
+            resize_mode: str,
+            percentage: Optional[str] = None,
+            width: Optional[str] = None,
+            height: Optional[str] = None,
+            maintain_aspect: bool = True,
+            draft: bool = True,
+            target_bytes: Optional[str] = None,
+            profile: str = DEFAULT_PROFILE,
+            quality: Optional[int] = None
+    ) -> Tuple[int, int, int, int, str]:
+        """
+        Resizes an image based on provided parameters.
+
+        Images with an EXIF orientation are turned upright first; sizes refer to
+        the upright image and the orientation tag is not copied to the output.
+
+        Args:
+            input_path: Path to the input image file.
+            output_path: Path to save the output image. If None, generates one.
+            resize_mode: 'percentage', 'dimensions' or 'target_bytes'.
+            percentage: Percentage value (as string) if mode is 'percentage'.
+            width: Target width (as string) if mode is 'dimensions'.
+            height: Target height (as string) if mode is 'dimensions'.
+            maintain_aspect: Whether to maintain aspect ratio if mode is 'dimensions'.
+            draft: Whether to let the JPEG decoder shrink large downscales on load.
+            target_bytes: Maximum output file size in bytes (as string) if mode is
+                'target_bytes'; quality and scale are searched to fit it (see fit_to_bytes).
+            profile: Encoder profile (see ENCODER_PROFILES); the output format
+                follows the output path's extension.
+            quality: Overrides the profile's JPEG/WebP/AVIF quality.
+
+        Returns:
+            A tuple: (original_width, original_height, new_width, new_height, actual_output_path)
+
+        Raises:
+            ValueError: If input parameters are invalid.
+            FileNotFoundError: If input file does not exist.
+            IOError: If image processing fails.
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+        encoder_options("JPEG", profile)  # reject unknown profiles before decoding
+
+        strip_source = _open_strip_source(input_path)
+        if strip_source is not None:
+            img = None
+            orig_height, orig_width = strip_source.shape[:2]
+        else:
+            try:
+                img = Image.open(input_path)
+                orig_width, orig_height = oriented_size(img)
+            except Exception as e:
+                raise IOError(f"Could not open image file: {e}")
+
+        max_bytes = None
+        if resize_mode == "target_bytes":
+            try:
+                max_bytes = int(target_bytes) if target_bytes is not None else 0
+            except ValueError:
+                raise ValueError("Invalid target file size (must be a whole number of bytes).")
+            if max_bytes <= 0:
+                raise ValueError("Target file size must be greater than 0.")
+        new_width, new_height = self.target_size(
+            orig_width, orig_height, resize_mode, percentage, width, height, maintain_aspect
+        )
+        if draft and img is not None:
+            draft_for_size(img, new_width, new_height)
+        if img is not None:
+            # Match the preview, which shows the EXIF-oriented image
+            load_upright(img)
+
+        # Determine output path if not specified
+        actual_output_path = output_path
+        if not actual_output_path:
+            directory = os.path.dirname(input_path) if os.path.dirname(input_path) else "."
+            filename, ext = os.path.splitext(os.path.basename(input_path))
+            timestamp = int(time.time())
+            actual_output_path = os.path.join(directory, f"{filename}_resized_{timestamp}{ext if ext else '.jpg'}")
+
+        if max_bytes is not None:
+            image_format = _output_format(actual_output_path)
+            if img is None:
+                img = _strip_downscale(strip_source, STRIP_SEARCH_MAX_PIXELS)
+            fitted = fit_to_bytes(img, max_bytes, image_format, max_quality=quality, profile=profile)
+            try:
+                _write_atomic(fitted["data"], actual_output_path)
+            except Exception as e:
+                raise IOError(f"Could not save resized image: {e}")
+            quality_text = f" at quality {fitted['quality']}" if fitted["quality"] is not None else ""
+            print(f"Fitted {fitted['width']}x{fitted['height']}{quality_text} into "
+                  f"{len(fitted['data'])} of {max_bytes} bytes after {fitted['iterations']} encodes")
+            return orig_width, orig_height, fitted["width"], fitted["height"], actual_output_path
+
+        if img is None:
+            try:
+                _resize_strips(strip_source, actual_output_path, new_width, new_height, quality, profile)
+            except Exception as e:
+                raise IOError(f"Could not save resized image: {e}")
+            return orig_width, orig_height, new_width, new_height, actual_output_path
+
+        try:
+            # Use LANCZOS filter which is good for downsizing
+            resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+            # Creates the output directory and converts the mode for the output format
+            _save_atomic(resized_img, actual_output_path, quality, profile)
+        except Exception as e:
+            raise IOError(f"Could not save resized image: {e}")
+
+        return orig_width, orig_height, new_width, new_height, actual_output_path
+
+    @staticmethod
+    def target_size(
+            orig_width: int,
+            orig_height: int,
+            resize_mode: str,
+            percentage: Optional[str] = None,
+            width: Optional[str] = None,
+            height: Optional[str] = None,
+            maintain_aspect: bool = True
+    ) -> Tuple[int, int]:
+        """
+        Calculates the output size for an image without opening it.
+
+        Args:
+            orig_width: Width of the original image.
+            orig_height: Height of the original image.
+            resize_mode: 'percentage', 'dimensions' or 'target_bytes' (original size).
+            percentage: Percentage value (as string) if mode is 'percentage'.
+            width: Target width (as string) if mode is 'dimensions'.
+            height: Target height (as string) if mode is 'dimensions'.
+            maintain_aspect: Whether to maintain aspect ratio if mode is 'dimensions'.
+
+        Returns:
+            A tuple: (new_width, new_height)
+
+        Raises:
+            ValueError: If input parameters are invalid.
+        """
+        new_width, new_height = None, None
+
+        if resize_mode == "percentage":
+            if percentage is None:
+                raise ValueError("Percentage value is required for percentage mode.")
+            try:
+                percent_val = float(percentage)
+                if percent_val <= 0:
+                    raise ValueError("Percentage must be greater than 0.")
+                new_width = int(orig_width * percent_val / 100)
+                new_height = int(orig_height * percent_val / 100)
+            except ValueError:
+                raise ValueError("Invalid percentage value.")
+
+        elif resize_mode == "dimensions":
+            width_val: Optional[int] = None
+            height_val: Optional[int] = None
+
+            try:
+                if width and width.strip():
+                    width_val = int(width.strip())
+                    if width_val <= 0:
+                        raise ValueError("Width must be greater than 0.")
+                if height and height.strip():
+                    height_val = int(height.strip())
+                    if height_val <= 0:
+                        raise ValueError("Height must be greater than 0.")
+            except ValueError:
+                raise ValueError("Invalid dimension value (width or height must be integers).")
+
+            if width_val is None and height_val is None:
+                raise ValueError("Please provide at least one dimension (width or height).")
+
+            if maintain_aspect:
+                if width_val is not None and height_val is None:
+                    new_width = width_val
+                    new_height = int(width_val * orig_height / orig_width)
+                elif height_val is not None and width_val is None:
+                    new_height = height_val
+                    new_width = int(new_height * orig_width / orig_height)
+                elif width_val is not None and height_val is not None:
+                    # If both provided, resize to fit within these dimensions while maintaining aspect ratio
+                    ratio_w = width_val / orig_width
+                    ratio_h = height_val / orig_height
+                    if ratio_w < ratio_h:
+                        new_width = width_val
+                        new_height = int(orig_height * ratio_w)
+                    else:
+                        new_height = height_val
+                        new_width = int(orig_width * ratio_h)
+            else:
+                # No aspect ratio maintenance, just use provided values, defaulting to original if None
+                new_width = width_val if width_val is not None else orig_width
+                new_height = height_val if height_val is not None else orig_height
+
+        elif resize_mode == "target_bytes":
+            # The file size search (fit_to_bytes) starts from the original size
+            new_width, new_height = orig_width, orig_height
+
+        else:
+            raise ValueError(f"Unknown resize mode: {resize_mode}")
+
+        # Ensure valid dimensions result
+        if new_width <= 0 or new_height <= 0:
+            raise ValueError("Calculated dimensions are invalid.")
+
+        return new_width, new_height
+
+
+def _exif_orientation(img: Image.Image) -> int:
+    """Return an opened image's EXIF orientation (1 if absent or unreadable)."""
+    try:
+        return int(img.getexif().get(EXIF_ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def oriented_size(img: Image.Image) -> Tuple[int, int]:
+    """Return an opened image's (width, height) as displayed, i.e. after its EXIF orientation."""
+    if _exif_orientation(img) in TRANSPOSED_ORIENTATIONS:
+        return img.height, img.width
+    return img.width, img.height
+
+
+def load_upright(img: Image.Image) -> Image.Image:
+    """
+    Decode an opened image and apply its EXIF orientation.
+
+    The pixels are rotated or flipped in place and the Orientation tag is
+    dropped, so outputs saved from the image display the same way as the
+    input, without any EXIF.
+
+    Raises:
+        IOError: If the image cannot be decoded
+    """
+    try:
+        img.load()
+        ImageOps.exif_transpose(img, in_place=True)
+    except Exception as e:
+        raise IOError(f"Could not decode image file: {e}")
+    return img
+
+
+def draft_for_size(img: Image.Image, width: int, height: int) -> int:
+    """
+    Let the JPEG decoder shrink an opened image while decoding it.
+
+    JPEGs can be decoded at 1/2, 1/4 or 1/8 scale for a fraction of the
+    time and memory of a full decode. The largest reduction is chosen that
+    still leaves DRAFT_MIN_FACTOR times the target size, so the LANCZOS
+    pass that follows keeps its quality (at least 40 dB PSNR against a full
+    decode, see benchmarks/draft_psnr.py); a tighter decode loses visible
+    detail. Must be called before the image is loaded; other
+    formats are left as they are.
+
+    Args:
+        img: Opened, not yet loaded image
+        width: Largest output width that will be made from it, upright (see oriented_size)
+        height: Largest output height that will be made from it, upright
+
+    Returns:
+        The reduction factor applied (1 if none)
+    """
+    if img.format != "JPEG":
+        return 1
+    if _exif_orientation(img) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    original_width = img.width
+    img.draft(img.mode, (int(width * DRAFT_MIN_FACTOR), int(height * DRAFT_MIN_FACTOR)))
+    return round(original_width / img.width)
+
+
+# --- Batch resizing ---
+
+class ResizeSpec(NamedTuple):
+    """One output size, in the terms ImageResizer.target_size takes."""
+    label: str
+    resize_mode: str
+    percentage: Optional[str] = None
+    width: Optional[str] = None
+    height: Optional[str] = None
+    maintain_aspect: bool = True
+    target_bytes: Optional[int] = None
+
+
+def parse_size(spec: str, maintain_aspect: bool = True) -> ResizeSpec:
+    """
+    Parse a size such as '50%', '800x600', '800x' (width only), 'x600' or '150kb'.
+
+    With both dimensions and maintain_aspect, the image is fitted inside
+    the box; without maintain_aspect it is stretched to it. A file size
+    ('150kb', '2mb') makes the output the largest, best-quality encoding
+    that fits (see fit_to_bytes).
+
+    Args:
+        spec: Size specification
+        maintain_aspect: Whether to keep the aspect ratio
+
+    Returns:
+        ResizeSpec; its label ('50pct', '800x600', '150kb', ...) names the output directory
+
+    Raises:
+        ValueError: If the specification cannot be parsed
+    """
+    text = spec.strip().lower()
+    unit = SIZE_UNITS.get(text[-2:])
+    if unit is not None:
+        try:
+            max_bytes = int(float(text[:-2]) * unit)
+        except ValueError:
+            max_bytes = 0
+        if max_bytes <= 0:
+            raise ValueError(f"Invalid file size in size '{spec}'")
+        return ResizeSpec(text, "target_bytes", target_bytes=max_bytes)
+
+    if text.endswith("%"):
+        try:
+            valid = float(text[:-1]) > 0
+        except ValueError:
+            valid = False
+        if not valid:
+            raise ValueError(f"Invalid percentage in size '{spec}'")
+        return ResizeSpec(text[:-1] + "pct", "percentage", percentage=text[:-1])
+
+    width, separator, height = text.partition("x")
+    if not separator:
+        width, height = text, ""
+    if not (width.isdigit() or height.isdigit()) or not all(v.isdigit() for v in (width, height) if v):
+        raise ValueError(f"Invalid size '{spec}'; use e.g. 50%, 800x600, 800x, x600 or 150kb")
+    if any(int(v) == 0 for v in (width, height) if v):
+        raise ValueError(f"Invalid size '{spec}'; width and height must be greater than 0")
+    return ResizeSpec(text, "dimensions", width=width or None, height=height or None,
+                      maintain_aspect=maintain_aspect)
+
+
+def _output_format(output_path: str) -> str:
+    """Return the Pillow format for an output path's extension."""
+    extension = os.path.splitext(output_path)[1].lower()
+    image_format = Image.registered_extensions().get(extension)
+    if image_format is None:
+        raise IOError(f"Unsupported output format: {extension}")
+    return image_format
+
+
+@contextmanager
+def _atomic_output(output_path: str) -> Iterator[str]:
+    """Yield a temporary path that replaces output_path once the block succeeds."""
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f".{os.path.basename(output_path)}.{os.getpid()}.tmp")
+    try:
+        yield temporary
+        os.replace(temporary, output_path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def encoder_options(image_format: str, profile: str = DEFAULT_PROFILE,
+                    quality: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Return Pillow save options for a format under an encoder profile.
+
+    Args:
+        image_format: Pillow format name, e.g. 'JPEG' or 'AVIF'
+        profile: Profile name (see ENCODER_PROFILES)
+        quality: Overrides the profile's quality for JPEG, WebP and AVIF
+
+    Returns:
+        Keyword arguments for Image.save (empty for formats without settings)
+
+    Raises:
+        ValueError: If the profile is unknown
+    """
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {profile}. Available profiles: {', '.join(ENCODER_PROFILES)}")
+    options = dict(ENCODER_PROFILES[profile].get(image_format, {}))
+    if quality is not None and image_format in QUALITY_FORMATS:
+        options["quality"] = quality
+    return options
+
+
+def _prepare_for_format(image: Image.Image, image_format: str) -> Image.Image:
+    """Convert an image to a mode the output format can store, keeping alpha where it can."""
+    modes = FORMAT_MODES.get(image_format)
+    if modes is None or image.mode in modes:
+        return image
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    return image.convert("RGBA" if has_alpha and "RGBA" in modes else "RGB")
+
+
+def _save_atomic(image: Image.Image, output_path: str, quality: Optional[int] = None,
+                 profile: str = DEFAULT_PROFILE) -> int:
+    """Save an image through a temporary file and return the output size in bytes."""
+    image_format = _output_format(output_path)
+    image = _prepare_for_format(image, image_format)
+    options = encoder_options(image_format, profile, quality)
+    with _atomic_output(output_path) as temporary:
+        image.save(temporary, format=image_format, **options)
+    return os.path.getsize(output_path)
+
+
+def _write_atomic(data: bytes, output_path: str) -> int:
+    """Write encoded image bytes through a temporary file and return their size."""
+    with _atomic_output(output_path) as temporary:
+        with open(temporary, "wb") as f:
+            f.write(data)
+    return len(data)
+
+
+def _open_strip_source(input_path: str):
+    """
+    Memory-map an input that should be resized in strips.
+
+    Returns:
+        Read-only array for an uncompressed 8-bit grayscale, RGB or RGBA
+        image of at least STRIP_MIN_PIXELS, or None to decode it normally
+    """
+    if os.path.splitext(input_path)[1].lower() not in STRIP_EXTENSIONS:
+        return None
+    try:
+        from image_io import memmap_image
+        mapped = memmap_image(input_path)
+    except (ImportError, ValueError):
+        return None
+    if mapped.dtype.name != "uint8" or not (mapped.ndim == 2 or (mapped.ndim == 3 and mapped.shape[2] in (3, 4))):
+        return None
+    if mapped.shape[0] * mapped.shape[1] < STRIP_MIN_PIXELS:
+        return None
+    if os.path.splitext(input_path)[1].lower() in (".tif", ".tiff"):
+        # The memory map holds the stored pixels; rotated scans are decoded normally
+        try:
+            with Image.open(input_path) as img:
+                if _exif_orientation(img) != 1:
+                    return None
+        except Exception:
+            return None
+    return mapped
+
+
+def _resize_strips(source, output_path: str, width: int, height: int,
+                   quality: Optional[int] = None,
+                   profile: str = DEFAULT_PROFILE) -> Tuple[Optional[Image.Image], int]:
+    """
+    Resize a memory-mapped image in strips and write it atomically.
+
+    TIFF outputs are written row by row and never held in memory; other
+    formats need the whole output for encoding, which is returned so it can
+    serve as a cascade source.
+
+    Returns:
+        (output image, or None if it was written progressively; output size in bytes)
+    """
+    import strip_resize
+
+    if _output_format(output_path) == "TIFF":
+        with _atomic_output(output_path) as temporary:
+            strip_resize.resize_to_file(source, temporary, width, height, "TIFF")
+        return None, os.path.getsize(output_path)
+    image = Image.fromarray(strip_resize.resize_array(source, width, height))
+    return image, _save_atomic(image, output_path, quality, profile)
+
+
+def _strip_downscale(source, max_pixels: int) -> Image.Image:
+    """Resize a memory-mapped image in strips to at most max_pixels, keeping its aspect ratio."""
+    import strip_resize
+
+    height, width = source.shape[:2]
+    scale = min(1.0, (max_pixels / (width * height)) ** 0.5)
+    return Image.fromarray(strip_resize.resize_array(source, max(1, int(width * scale)), max(1, int(height * scale))))
+
+
+def fit_to_bytes(image: Image.Image, target_bytes: int, image_format: str,
+                 max_quality: Optional[int] = None,
+                 min_quality: int = TARGET_MIN_QUALITY,
+                 profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
+    """
+    Find the largest, best-quality encoding of an image within a file size.
+
+    JPEG, WebP and AVIF are first tried at full size and max_quality, then
+    binary-searched over quality, stopping early once an encoding lands
+    within TARGET_TOLERANCE under the target. If even min_quality is too
+    big, the image is scaled down by the estimated factor
+    sqrt(target / size) and the search repeats. Lossless formats only
+    search the scale. For images over TARGET_PROBE_PIXELS, a small copy
+    is encoded first so the search does not start with full-size encodes
+    that cannot fit. Every attempt is encoded into memory; nothing is
+    written.
+
+    Args:
+        image: Image to encode
+        target_bytes: Maximum encoded size in bytes
+        image_format: Pillow format name, e.g. 'JPEG'
+        max_quality: Highest quality to use (defaults to the profile's)
+        min_quality: Lowest quality to accept before scaling down
+        profile: Encoder profile for the other save options (see ENCODER_PROFILES)
+
+    Returns:
+        Dictionary with the encoded data, its width, height and quality
+        (None for lossless formats) and the number of encodes tried
+
+    Raises:
+        ValueError: If the target is not positive, the profile is unknown or
+            the target cannot be met even at 1 pixel
+    """
+    if target_bytes <= 0:
+        raise ValueError("Target file size must be greater than 0.")
+    if image.mode == "P":
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    image = _prepare_for_format(image, image_format)
+    lossy = image_format in QUALITY_FORMATS
+    options = encoder_options(image_format, profile)
+    if max_quality is None:
+        max_quality = options.get("quality", 100)
+    min_quality = min(min_quality, max_quality)
+    iterations = 0
+
+    def encode(candidate: Image.Image, quality: Optional[int]) -> bytes:
+        nonlocal iterations
+        iterations += 1
+        buffer = BytesIO()
+        candidate.save(buffer, format=image_format, **dict(options, **({"quality": quality} if lossy else {})))
+        return buffer.getvalue()
+
+    def result(candidate: Image.Image, data: bytes, quality: Optional[int]) -> Dict[str, Any]:
+        return {"data": data, "width": candidate.width, "height": candidate.height,
+                "quality": quality if lossy else None, "iterations": iterations}
+
+    scale = 1.0
+    pixels = image.width * image.height
+    if pixels > TARGET_PROBE_PIXELS:
+        probe_scale = (TARGET_PROBE_PIXELS / pixels) ** 0.5
+        probe = image.resize((max(1, round(image.width * probe_scale)), max(1, round(image.height * probe_scale))),
+                             Image.Resampling.BILINEAR)
+        estimate = len(encode(probe, min_quality)) * pixels / (probe.width * probe.height)
+        if estimate > target_bytes:
+            scale = (target_bytes / estimate) ** 0.5
+
+    while True:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        candidate = image if size == image.size else image.resize(size, Image.Resampling.LANCZOS)
+
+        data = encode(candidate, max_quality)
+        if len(data) <= target_bytes:
+            return result(candidate, data, max_quality)
+
+        if lossy:
+            smallest = encode(candidate, min_quality)
+            if len(smallest) <= target_bytes:
+                best, best_quality = smallest, min_quality
+                low, high = min_quality + 1, max_quality - 1
+                while low <= high and len(best) < target_bytes * (1 - TARGET_TOLERANCE):
+                    quality = (low + high) // 2
+                    data = encode(candidate, quality)
+                    if len(data) <= target_bytes:
+                        best, best_quality, low = data, quality, quality + 1
+                    else:
+                        high = quality - 1
+                return result(candidate, best, best_quality)
+            data = smallest
+
+        if size == (1, 1):
+            raise ValueError(f"Cannot encode the image as {image_format} in {target_bytes} bytes")
+        scale *= min((target_bytes / len(data)) ** 0.5 * TARGET_SHRINK_MARGIN, TARGET_SHRINK_MARGIN)
+
+
+def resize_file(input_path: str, outputs: List[Tuple[ResizeSpec, str]],
+                quality: Optional[int] = None, skip_existing: bool = False,
+                cascade: bool = True, draft: bool = True,
+                profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
+    """
+    Decode an image once and write it at each requested size.
+
+    With draft, JPEGs are decoded reduced for the largest size (see
+    draft_for_size). Images are turned upright according to their EXIF
+    orientation (see load_upright), and sizes refer to the upright image.
+    Large uncompressed inputs are not decoded at all but resized from a
+    memory map in strips (see _open_strip_source).
+
+    Renditions are produced largest first. With cascade, each one is
+    downscaled from the smallest rendition made so far that is at least
+    CASCADE_MIN_FACTOR times its size in both dimensions, falling back to
+    the original, so small thumbnails never pay for filtering the full
+    image. Upscaled renditions are never used as sources. At that ratio
+    the final LANCZOS pass removes what the first one left, and cascaded
+    outputs stay visually identical to direct ones.
+
+    Args:
+        input_path: Path to the input image
+        outputs: (size, output path) pairs
+        quality: Overrides the profile's JPEG/WebP/AVIF quality
+        skip_existing: Leave outputs alone that are newer than the input
+        cascade: Whether to downscale from earlier renditions
+        draft: Whether to shrink JPEGs on load
+        profile: Encoder profile (see ENCODER_PROFILES)
+
+    Returns:
+        Result record with the original size, decode scale and time, and one entry per
+        output (largest first) with its source, resize and save times; file size
+        targets also report the quality and number of encodes, and their
+        resize time covers the whole search
+
+    Raises:
+        ValueError: If a size or the profile is invalid
+        IOError: If the image cannot be read or an output cannot be written
+    """
+    encoder_options("JPEG", profile)  # reject unknown profiles before decoding
+    start = time.perf_counter()
+    record: Dict[str, Any] = {"input": input_path, "input_bytes": os.path.getsize(input_path)}
+
+    if skip_existing:
+        input_mtime = os.path.getmtime(input_path)
+        outputs = [(size, path) for size, path in outputs
+                   if not (os.path.exists(path) and os.path.getmtime(path) >= input_mtime)]
+        if not outputs:
+            record.update(skipped=True, outputs=[], seconds=round(time.perf_counter() - start, 6))
+            return record
+
+    strip_source = _open_strip_source(input_path)
+    if strip_source is not None:
+        img = None
+        orig_height, orig_width = strip_source.shape[:2]
+    else:
+        try:
+            img = Image.open(input_path)
+        except Exception as e:
+            raise IOError(f"Could not open image file: {e}")
+        orig_width, orig_height = oriented_size(img)
+
+    with img if img is not None else nullcontext():
+        record.update(width=orig_width, height=orig_height, skipped=False)
+        targets = []
+        for size, output_path in outputs:
+            targets.append((size, output_path, ImageResizer.target_size(
+                orig_width, orig_height, size.resize_mode, size.percentage,
+                size.width, size.height, size.maintain_aspect
+            )))
+        targets.sort(key=lambda target: target[2][0] * target[2][1], reverse=True)
+
+        scale = 1
+        if img is not None:
+            if draft:
+                scale = draft_for_size(img, max(t[2][0] for t in targets), max(t[2][1] for t in targets))
+            load_upright(img)
+            if img.mode == "P":
+                # Palette images resize with nearest neighbour only
+                img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        decoded = time.perf_counter()
+        record.update(decode_scale=scale, streamed=strip_source is not None,
+                      decode_seconds=round(decoded - start, 6), outputs=[])
+
+        renditions: List[Tuple[str, Image.Image]] = []
+        for size, output_path, (new_width, new_height) in targets:
+            source_label, source = "original", img
+            if cascade:
+                for label, rendition in reversed(renditions):
+                    if (rendition.width >= new_width * CASCADE_MIN_FACTOR
+                            and rendition.height >= new_height * CASCADE_MIN_FACTOR):
+                        source_label, source = label, rendition
+                        break
+
+            resize_start = time.perf_counter()
+            if size.resize_mode == "target_bytes":
+                if source is None:
+                    source = _strip_downscale(strip_source, STRIP_SEARCH_MAX_PIXELS)
+                fitted = fit_to_bytes(source, size.target_bytes, _output_format(output_path),
+                                      max_quality=quality, profile=profile)
+                new_width, new_height = fitted["width"], fitted["height"]
+                resized_at = time.perf_counter()
+                output_bytes = _write_atomic(fitted["data"], output_path)
+                extra = {"quality": fitted["quality"], "encode_iterations": fitted["iterations"]}
+            else:
+                if source is None:
+                    # Written as it is resized, so the resize time includes the save
+                    resized, output_bytes = _resize_strips(strip_source, output_path, new_width, new_height,
+                                                           quality, profile)
+                    resized_at = time.perf_counter()
+                else:
+                    resized = source.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                    resized_at = time.perf_counter()
+                    output_bytes = _save_atomic(resized, output_path, quality, profile)
+                if resized is not None and new_width <= orig_width and new_height <= orig_height:
+                    renditions.append((size.label, resized))  # upscales never feed a cascade
+                extra = {}
+
+            record["outputs"].append({"size": size.label, "output": output_path,
+                                      "width": new_width, "height": new_height,
+                                      "output_bytes": output_bytes, "source": source_label,
+                                      "resize_seconds": round(resized_at - resize_start, 6),
+                                      "save_seconds": round(time.perf_counter() - resized_at, 6),
+                                      **extra})
+
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def generate_renditions(input_path: str, renditions: Dict[str, str],
+                        quality: Optional[int] = None, cascade: bool = True,
+                        profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
+    """
+    Write several sizes of one image from a single decode.
+
+    Args:
+        input_path: Path to the input image
+        renditions: Size specification (see parse_size) to output path, e.g.
+            {"1600x1600": "large.jpg", "800x800": "medium.jpg", "x120": "thumb.jpg"}
+        quality: Overrides the profile's JPEG/WebP/AVIF quality
+        cascade: Whether to downscale smaller renditions from larger ones
+        profile: Encoder profile (see ENCODER_PROFILES)
+
+    Returns:
+        Result record (see resize_file) with per-rendition timings
+    """
+    outputs = [(parse_size(spec), path) for spec, path in renditions.items()]
+    return resize_file(input_path, outputs, quality=quality, cascade=cascade, profile=profile)
+
+
+def resize_targets(input_path: str, sizes: List[ResizeSpec], output_dir: str = DEFAULT_OUTPUT_DIR,
+                   root: Optional[str] = None, output_format: Optional[str] = None) -> List[Tuple[ResizeSpec, str]]:
+    """
+    Build the output paths of one input for each size.
+
+    With one size, the output goes straight into output_dir; with several,
+    each size gets a subdirectory named after its label.
+
+    Args:
+        input_path: Path to the input image
+        sizes: Output sizes
+        output_dir: Output root directory
+        root: Directory the input was found under; its relative path is kept (optional)
+        output_format: Output extension, e.g. 'jpg' (defaults to the input's)
+
+    Returns:
+        (size, output path) pairs
+    """
+    if len(sizes) == 1:
+        return [(sizes[0], output_path_for(input_path, output_dir, root=root, extension=output_format))]
+    return [(size, output_path_for(input_path, os.path.join(output_dir, size.label), root=root,
+                                   extension=output_format)) for size in sizes]
+
+
+def _claim_outputs(claims: Dict[int, int], job: Dict[str, Any]) -> None:
+    """Mark a job as failed if another input already writes one of its outputs."""
+    for _, output_path in job["outputs"]:
+        collision = claim_output(claims, output_path, job["input"])
+        if collision:
+            job["error"] = collision
+            return
+
+
+def iter_resize_jobs(inputs: List[str], sizes: List[ResizeSpec], output_dir: str = DEFAULT_OUTPUT_DIR,
+                     manifest: Optional[str] = None, recursive: bool = False,
+                     output_format: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Build resize jobs, lazily.
+
+    Outputs are laid out as in resize_targets; inputs found under a
+    directory keep their path relative to it. A job whose output another
+    input already writes carries an "error" key instead of overwriting it.
+
+    Args:
+        inputs: Image files, directories or glob patterns
+        sizes: Output sizes
+        output_dir: Output root directory
+        manifest: JSONL manifest of {"input": ..., "output": ...} lines ('-' for stdin);
+            "output" is only used with a single size
+        recursive: Whether to descend into subdirectories of input directories
+        output_format: Output extension, e.g. 'jpg' (defaults to the input's)
+
+    Yields:
+        Job dictionaries with index, input and (size, output path) pairs
+    """
+    claims: Dict[int, int] = {}
+    index = 0
+    for spec in inputs:
+        for path, root in iter_input_paths(spec, recursive=recursive):
+            job = {"index": index, "input": path,
+                   "outputs": resize_targets(path, sizes, output_dir, root, output_format)}
+            _claim_outputs(claims, job)
+            yield job
+            index += 1
+
+    if manifest:
+        stream = sys.stdin if manifest == "-" else open(manifest, "r", encoding="utf-8")
+        try:
+            for job in iter_manifest(stream):
+                job["index"] = index
+                if job.get("input"):
+                    if job.get("output") and len(sizes) == 1:
+                        job["outputs"] = [(sizes[0], job["output"])]
+                    else:
+                        job["outputs"] = resize_targets(job["input"], sizes, output_dir,
+                                                        output_format=output_format)
+                    if not job.get("error"):
+                        _claim_outputs(claims, job)
+                yield job
+                index += 1
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def run_resize_job(job: Dict[str, Any], quality: Optional[int] = None,
+                   skip_existing: bool = False, cascade: bool = True,
+                   draft: bool = True, profile: str = DEFAULT_PROFILE) -> Dict[str, Any]:
+    """Run a single resize job and turn any failure into an error record."""
+    record = {"index": job.get("index"), "input": job.get("input")}
+    try:
+        if job.get("error"):
+            raise ValueError(job["error"])
+        record.update(resize_file(job["input"], job["outputs"], quality=quality,
+                                  skip_existing=skip_existing, cascade=cascade, draft=draft,
+                                  profile=profile))
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    return record
+
+
+def resize_batch(jobs: Iterator[Dict[str, Any]],
+                 workers: int = 1,
+                 max_in_flight: Optional[int] = None,
+                 quality: Optional[int] = None,
+                 skip_existing: bool = False,
+                 cascade: bool = True,
+                 draft: bool = True,
+                 profile: str = DEFAULT_PROFILE,
+                 stream: Optional[TextIO] = None,
+                 progress: bool = True) -> Dict[str, Any]:
+    """
+    Run resize jobs on a process pool, writing one JSON result line per image.
+
+    Results are written in completion order; use the "index" field to match
+    them to inputs. Only max_in_flight jobs are queued at once, so inputs
+    are discovered only as fast as they are resized.
+
+    Args:
+        jobs: Iterator of job dictionaries (see iter_resize_jobs)
+        workers: Number of worker processes (1 runs jobs in this process)
+        max_in_flight: Maximum number of queued jobs (defaults to 4 per worker)
+        quality: Overrides the profile's JPEG/WebP/AVIF quality
+        skip_existing: Leave outputs alone that are newer than their input
+        cascade: Whether to downscale smaller renditions from larger ones
+        draft: Whether to shrink JPEGs on load for large downscales
+        profile: Encoder profile (see ENCODER_PROFILES)
+        stream: Text stream for result lines (defaults to stdout)
+        progress: Print progress and throughput to stderr every few seconds
+
+    Returns:
+        Summary with image, failure, skip and output counts, bytes read and
+        written, elapsed time, throughput and per-rendition totals (count,
+        cascaded count, resize and save seconds) keyed by size label
+    """
+    stream = stream or sys.stdout
+    summary = {"images": 0, "succeeded": 0, "failed": 0, "skipped": 0, "outputs": 0,
+               "input_bytes": 0, "output_bytes": 0, "decode_seconds": 0.0, "renditions": {}}
+    start = time.perf_counter()
+    last_report = start
+
+    def emit(record: Dict[str, Any]) -> None:
+        nonlocal last_report
+        summary["images"] += 1
+        if record["status"] != "ok":
+            summary["failed"] += 1
+        else:
+            summary["succeeded"] += 1
+            summary["skipped"] += bool(record.get("skipped"))
+            summary["outputs"] += len(record["outputs"])
+            if not record.get("skipped"):
+                summary["input_bytes"] += record["input_bytes"]
+                summary["decode_seconds"] += record["decode_seconds"]
+            for output in record["outputs"]:
+                summary["output_bytes"] += output["output_bytes"]
+                totals = summary["renditions"].setdefault(
+                    output["size"], {"count": 0, "cascaded": 0, "resize_seconds": 0.0, "save_seconds": 0.0})
+                totals["count"] += 1
+                totals["cascaded"] += output["source"] != "original"
+                totals["resize_seconds"] += output["resize_seconds"]
+                totals["save_seconds"] += output["save_seconds"]
+        stream.write(json.dumps(record) + "\n")
+
+        now = time.perf_counter()
+        if progress and now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            print(f"Resized {summary['images']} images ({summary['failed']} failed), "
+                  f"{summary['images'] / (now - start):.1f} images/s", file=sys.stderr)
+
+    if workers <= 1:
+        for job in jobs:
+            emit(run_resize_job(job, quality, skip_existing, cascade, draft, profile))
+    else:
+        max_in_flight = max_in_flight or workers * IN_FLIGHT_PER_WORKER
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+
+            def drain(block_until: int) -> None:
+                while len(pending) > block_until:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = pending.pop(future)
+                        try:
+                            record = future.result()
+                        except Exception as e:
+                            # The worker died (e.g. killed for memory); report and carry on
+                            record = {"index": job.get("index"), "input": job.get("input"),
+                                      "status": "error", "error": f"Worker failed: {str(e)}"}
+                        emit(record)
+
+            for job in jobs:
+                drain(max_in_flight - 1)
+                pending[executor.submit(run_resize_job, job, quality, skip_existing,
+                                         cascade, draft, profile)] = job
+            drain(0)
+
+    stream.flush()
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    summary["images_per_second"] = round(summary["images"] / summary["seconds"], 2) if summary["seconds"] else 0.0
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the batch resizer's argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="image-resizer",
+        description="Resize images in bulk into one or more sizes. "
+                    "Writes one JSON result line per image to stdout."
+    )
+    parser.add_argument("--input", "-i", action="append", default=[],
+                        help="Image file, directory or glob pattern (can be repeated)")
+    parser.add_argument("--manifest", "-m", help="JSONL manifest of images ('-' reads from stdin)")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT_DIR,
+                        help=f"Output directory (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--size", "-s", action="append", required=True,
+                        help="Output size: 50%%, 800x600 (fit inside), 800x, x600 or a file size "
+                             "such as 150kb (can be repeated)")
+    parser.add_argument("--exact", action="store_true",
+                        help="Stretch to WIDTHxHEIGHT instead of keeping the aspect ratio")
+    parser.add_argument("--format", help="Output format extension, e.g. jpg, webp or avif (default: same as input)")
+    parser.add_argument("--profile", choices=sorted(ENCODER_PROFILES), default=DEFAULT_PROFILE,
+                        help="Encoder settings: web (default), quality, small or fast")
+    parser.add_argument("--quality", type=int,
+                        help="JPEG/WebP/AVIF quality instead of the profile's (the highest tried for file size targets)")
+    parser.add_argument("--recursive", "-r", action="store_true",
+                        help="Descend into subdirectories of input directories")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Maximum number of queued images (default: 4 per worker)")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Skip outputs that are newer than their input (resume an interrupted run)")
+    parser.add_argument("--no-cascade", action="store_true",
+                        help="Resize every size from the original instead of from larger renditions")
+    parser.add_argument("--no-draft", action="store_true",
+                        help="Always decode JPEGs at full size instead of shrinking them on load")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Do not report progress")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the batch resizer from the command line.
+
+    Args:
+        argv: Command-line arguments (defaults to sys.argv[1:])
+
+    Returns:
+        Process exit code: 0 if every image succeeded, 1 otherwise
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not (args.input or args.manifest):
+        parser.error("no images given; use --input and/or --manifest")
+    try:
+        sizes = [parse_size(spec, maintain_aspect=not args.exact) for spec in args.size]
+    except ValueError as e:
+        parser.error(str(e))
+    if len({size.label for size in sizes}) != len(sizes):
+        parser.error("sizes must be distinct")
+
+    jobs = iter_resize_jobs(args.input, sizes, args.output, manifest=args.manifest,
+                            recursive=args.recursive, output_format=args.format)
+    try:
+        summary = resize_batch(jobs, workers=args.workers, max_in_flight=args.max_in_flight,
+                               quality=args.quality, profile=args.profile, skip_existing=args.skip_existing,
+                               cascade=not args.no_cascade, draft=not args.no_draft, progress=not args.quiet)
+    except BrokenPipeError:
+        # The consumer of our output went away (e.g. piped into head)
+        sys.stderr.close()
+        return 1
+
+    megabytes = summary["input_bytes"] / 1024 ** 2
+    print(f"Resized {summary['images']} images into {summary['outputs']} outputs "
+          f"({summary['failed']} failed, {summary['skipped']} already up to date) "
+          f"in {summary['seconds']:.2f}s ({summary['images_per_second']:.1f} images/s, "
+          f"{megabytes / summary['seconds'] if summary['seconds'] else 0.0:.1f} MB/s read)", file=sys.stderr)
+    if summary["renditions"]:
+        print(f"  {'decode':<12} {summary['decode_seconds']:>9.2f}s", file=sys.stderr)
+        for label, totals in summary["renditions"].items():
+            print(f"  {label:<12} resize {totals['resize_seconds']:>8.2f}s  save {totals['save_seconds']:>8.2f}s  "
+                  f"({totals['count']} images, {totals['cascaded']} cascaded)", file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
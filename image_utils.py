@@ -8,20 +8,31 @@ the image processing package.
 from typing import Tuple, Optional, Union
 import os
 
-import cv2
-import imageio.v3 as iio
-import matplotlib.pyplot as plt
 import numpy as np
 from PIL import Image
 
+import display
+from contact_sheet import build_contact_sheet, save_contact_sheet
+from image_io import AsyncImageWriter, decode_image, memmap_image, write_image
 
-def load_image(image_path: str, as_grayscale: bool = False) -> np.ndarray:
+
+def load_image(image_path: str, as_grayscale: bool = False,
+               reduce: int = 1, color_order: str = "RGB",
+               mmap: bool = False) -> np.ndarray:
     """
     Load an image from a file path.
     
     Args:
         image_path: Path to the image file
         as_grayscale: Whether to load the image as grayscale
+        reduce: Decode at 1/reduce resolution (1, 2, 4 or 8); JPEGs are scaled
+            inside the decoder, which is much faster for previews and thumbnails
+        color_order: 'RGB', or 'BGR' to skip the channel swap when the consumer
+            works in OpenCV's native order
+        mmap: Return a read-only, zero-copy memory-mapped view instead of
+            decoding (uncompressed TIFF, .npy, PGM/PPM). Pixels are returned as
+            stored, so as_grayscale, reduce and color_order cannot be combined
+            with it; slice a region and convert that instead.
         
     Returns:
         Image as a numpy array
@@ -32,41 +43,45 @@ def load_image(image_path: str, as_grayscale: bool = False) -> np.ndarray:
     if not os.path.exists(image_path):
         raise ValueError(f"Image file not found: {image_path}")
         
+    if mmap:
+        if as_grayscale or reduce != 1 or color_order != "RGB":
+            raise ValueError("mmap=True cannot be combined with as_grayscale, reduce or color_order")
+        return memmap_image(image_path)
+
     try:
-        if as_grayscale:
-            image = iio.imread(image_path, mode="L")
-        else:
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Failed to load image: {image_path}")
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        return image
+        return decode_image(image_path, as_grayscale=as_grayscale, reduce=reduce, color_order=color_order)
     except Exception as e:
         raise ValueError(f"Error loading image {image_path}: {str(e)}")
 
 
-def save_image(image: np.ndarray, output_path: str) -> bool:
+def save_image(image: np.ndarray, output_path: str,
+               quality: Optional[int] = None,
+               compression: Optional[int] = None,
+               writer: Optional[AsyncImageWriter] = None) -> bool:
     """
     Save an image to the specified file path.
     
+    The encoder is chosen from the file extension (JPEG, PNG, WebP, TIFF, ...).
+    
     Args:
         image: The image to save as a numpy array
         output_path: The file path where the image will be saved
+        quality: JPEG/WebP quality 1-100 (optional)
+        compression: PNG compression level 0-9 (optional)
+        writer: Background writer to queue the image on instead of writing
+            synchronously (optional)
         
     Returns:
-        True if successful, False otherwise
+        True if successful (or queued), False otherwise
     """
+    if writer is not None:
+        writer.submit(image, output_path, quality=quality, compression=compression)
+        return True
+
     try:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-        
-        success = iio.imwrite(output_path, image, plugin='tifffile')
-        if success:
-            print(f"Image successfully saved to {output_path}")
-            return True
-        else:
-            print(f"Error: Unable to save the image to {output_path}")
-            return False
+        write_image(image, output_path, quality=quality, compression=compression)
+        print(f"Image successfully saved to {output_path}")
+        return True
     except Exception as e:
         print(f"Error saving image to {output_path}: {str(e)}")
         return False
@@ -75,17 +90,39 @@ def save_image(image: np.ndarray, output_path: str) -> bool:
 def display_comparison(original: np.ndarray, processed: np.ndarray,
                        original_title: str = "Original", 
                        processed_title: str = "Processed", 
-                       subplot_figsize: Tuple[int, int] = (12, 6)) -> None:
+                       subplot_figsize: Tuple[int, int] = (12, 6)) -> Optional[str]:
     """
     Display original and processed images side by side.
     
+    In 'headless' display mode the comparison is rendered to a PNG file on a
+    background thread instead of opening a window; in 'off' mode nothing is
+    shown (see the display module).
+    
     Args:
         original: Original image as numpy array
         processed: Processed image as numpy array
         original_title: Title for the original image
         processed_title: Title for the processed image
         subplot_figsize: Figure size for the subplot
+        
+    Returns:
+        Path of the rendered PNG in headless mode, None otherwise
     """
+    mode = display.get_display_mode()
+    if mode == "off":
+        return None
+    if mode == "headless":
+        return display.get_renderer().submit(
+            lambda path: display.save_figure(
+                display.build_comparison_figure(original, processed, original_title,
+                                                processed_title, subplot_figsize),
+                path
+            ),
+            title=processed_title
+        )
+
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=subplot_figsize)
 
     plt.subplot(1, 2, 1)
@@ -100,50 +137,48 @@ def display_comparison(original: np.ndarray, processed: np.ndarray,
 
     plt.tight_layout()
     plt.show()
+    return None
 
 
 def display_multiple_images(images: list, titles: list, 
                            rows: int = None, cols: int = None,
-                           figsize: Tuple[int, int] = (15, 15)) -> None:
+                           figsize: Tuple[int, int] = (15, 15)) -> Optional[str]:
     """
     Display multiple images in a grid.
     
+    The grid is drawn as a single contact sheet (see contact_sheet) rather than
+    one matplotlib axes per image. Honours the display mode in the same way as
+    display_comparison.
+    
     Args:
         images: List of images to display
         titles: List of titles for each image
         rows: Number of rows in the grid (calculated automatically if None)
         cols: Number of columns in the grid (calculated automatically if None)
         figsize: Figure size
+        
+    Returns:
+        Path of the rendered PNG in headless mode, None otherwise
     """
     n_images = len(images)
-    if n_images == 0:
-        return
+    mode = display.get_display_mode()
+    if n_images == 0 or mode == "off":
+        return None
         
-    if rows is None and cols is None:
-        # Calculate a reasonable grid size
-        cols = min(4, n_images)
-        rows = (n_images + cols - 1) // cols
-    elif rows is None:
-        rows = (n_images + cols - 1) // cols
-    elif cols is None:
+    if cols is None and rows is not None:
         cols = (n_images + rows - 1) // rows
-        
-    fig, axes = plt.subplots(rows, cols, figsize=figsize)
-    
-    if rows * cols == 1:
-        axes = np.array([axes])
-    
-    axes = axes.flatten()
-    
-    for i, (image, title) in enumerate(zip(images, titles)):
-        if i < len(axes):
-            axes[i].imshow(image)
-            axes[i].set_title(title)
-            axes[i].axis("off")
-    
-    # Hide any unused subplots
-    for i in range(n_images, len(axes)):
-        axes[i].axis("off")
-        
+
+    if mode == "headless":
+        return display.get_renderer().submit(
+            lambda path: save_contact_sheet(images, path, titles, cols=cols),
+            title="grid"
+        )
+
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=figsize)
+    plt.imshow(build_contact_sheet(images, titles, cols=cols))
+    plt.axis("off")
     plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    plt.show()
+    return None
@@ -1,8 +1,12 @@
 """
-Main entry point for the image processing application GUI.
+Main entry point for the image processing application.
+
+Without arguments this launches the GUI; with arguments it runs the batch
+command-line interface (see cli.py).
 """
 
 import os
+import sys
 import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
@@ -236,7 +240,8 @@ class ImageProcessingGUI:
                     method=self.edge_method.get(),
                     blur=float(self.edge_blur.get()),
                     high_threshold=int(self.edge_high.get()),
-                    low_threshold=int(self.edge_low.get())
+                    low_threshold=int(self.edge_low.get()),
+                    display_result=True
                 )
 
             elif process_type == "sharpen":
@@ -246,17 +251,19 @@ class ImageProcessingGUI:
                     method=self.sharpen_method.get(),
                     blur_kernel_size=int(self.kernel_size.get()),
                     sharpening_amount=float(self.sharpen_amount.get()),
-                    threshold=int(self.sharpen_threshold.get())
+                    threshold=int(self.sharpen_threshold.get()),
+                    display_result=True
                 )
 
             else:  # filter
                 if self.filter_choice.get() == "all":
-                    apply_pil_filters(self.input_path)
+                    apply_pil_filters(self.input_path, display_result=True)
                 else:
                     apply_single_filter(
                         self.input_path,
                         filter_name=self.filter_choice.get(),
-                        output_path=self.output_path
+                        output_path=self.output_path,
+                        display_result=True
                     )
 
             messagebox.showinfo("Success", f"Image processed and saved to {self.output_path}")
@@ -266,6 +273,10 @@ class ImageProcessingGUI:
 
 
 def main():
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main())
+
     app = ImageProcessingGUI()
     app.window.mainloop()
 
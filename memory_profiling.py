@@ -0,0 +1,197 @@
+"""
+Opt-in memory profiling of processing stages.
+
+A MemoryProfiler records, for each named stage (decode, blur, gradient,
+nms, hysteresis, save, ...), how far traced memory rose above its level at
+the start of the stage. That rise is the temporaries a worker has to budget
+for on top of what it already holds. Stages can be nested; a parent's peak
+includes its children's.
+
+Memory is measured with ``tracemalloc``, which also sees NumPy's data
+buffers: NumPy reports them in its own tracemalloc domain, so each stage
+also records how many bytes of NumPy arrays were still alive at its end.
+Arrays returned by OpenCV and SciPy are NumPy arrays and are counted;
+scratch memory those libraries allocate internally is not.
+
+Profiling is off unless a profiler is passed in. Tracing slows the
+pure-Python loops of the Canny detector (non-maximum suppression and
+hysteresis) by an order of magnitude or more, so timings taken while
+profiling are not representative.
+
+Example:
+    profiler = MemoryProfiler("scan.tif")
+    with profiler:
+        detect_edges("scan.tif", "edges.png", profiler=profiler)
+    print(profiler.format_table())
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+# Constants
+NUMPY_DOMAIN = np.lib.tracemalloc_domain
+TRACEBACK_FRAMES = 1
+BYTE_FIELDS = ("peak_bytes", "peak_increase_bytes", "retained_bytes", "numpy_bytes")
+
+
+def _numpy_bytes() -> int:
+    """Return the bytes held by live NumPy data buffers."""
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.DomainFilter(True, NUMPY_DOMAIN)])
+    return sum(trace.size for trace in snapshot.traces)
+
+
+def format_bytes(size: float) -> str:
+    """Format a byte count for reports."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{int(size)} B" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class MemoryProfiler:
+    """
+    Records peak traced memory per processing stage.
+
+    Tracing starts with the first stage (or on entering the profiler as a
+    context manager) and is stopped by stop() if this profiler started it.
+
+    Args:
+        label: Name of the profiled run, e.g. the input path (optional)
+
+    Note:
+        Per-stage peaks need tracemalloc.reset_peak (Python 3.9+); on older
+        versions a stage's peak is the highest level since tracing started.
+    """
+
+    def __init__(self, label: Optional[str] = None):
+        self.label = label
+        self.stages: List[Dict[str, Any]] = []
+        self._open: List[Dict[str, Any]] = []
+        self._owns_tracing = False
+
+    def start(self) -> None:
+        """Start tracing allocations if nothing else is tracing them."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+            self._owns_tracing = True
+
+    def stop(self) -> None:
+        """Stop tracing, if this profiler started it."""
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def __enter__(self) -> "MemoryProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Profile the enclosed block as a stage.
+
+        Args:
+            name: Stage name
+        """
+        self.start()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._open:
+            # The parent's peak so far, before the counter is reset for this stage
+            self._open[-1]["_peak"] = max(self._open[-1]["_peak"], peak)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        record = {"stage": name, "depth": len(self._open), "start_bytes": current, "_peak": current}
+        self.stages.append(record)  # in start order; filled in on exit
+        self._open.append(record)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            end, peak = tracemalloc.get_traced_memory()
+            self._open.pop()
+            peak = max(record.pop("_peak"), peak)
+            record.update(
+                peak_bytes=peak,
+                peak_increase_bytes=peak - current,
+                retained_bytes=end - current,
+                numpy_bytes=_numpy_bytes(),
+                seconds=round(time.perf_counter() - started, 6),
+            )
+            if self._open:
+                self._open[-1]["_peak"] = max(self._open[-1]["_peak"], peak)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the label, the stage records and the highest peak."""
+        return {
+            "label": self.label,
+            "peak_bytes": max((s["peak_bytes"] for s in self.stages), default=0),
+            "stages": self.stages,
+        }
+
+    def format_table(self) -> str:
+        """Return the stages as a text table."""
+        return format_table(self.stages)
+
+    def write_json(self, path: str) -> None:
+        """Write the profile as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+def profile_stage(profiler: Optional[MemoryProfiler], name: str):
+    """Return a profiler's stage context, or a no-op context without a profiler."""
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+def merge_stages(runs: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Combine the stages of several runs, keeping the worst case of each.
+
+    Args:
+        runs: Stage lists, e.g. MemoryProfiler.stages from each processed file
+
+    Returns:
+        One record per (depth, stage name) in first-seen order, with the
+        maximum of each byte field and time, and the number of runs seen
+    """
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for stages in runs:
+        for stage in stages:
+            key = (stage["depth"], stage["stage"])
+            if key not in merged:
+                merged[key] = dict(stage, runs=0)
+            worst = merged[key]
+            worst["runs"] += 1
+            for field in BYTE_FIELDS + ("seconds",):
+                worst[field] = max(worst[field], stage[field])
+    return list(merged.values())
+
+
+def format_table(stages: List[Dict[str, Any]]) -> str:
+    """
+    Format stage records as a text table.
+
+    Args:
+        stages: Stage records (MemoryProfiler.stages or merge_stages output)
+
+    Returns:
+        Table with the peak rise, retained bytes, live NumPy bytes and time per stage
+    """
+    lines = [f"{'Stage':<22} {'Peak rise':>11} {'Peak total':>11} {'Retained':>11} {'NumPy live':>11} {'Time':>9}"]
+    for stage in stages:
+        name = "  " * stage["depth"] + stage["stage"]
+        lines.append(f"{name:<22} {format_bytes(stage['peak_increase_bytes']):>11} "
+                     f"{format_bytes(stage['peak_bytes']):>11} {format_bytes(stage['retained_bytes']):>11} "
+                     f"{format_bytes(stage['numpy_bytes']):>11} {stage['seconds']:>8.3f}s")
+    return "\n".join(lines)
@@ -0,0 +1,292 @@
+"""
+Named image operations shared by the batch CLI and other headless entry points.
+
+Each operation ('edge', 'sharpen', 'filter') works on an in-memory numpy
+array and takes its parameters as keyword arguments, so callers can
+describe a job as plain data (for example one JSON line per image).
+"""
+
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from edge_detection import canny_edge_detector
+from filters import filter_image
+from image_utils import load_image
+from image_io import decode_image_bytes, encode_image, write_image
+from memory_profiling import MemoryProfiler, profile_stage
+from result_cache import ResultCache
+from sharpening import (apply_unsharp_mask, sharpen_with_cv2, sharpen_with_tensorflow,
+                        sharpen_images_with_tensorflow,
+                        GAUSSIAN_BLUR_KERNEL_SIZE, SHARPENING_AMOUNT, NOISE_THRESHOLD)
+
+
+# Constants
+OPERATION_PARAMS: Dict[str, Dict[str, Any]] = {
+    "edge": {
+        "method": "canny",
+        "blur": 1.0,
+        "high_threshold": 91,
+        "low_threshold": 31,
+    },
+    "sharpen": {
+        "method": "unsharp_mask",
+        "blur_kernel_size": GAUSSIAN_BLUR_KERNEL_SIZE,
+        "sharpening_amount": SHARPENING_AMOUNT,
+        "threshold": NOISE_THRESHOLD,
+    },
+    "filter": {
+        "filter_name": "sharpen",
+    },
+}
+OPERATIONS = tuple(OPERATION_PARAMS)
+GRAYSCALE_OPERATIONS = {"edge"}
+
+
+def resolve_params(operation: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Merge caller parameters over an operation's defaults.
+
+    Args:
+        operation: Operation name ('edge', 'sharpen' or 'filter')
+        params: Parameters to override (optional)
+
+    Returns:
+        Complete parameter dictionary
+
+    Raises:
+        ValueError: If the operation or a parameter name is unknown
+    """
+    if operation not in OPERATION_PARAMS:
+        raise ValueError(f"Unsupported operation: {operation}. Available operations: {', '.join(OPERATIONS)}")
+
+    resolved = dict(OPERATION_PARAMS[operation])
+    for name, value in (params or {}).items():
+        if name not in resolved:
+            raise ValueError(f"Unknown parameter '{name}' for operation '{operation}'. "
+                             f"Valid parameters: {', '.join(resolved)}")
+        resolved[name] = value
+    return resolved
+
+
+def parse_operation_params(operation: str, values: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Convert string parameter values (from a URL or command line) to typed parameters.
+
+    Each value is converted to the type of the parameter's default.
+
+    Args:
+        operation: Operation name
+        values: Parameter names mapped to string values
+
+    Returns:
+        Complete parameter dictionary
+
+    Raises:
+        ValueError: If a parameter is unknown or has the wrong type
+    """
+    defaults = resolve_params(operation)
+    params = {}
+    for name, value in values.items():
+        if name not in defaults:
+            # Let resolve_params produce the standard error message
+            resolve_params(operation, {name: value})
+        try:
+            params[name] = type(defaults[name])(value)
+        except ValueError:
+            raise ValueError(f"Invalid value for '{name}': {value}")
+    return resolve_params(operation, params)
+
+
+def run_operation(operation: str, image: np.ndarray, profiler: Optional[MemoryProfiler] = None,
+                  **params) -> np.ndarray:
+    """
+    Apply a named operation to an image array.
+
+    Args:
+        operation: Operation name ('edge', 'sharpen' or 'filter')
+        image: Input image as numpy array (grayscale for 'edge', RGB otherwise)
+        profiler: Records peak memory of the operation's internal stages (optional)
+        **params: Operation parameters (see OPERATION_PARAMS for names and defaults)
+
+    Returns:
+        Processed image as numpy array
+    """
+    params = resolve_params(operation, params)
+
+    if operation == "edge":
+        if params["method"].lower() != "canny":
+            raise ValueError(f"Unsupported edge detection method: {params['method']}")
+        return canny_edge_detector(
+            image,
+            blur=float(params["blur"]),
+            high_threshold=int(params["high_threshold"]),
+            low_threshold=int(params["low_threshold"]),
+            profiler=profiler
+        )
+
+    if operation == "sharpen":
+        method = params["method"].lower()
+        if method == "unsharp_mask":
+            return apply_unsharp_mask(
+                image,
+                blur_kernel_size=int(params["blur_kernel_size"]),
+                sharpening_amount=float(params["sharpening_amount"]),
+                threshold=int(params["threshold"])
+            )
+        elif method == "cv2":
+            return sharpen_with_cv2(image)
+        elif method == "tensorflow":
+            return sharpen_with_tensorflow(image)
+        raise ValueError(f"Unsupported sharpening method: {params['method']}")
+
+    return np.asarray(filter_image(image, params["filter_name"]))
+
+
+def run_batch(operation: str, images: List[np.ndarray], **params) -> List[np.ndarray]:
+    """
+    Apply a named operation to several images with the same parameters.
+
+    TensorFlow sharpening runs equally shaped images through one session
+    call; other operations are applied image by image.
+
+    Args:
+        operation: Operation name ('edge', 'sharpen' or 'filter')
+        images: Input images as numpy arrays
+        **params: Operation parameters shared by every image
+
+    Returns:
+        Processed images, in input order
+    """
+    params = resolve_params(operation, params)
+    if operation == "sharpen" and params["method"].lower() == "tensorflow":
+        return sharpen_images_with_tensorflow(images)
+    return [run_operation(operation, image, **params) for image in images]
+
+
+def process_bytes(data: bytes, operation: str,
+                  params: Optional[Dict[str, Any]] = None,
+                  output_format: str = "png",
+                  quality: Optional[int] = None) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Decode an encoded image, apply an operation and encode the result.
+
+    Args:
+        data: Encoded input image
+        operation: Operation name ('edge', 'sharpen' or 'filter')
+        params: Operation parameters (optional)
+        output_format: Output format extension such as 'png' or 'jpg'
+        quality: JPEG/WebP quality for the output (optional)
+
+    Returns:
+        (encoded result, info) where info holds the image size
+
+    Raises:
+        ValueError: If the job is invalid or the image cannot be decoded
+        IOError: If the result cannot be encoded
+    """
+    params = resolve_params(operation, params)
+    image = decode_image_bytes(data, as_grayscale=operation in GRAYSCALE_OPERATIONS)
+    result = run_operation(operation, image, **params)
+    info = {"width": int(image.shape[1]), "height": int(image.shape[0])}
+    return encode_image(result, output_format, quality=quality), info
+
+
+def warm_up(operations: Iterable[str] = OPERATIONS, tensorflow: bool = False) -> None:
+    """
+    Run each operation once on a small image so imports and kernels are ready.
+
+    Args:
+        operations: Operations to warm up
+        tensorflow: Whether to also build the TensorFlow sharpening graph
+    """
+    rgb = np.zeros((32, 32, 3), dtype=np.uint8)
+    gray = np.zeros((32, 32), dtype=np.uint8)
+    for operation in operations:
+        run_operation(operation, gray if operation in GRAYSCALE_OPERATIONS else rgb)
+    if tensorflow:
+        sharpen_with_tensorflow(rgb)
+    encode_image(rgb, ".png")
+
+
+def process_file(input_path: str,
+                 output_path: Optional[str],
+                 operation: str,
+                 params: Optional[Dict[str, Any]] = None,
+                 quality: Optional[int] = None,
+                 cache: Optional[ResultCache] = None,
+                 profiler: Optional[MemoryProfiler] = None) -> Dict[str, Any]:
+    """
+    Load an image, apply an operation and write the result.
+
+    Nothing is kept in memory between calls, so memory use does not grow
+    with the number of files processed.
+
+    Args:
+        input_path: Path to the input image
+        output_path: Path to write the result to (optional)
+        operation: Operation name ('edge', 'sharpen' or 'filter')
+        params: Operation parameters (optional)
+        quality: JPEG/WebP quality for the output (optional)
+        cache: On-disk result cache; a hit places the cached output without
+            decoding or processing the input (optional)
+        profiler: Records peak memory of the decode, process and save stages (optional)
+
+    Returns:
+        Result record with the input/output paths, image size, timings and
+        whether the result came from the cache
+
+    Raises:
+        ValueError: If the job is invalid or the image cannot be loaded
+        IOError: If the result cannot be written
+    """
+    params = resolve_params(operation, params)
+    start = time.perf_counter()
+
+    cache_key = None
+    if cache is not None and output_path:
+        cache_key = cache.key(input_path, operation, dict(params, quality=quality),
+                              os.path.splitext(output_path)[1])
+        if cache.fetch(cache_key, output_path):
+            return {
+                "input": input_path,
+                "output": output_path,
+                "operation": operation,
+                "params": params,
+                "cached": True,
+                "output_bytes": os.path.getsize(output_path),
+                "seconds": round(time.perf_counter() - start, 6),
+            }
+
+    with profile_stage(profiler, "decode"):
+        image = load_image(input_path, as_grayscale=operation in GRAYSCALE_OPERATIONS)
+    decoded = time.perf_counter()
+
+    with profile_stage(profiler, "process"):
+        result = run_operation(operation, image, profiler=profiler, **params)
+    processed = time.perf_counter()
+
+    output_bytes = None
+    if output_path:
+        with profile_stage(profiler, "save"):
+            output_bytes = write_image(result, output_path, quality=quality)
+        if cache_key is not None:
+            cache.store(cache_key, output_path)
+    finished = time.perf_counter()
+
+    return {
+        "input": input_path,
+        "output": output_path,
+        "operation": operation,
+        "params": params,
+        "cached": False,
+        "width": int(image.shape[1]),
+        "height": int(image.shape[0]),
+        "output_bytes": output_bytes,
+        "decode_seconds": round(decoded - start, 6),
+        "process_seconds": round(processed - decoded, 6),
+        "write_seconds": round(finished - processed, 6),
+        "seconds": round(finished - start, 6),
+    }
@@ -0,0 +1,294 @@
+"""
+Content-addressed on-disk cache for processed outputs.
+
+Results are keyed by a SHA-256 of the input file's bytes, the operation
+name, its canonicalised parameters, the output format and the versions of
+this package and the imaging libraries. Re-running an operation on an
+unchanged input then only hardlinks (or copies) the cached output into
+place instead of decoding, processing and encoding again.
+
+Entries are written atomically (temporary file plus ``os.replace``), so
+concurrent processes can share a cache directory. The cache is bounded by
+size and evicts least recently used entries, using file modification times
+as the access clock so the order survives across runs. Eviction rescans the
+whole cache directory, so it trims down to TRIM_TARGET of the budget: the
+next rescan only happens once that much headroom has been used up again.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+import PIL
+
+
+# Constants
+RESULT_CACHE_DIR_ENV = "IMAGE_PROCESSING_RESULT_CACHE"
+DEFAULT_CACHE_DIR = os.environ.get(RESULT_CACHE_DIR_ENV, os.path.join(".cache", "results"))
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+HASH_CHUNK_SIZE = 1024 ** 2
+MAX_MEMOIZED_HASHES = 4096
+TRIM_TARGET = 0.9  # share of max_bytes the cache is trimmed down to once it goes over
+CACHE_FORMAT_VERSION = 1
+
+
+def _package_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version("image_processing")
+    except Exception:
+        return "dev"
+
+
+LIBRARY_VERSIONS = (f"v{CACHE_FORMAT_VERSION}/image_processing-{_package_version()}"
+                    f"/opencv-{cv2.__version__}/numpy-{np.__version__}/pillow-{PIL.__version__}")
+
+
+def _canonical(value: Any) -> Any:
+    """Normalise parameter values so equal settings hash identically."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, str):
+        return value.lower()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _atomic_place(source: str, destination: str, link: bool) -> None:
+    """Hardlink (or copy) source to destination, replacing it atomically."""
+    try:
+        if os.path.samefile(source, destination):
+            return  # already linked, e.g. an unchanged output from a previous run
+    except OSError:
+        pass
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f".{os.path.basename(destination)}.{uuid.uuid4().hex}.tmp")
+    try:
+        if link:
+            try:
+                os.link(source, temporary)
+            except OSError:
+                # Different filesystem or no hardlink support
+                shutil.copyfile(source, temporary)
+        else:
+            shutil.copyfile(source, temporary)
+        os.replace(temporary, destination)
+    finally:
+        # rename() is a no-op when both names are links to the same file
+        if os.path.lexists(temporary):
+            os.remove(temporary)
+
+
+class ResultCache:
+    """
+    Size-bounded, content-addressed cache of output files.
+
+    Args:
+        cache_dir: Directory holding the cache entries
+        max_bytes: Size budget; least recently used entries are evicted beyond it
+        link: Whether hits are hardlinked into place (falls back to copying).
+            Outputs written by this package are replaced atomically, never
+            modified in place, so a linked output cannot corrupt its entry.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 link: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.link = link
+        self._lock = threading.Lock()
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = self._disk_usage()[0]
+
+    # --- Keys ---
+
+    def hash_file(self, path: str) -> str:
+        """
+        Return the SHA-256 of a file's contents.
+
+        Hashes are memoised per (path, mtime, size) so a file is read only
+        once per process while it stays unchanged.
+        """
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            digest = self._hashes.get(memo_key)
+        if digest is not None:
+            return digest
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            if len(self._hashes) >= MAX_MEMOIZED_HASHES:
+                self._hashes.clear()
+            self._hashes[memo_key] = digest
+        return digest
+
+    def key(self, input_path: str, operation: str, params: Optional[Dict[str, Any]] = None,
+            output_format: str = ".png") -> str:
+        """
+        Build the cache key for processing an input file.
+
+        Args:
+            input_path: Path to the input image
+            operation: Operation name
+            params: Operation parameters (including anything else that changes
+                the output, such as quality or pyramid level)
+            output_format: Output extension, e.g. '.jpg'
+
+        Returns:
+            Hex digest identifying the result
+
+        Raises:
+            ValueError: If the input file cannot be read
+        """
+        try:
+            content_hash = self.hash_file(input_path)
+        except OSError as e:
+            raise ValueError(f"Cannot hash input {input_path}: {str(e)}")
+
+        description = json.dumps({
+            "input": content_hash,
+            "operation": operation.lower(),
+            "params": _canonical(params or {}),
+            "format": output_format.lower().lstrip("."),
+            "versions": LIBRARY_VERSIONS,
+        }, sort_keys=True)
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str, output_format: str) -> str:
+        extension = "." + output_format.lower().lstrip(".")
+        return os.path.join(self.cache_dir, key[:2], key + extension)
+
+    # --- Lookup and store ---
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        Place a cached result at output_path if there is one.
+
+        Args:
+            key: Cache key from key()
+            output_path: Where the result should appear
+
+        Returns:
+            True on a hit (the output is in place), False on a miss
+        """
+        entry = self._entry_path(key, os.path.splitext(output_path)[1])
+        try:
+            _atomic_place(entry, output_path, self.link)
+            # Refresh the entry's position in the LRU order
+            os.utime(entry)
+            size = os.path.getsize(entry)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += size
+        return True
+
+    def store(self, key: str, output_path: str) -> None:
+        """
+        Add a freshly written output file to the cache.
+
+        Args:
+            key: Cache key from key()
+            output_path: The output file to cache
+        """
+        entry = self._entry_path(key, os.path.splitext(output_path)[1])
+        try:
+            size = os.path.getsize(output_path)
+            _atomic_place(output_path, entry, self.link)
+        except OSError as e:
+            print(f"Error caching result {output_path}: {str(e)}")
+            return
+
+        with self._lock:
+            self.stores += 1
+            self._size += size
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.trim()
+
+    def trim(self) -> None:
+        """Evict least recently used entries until the cache fits TRIM_TARGET of its budget."""
+        with self._lock:
+            # Rescan so entries added or evicted by other processes are counted
+            size, entries = self._disk_usage()
+            entries.sort()
+            target = int(self.max_bytes * TRIM_TARGET)
+            for _, entry_size, path in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                size -= entry_size
+                self.evictions += 1
+            self._size = size
+
+    def _disk_usage(self):
+        """Return (total size, [(mtime, size, path), ...]) for all entries."""
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith("."):
+                    continue  # in-progress temporary file
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sum(size for _, size, _ in entries), entries
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            for shard in os.scandir(self.cache_dir):
+                if shard.is_dir():
+                    shutil.rmtree(shard.path, ignore_errors=True)
+            self._size = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, hit rate, bytes saved and cache size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,243 @@
+"""
+Region-of-interest processing.
+
+Runs an operation on a bounding box or mask instead of the whole frame.
+Only the region plus a halo wide enough for the operation's kernels is
+processed, so the cost scales with the ROI area. For inputs that can be
+memory-mapped (uncompressed TIFF, .npy, PGM/PPM) only the region's pixels
+are read from disk; other formats are decoded once through the shared
+pyramid cache and sliced.
+
+The processed region is returned as a crop by default. Compositing it back
+into the full frame copies the whole frame, and for formats that cannot be
+memory-mapped decodes it too, so it costs as much memory as processing the
+full image would. With a mask, only masked pixels take the processed values.
+"""
+
+import hashlib
+import math
+from typing import Callable, NamedTuple, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import ImageFilter
+
+from image_io import image_size, memmap_image, to_grayscale
+from image_pyramid import get_pyramid
+
+
+# Constants
+# Hysteresis can follow weak edges beyond the blur support; this extra
+# margin keeps edge chains that pass through the ROI border intact
+EDGE_HYSTERESIS_MARGIN = 16
+DEFAULT_FILTER_HALO = 2
+
+# A bounding box (x, y, width, height) or a boolean mask the size of the image
+ROI = Union[Tuple[int, int, int, int], np.ndarray]
+
+
+class RoiResult(NamedTuple):
+    """Result of processing a region of interest."""
+    image: np.ndarray  # processed crop, or the full composited frame
+    original: np.ndarray  # unprocessed pixels of the region
+    bounds: Tuple[int, int, int, int]  # (x0, y0, x1, y1) of the region at the processed level
+
+
+def operation_halo(operation: str, **params) -> int:
+    """
+    Return how many pixels around a region an operation needs to read.
+
+    Args:
+        operation: Operation name ('edge', 'sharpen' or 'filter')
+        **params: Operation parameters
+
+    Returns:
+        Halo width in pixels
+    """
+    if operation == "edge":
+        # gaussian_filter truncates at 4 sigma; Sobel and non-maximum suppression add one pixel each
+        return int(4 * float(params.get("blur", 1.0)) + 0.5) + 2 + EDGE_HYSTERESIS_MARGIN
+
+    if operation == "sharpen":
+        if str(params.get("method", "unsharp_mask")).lower() == "unsharp_mask":
+            return int(params.get("blur_kernel_size", 7)) // 2
+        return 1  # 3x3 kernels
+
+    if operation == "filter":
+        from filters import FILTER_MAP
+
+        image_filter = FILTER_MAP.get(str(params.get("filter_name", "")).lower())
+        # Built-in kernels are stored as classes; their size is in filterargs
+        filterargs = getattr(image_filter, "filterargs", None)
+        if filterargs:
+            return max(filterargs[0]) // 2
+        if isinstance(image_filter, ImageFilter.GaussianBlur):
+            # Pillow approximates the Gaussian with three box blurs
+            return int(math.ceil(3 * image_filter.radius)) + 1
+        return DEFAULT_FILTER_HALO
+
+    raise ValueError(f"Unsupported operation: {operation}")
+
+
+def roi_key(roi: Optional[ROI]):
+    """Return a compact, hashable description of an ROI for cache keys."""
+    if roi is None:
+        return None
+    if isinstance(roi, np.ndarray):
+        return "mask:" + hashlib.sha256(np.packbits(roi.astype(bool)).tobytes() + str(roi.shape).encode()).hexdigest()
+    return [int(v) for v in roi]
+
+
+def _image_size(image_path: str, level: int) -> Tuple[int, int]:
+    """Return (width, height) of an image at a pyramid level, without decoding it."""
+    if level > 0:
+        return get_pyramid(image_path).level_size(level)
+    try:
+        # Pixels as stored, as read_region reads memory-mappable files
+        mapped = memmap_image(image_path)
+        if mapped.dtype == np.uint8:
+            return mapped.shape[1], mapped.shape[0]
+    except ValueError:
+        pass
+    return image_size(image_path)
+
+
+def _scaled_mask(mask: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Resize a full-resolution mask to the processed level's size."""
+    if mask.shape[:2] == (height, width):
+        return mask.astype(bool, copy=False)
+    return cv2.resize(mask.astype(np.uint8), (width, height), interpolation=cv2.INTER_NEAREST) > 0
+
+
+def roi_bounds(roi: ROI, width: int, height: int, scale: int = 1) -> Tuple[int, int, int, int]:
+    """
+    Convert an ROI to clipped (x0, y0, x1, y1) bounds.
+
+    Args:
+        roi: (x, y, width, height) box in full-resolution pixels, or a boolean mask
+        width: Width of the image being processed
+        height: Height of the image being processed
+        scale: Downscale factor of the processed image relative to full resolution
+
+    Returns:
+        (x0, y0, x1, y1) with exclusive upper bounds
+
+    Raises:
+        ValueError: If the ROI is empty or lies outside the image
+    """
+    if isinstance(roi, np.ndarray):
+        mask = _scaled_mask(roi, width, height)
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if rows.size == 0:
+            raise ValueError("ROI mask is empty")
+        return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+    x, y, w, h = (int(v) for v in roi)
+    if w <= 0 or h <= 0:
+        raise ValueError(f"ROI must have a positive size, got {w}x{h}")
+    x0, y0 = max(0, x // scale), max(0, y // scale)
+    x1, y1 = min(width, -(-(x + w) // scale)), min(height, -(-(y + h) // scale))
+    if x0 >= x1 or y0 >= y1:
+        raise ValueError(f"ROI {tuple(roi)} lies outside the {width * scale}x{height * scale} image")
+    return x0, y0, x1, y1
+
+
+def read_region(image_path: str, bounds: Tuple[int, int, int, int],
+                as_grayscale: bool = False, level: int = 0) -> np.ndarray:
+    """
+    Read the pixels inside bounds.
+
+    Memory-mappable 8-bit files are read directly from disk, touching only
+    the region's pages; other files are sliced from the cached pyramid level.
+
+    Args:
+        image_path: Path to the image file
+        bounds: (x0, y0, x1, y1) at the given level
+        as_grayscale: Whether to return a single luminance channel
+        level: Pyramid level the bounds refer to
+
+    Returns:
+        Region as a new numpy array (grayscale or RGB)
+    """
+    x0, y0, x1, y1 = bounds
+    if level == 0:
+        try:
+            mapped = memmap_image(image_path)
+        except ValueError:
+            mapped = None
+        if mapped is not None and mapped.dtype == np.uint8:
+            region = mapped[y0:y1, x0:x1]
+            if as_grayscale:
+                return to_grayscale(region) if region.ndim == 3 else np.array(region)
+            if region.ndim == 2:
+                return cv2.cvtColor(np.ascontiguousarray(region), cv2.COLOR_GRAY2RGB)
+            return np.array(region[:, :, :3])
+
+    return np.array(get_pyramid(image_path, as_grayscale=as_grayscale).level(level)[y0:y1, x0:x1])
+
+
+def process_roi(image_path: str,
+                roi: ROI,
+                process: Callable[[np.ndarray], np.ndarray],
+                halo: int,
+                as_grayscale: bool = False,
+                composite: bool = False,
+                blank_background: bool = False,
+                level: int = 0) -> RoiResult:
+    """
+    Apply a function to a region of interest of an image file.
+
+    Args:
+        image_path: Path to the image file
+        roi: (x, y, width, height) box in full-resolution pixels, or a boolean
+            mask the size of the full-resolution image
+        process: Function mapping an image array to a processed array of the same size
+        halo: Pixels of context to read around the region (see operation_halo)
+        as_grayscale: Whether to process a single luminance channel
+        composite: Return the full frame with the region replaced (True) instead of
+            only the crop (False). This allocates a full frame and, unless
+            blank_background is set, reads the whole image into it: from the
+            memory map where possible, otherwise by decoding it.
+        blank_background: Composite onto zeros instead of the original image
+            (for results such as edge maps that differ in type from the input)
+        level: Pyramid level to process at
+
+    Returns:
+        RoiResult with the processed image, the original region and its bounds
+
+    Raises:
+        ValueError: If the ROI is empty, outside the image or the wrong shape
+    """
+    width, height = _image_size(image_path, level)
+    if isinstance(roi, np.ndarray) and roi.ndim != 2:
+        raise ValueError(f"ROI mask must be 2-D, got shape {roi.shape}")
+    x0, y0, x1, y1 = roi_bounds(roi, width, height, scale=2 ** level)
+
+    # Read the region plus its halo, clipped to the image
+    px0, py0 = max(0, x0 - halo), max(0, y0 - halo)
+    px1, py1 = min(width, x1 + halo), min(height, y1 + halo)
+    padded = read_region(image_path, (px0, py0, px1, py1), as_grayscale=as_grayscale, level=level)
+
+    processed = np.asarray(process(padded))
+    inner = (slice(y0 - py0, y1 - py0), slice(x0 - px0, x1 - px0))
+    result = processed[inner]
+    original = padded[inner]
+
+    if isinstance(roi, np.ndarray):
+        mask = _scaled_mask(roi, width, height)[y0:y1, x0:x1]
+        if result.ndim == 3:
+            mask = mask[:, :, np.newaxis]
+        fill = np.zeros_like(result) if blank_background else original.astype(result.dtype, copy=False)
+        result = np.where(mask, result, fill)
+
+    if not composite:
+        return RoiResult(np.ascontiguousarray(result), original, (x0, y0, x1, y1))
+
+    if blank_background:
+        frame = np.zeros((height, width) + result.shape[2:], dtype=result.dtype)
+    else:
+        frame = read_region(image_path, (0, 0, width, height), as_grayscale=as_grayscale,
+                            level=level).astype(result.dtype, copy=False)
+    frame[y0:y1, x0:x1] = result
+    return RoiResult(frame, original, (x0, y0, x1, y1))
@@ -0,0 +1,499 @@
+"""
+Local HTTP service for image processing with request micro-batching.
+
+The server runs on asyncio streams from the standard library (no web
+framework needed) and hands the work to a pool of worker processes that
+import OpenCV, Pillow and (optionally) TensorFlow once at start-up and run
+a warm-up pass, so requests never pay import or initialisation costs.
+
+Concurrent requests for the same operation are collected for a few
+milliseconds and sent to a worker as one batch, which saves a process
+round-trip per image and lets TensorFlow sharpen equally sized images in a
+single session run. The number of admitted requests is capped; beyond
+that the server answers 503 so clients can back off.
+
+Endpoints:
+    POST /process/<operation>?<param>=<value>&format=png&quality=90
+        Body is the encoded input image; the response is the encoded result.
+    GET /health
+        JSON with queue depth and batching statistics.
+
+Example:
+    python server.py --port 8080 --workers 4
+    curl --data-binary @images/image.jpg -o edges.png \\
+        "http://127.0.0.1:8080/process/edge?blur=1.5"
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from operations import GRAYSCALE_OPERATIONS, OPERATIONS, parse_operation_params, run_batch, warm_up
+
+
+# Constants
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_QUEUE_DEPTH = 64
+DEFAULT_MAX_BATCH = 8
+DEFAULT_BATCH_WINDOW_MS = 5.0
+MAX_BODY_BYTES = 64 * 1024 ** 2
+MAX_HEADER_LINES = 100
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+    "tif": "image/tiff",
+    "tiff": "image/tiff",
+    "gif": "image/gif",
+}
+
+
+class HTTPError(Exception):
+    """An error that maps directly to an HTTP status code."""
+
+    def __init__(self, status: HTTPStatus, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _init_worker(warm_tensorflow: bool) -> None:
+    """Load libraries and run every operation once in a new worker process."""
+    import cv2
+    from display import set_display_mode
+
+    # Workers are forked after the server's SIGTERM handler is installed; let them die on SIGTERM
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    set_display_mode("off")
+    # Parallelism comes from the process pool; avoid oversubscribing cores
+    cv2.setNumThreads(1)
+    warm_up(tensorflow=warm_tensorflow)
+
+
+def process_batch(operation: str, items: List[Tuple[bytes, Dict[str, Any], str, Optional[int]]]
+                  ) -> List[Tuple[bool, Any, Dict[str, Any]]]:
+    """
+    Process a batch of requests for one operation in a worker process.
+
+    Requests with identical parameters are run together through run_batch.
+    A failing request does not affect the others in its batch.
+
+    Args:
+        operation: Operation name
+        items: (image bytes, params, output format, quality) per request
+
+    Returns:
+        (ok, encoded result or error message, info) per request, in order
+    """
+    from image_io import decode_image_bytes, encode_image
+
+    results: List[Optional[Tuple[bool, Any, Dict[str, Any]]]] = [None] * len(items)
+    groups: Dict[tuple, List[Tuple[int, Any]]] = {}
+
+    start = time.perf_counter()
+    for index, (data, params, _, _) in enumerate(items):
+        try:
+            image = decode_image_bytes(data, as_grayscale=operation in GRAYSCALE_OPERATIONS)
+        except Exception as e:
+            results[index] = (False, str(e), {})
+            continue
+        key = tuple(sorted(params.items()))
+        groups.setdefault(key, []).append((index, image))
+
+    for key, members in groups.items():
+        try:
+            outputs = run_batch(operation, [image for _, image in members], **dict(key))
+        except Exception as e:
+            for index, _ in members:
+                results[index] = (False, str(e), {})
+            continue
+        for (index, image), output in zip(members, outputs):
+            _, _, output_format, quality = items[index]
+            try:
+                encoded = encode_image(output, output_format, quality=quality)
+            except Exception as e:
+                results[index] = (False, str(e), {})
+                continue
+            info = {"width": int(image.shape[1]), "height": int(image.shape[0])}
+            results[index] = (True, encoded, info)
+
+    elapsed = time.perf_counter() - start
+    for result in results:
+        result[2]["batch_seconds"] = elapsed
+    return results
+
+
+def parse_params(operation: str, query: Dict[str, str]) -> Tuple[Dict[str, Any], str, Optional[int]]:
+    """
+    Convert query-string values to typed operation parameters.
+
+    Values are converted to the type of the parameter's default. The
+    'format' and 'quality' keys select the output encoding.
+
+    Args:
+        operation: Operation name
+        query: Query-string parameters
+
+    Returns:
+        (params, output format, quality)
+
+    Raises:
+        ValueError: If a parameter is unknown or has the wrong type
+    """
+    query = dict(query)
+    output_format = query.pop("format", "png").lower().lstrip(".")
+    if output_format not in CONTENT_TYPES:
+        raise ValueError(f"Unsupported output format: {output_format}. "
+                         f"Supported formats: {', '.join(CONTENT_TYPES)}")
+    quality = int(query.pop("quality")) if "quality" in query else None
+
+    return parse_operation_params(operation, query), output_format, quality
+
+
+class ProcessingServer:
+    """
+    Asyncio HTTP server that micro-batches requests onto worker processes.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free port)
+        workers: Number of worker processes
+        queue_depth: Maximum number of admitted requests; more get a 503
+        max_batch: Maximum number of requests sent to a worker at once
+        batch_window_ms: How long to wait for more requests after the first one
+        max_body_bytes: Largest accepted upload
+        warm_tensorflow: Whether workers build the TensorFlow graph at start-up
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 workers: int = os.cpu_count() or 1,
+                 queue_depth: int = DEFAULT_QUEUE_DEPTH,
+                 max_batch: int = DEFAULT_MAX_BATCH,
+                 batch_window_ms: float = DEFAULT_BATCH_WINDOW_MS,
+                 max_body_bytes: int = MAX_BODY_BYTES,
+                 warm_tensorflow: bool = False):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_body_bytes = max_body_bytes
+        self.warm_tensorflow = warm_tensorflow
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._batchers: List[asyncio.Task] = []
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._worker_slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self.stats = {"requests": 0, "completed": 0, "failed": 0, "rejected": 0,
+                      "batches": 0, "batched_requests": 0}
+
+    async def start(self) -> None:
+        """Start the worker pool, warm it up and begin listening."""
+        loop = asyncio.get_running_loop()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self.warm_tensorflow,))
+        # Start every worker now so warm-up happens before the first request
+        await asyncio.gather(*[loop.run_in_executor(self._executor, time.sleep, 0.05)
+                               for _ in range(self.workers)])
+
+        self._worker_slots = asyncio.Semaphore(self.workers)
+        for operation in OPERATIONS:
+            self._queues[operation] = asyncio.Queue()
+            self._batchers.append(asyncio.ensure_future(self._batch_loop(operation)))
+
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"Serving on http://{self.host}:{self.port} with {self.workers} workers")
+
+    async def serve_forever(self) -> None:
+        """Start the server and run until cancelled."""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """Stop listening, cancel the batchers and shut down the workers."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Closing the transports ends idle keep-alive connections; requests in flight still finish
+        for writer in self._connections.values():
+            writer.transport.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        for task in self._batchers:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def health(self) -> Dict[str, Any]:
+        """Return queue depth and batching statistics."""
+        batches = self.stats["batches"]
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "pending": self._pending,
+            "queue_depth": self.queue_depth,
+            "operations": list(OPERATIONS),
+            "mean_batch_size": round(self.stats["batched_requests"] / batches, 2) if batches else 0.0,
+            **self.stats,
+        }
+
+    # --- Batching ---
+
+    async def submit(self, operation: str, data: bytes, params: Dict[str, Any],
+                     output_format: str, quality: Optional[int]) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Queue a request for its operation's batcher and wait for the result.
+
+        Raises:
+            HTTPError: 503 if the queue is full, 400 if processing fails
+        """
+        if self._pending >= self.queue_depth:
+            self.stats["rejected"] += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy, retry later",
+                            headers={"Retry-After": "1"})
+
+        self._pending += 1
+        try:
+            future = asyncio.get_running_loop().create_future()
+            await self._queues[operation].put(((data, params, output_format, quality), future))
+            ok, payload, info = await future
+        finally:
+            self._pending -= 1
+
+        if not ok:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, payload)
+        return payload, info
+
+    async def _batch_loop(self, operation: str) -> None:
+        """Collect requests for one operation into batches and dispatch them."""
+        loop = asyncio.get_running_loop()
+        queue = self._queues[operation]
+
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # While every worker is busy, requests keep accumulating in the queue
+            await self._worker_slots.acquire()
+            asyncio.ensure_future(self._run_batch(operation, batch))
+
+    async def _run_batch(self, operation: str, batch: list) -> None:
+        """Run one batch in the pool and resolve its request futures."""
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, process_batch, operation,
+                                                 [item for item, _ in batch])
+        except Exception as e:
+            # The worker died (e.g. killed for memory)
+            results = [(False, f"Worker failed: {str(e)}", {})] * len(batch)
+        finally:
+            self._worker_slots.release()
+
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(batch)
+        for (_, future), (ok, payload, info) in zip(batch, results):
+            info = dict(info, batch_size=len(batch))
+            if not future.done():
+                future.set_result((ok, payload, info))
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it."""
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send_error(writer, e, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    status, response_headers, response_body = await self._dispatch(method, target, body)
+                except HTTPError as e:
+                    await self._send_error(writer, e, keep_alive)
+                except Exception as e:
+                    await self._send_error(writer, HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, str(e)), keep_alive)
+                else:
+                    await self._send(writer, status, response_headers, response_body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader
+                            ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """Read one HTTP/1.1 request; returns None when the connection is closed."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+
+        body = b""
+        if "transfer-encoding" in headers:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked uploads are not supported; send Content-Length")
+        if "content-length" in headers:
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+            if length > self.max_body_bytes:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                f"Upload exceeds {self.max_body_bytes} bytes")
+            body = await reader.readexactly(length)
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[HTTPStatus, Dict[str, str], bytes]:
+        """Route a request and return (status, headers, body)."""
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["health"]:
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET")
+            return HTTPStatus.OK, {"Content-Type": "application/json"}, json.dumps(self.health()).encode()
+
+        if len(parts) == 2 and parts[0] == "process":
+            operation = parts[1]
+            if operation not in OPERATIONS:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unsupported operation: {operation}. "
+                                                      f"Available operations: {', '.join(OPERATIONS)}")
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST with the image as the body")
+            if not body:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must contain an image")
+            try:
+                params, output_format, quality = parse_params(operation, dict(parse_qsl(url.query)))
+            except ValueError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+
+            self.stats["requests"] += 1
+            try:
+                result, info = await self.submit(operation, body, params, output_format, quality)
+            except HTTPError as e:
+                if e.status != HTTPStatus.SERVICE_UNAVAILABLE:
+                    self.stats["failed"] += 1
+                raise
+            self.stats["completed"] += 1
+
+            headers = {
+                "Content-Type": CONTENT_TYPES[output_format],
+                "X-Image-Size": f"{info['width']}x{info['height']}",
+                "X-Batch-Size": str(info["batch_size"]),
+                "X-Batch-Seconds": f"{info['batch_seconds']:.6f}",
+            }
+            return HTTPStatus.OK, headers, result
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Not found: {url.path}")
+
+    async def _send(self, writer: asyncio.StreamWriter, status: HTTPStatus,
+                    headers: Dict[str, str], body: bytes, keep_alive: bool) -> None:
+        """Write an HTTP response."""
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_error(self, writer: asyncio.StreamWriter, error: HTTPError, keep_alive: bool) -> None:
+        """Write a JSON error response."""
+        body = json.dumps({"error": str(error)}).encode()
+        headers = dict(error.headers, **{"Content-Type": "application/json"})
+        await self._send(writer, error.status, headers, body, keep_alive)
+
+
+async def _serve_until_terminated(server: ProcessingServer) -> None:
+    """Run a server until it is cancelled or the process receives SIGTERM, then shut it down."""
+    serving = asyncio.ensure_future(server.serve_forever())
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, serving.cancel)
+    except NotImplementedError:
+        pass  # no loop signal handlers on Windows
+    try:
+        await serving
+    except asyncio.CancelledError:
+        if not serving.cancelled():
+            raise
+
+
+def main() -> None:
+    """Run the processing server from the command line."""
+    parser = argparse.ArgumentParser(description="Local HTTP image processing service")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--queue-depth", type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help="Maximum admitted requests before answering 503")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                        help="Maximum requests per worker batch (1 disables batching)")
+    parser.add_argument("--batch-window-ms", type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="How long to wait for more requests to batch")
+    parser.add_argument("--max-body-mb", type=float, default=MAX_BODY_BYTES / 1024 ** 2,
+                        help="Largest accepted upload in MB")
+    parser.add_argument("--warm-tensorflow", action="store_true",
+                        help="Build the TensorFlow sharpening graph in every worker at start-up")
+    args = parser.parse_args()
+
+    server = ProcessingServer(host=args.host, port=args.port, workers=args.workers,
+                              queue_depth=args.queue_depth, max_batch=args.max_batch,
+                              batch_window_ms=args.batch_window_ms,
+                              max_body_bytes=int(args.max_body_mb * 1024 ** 2),
+                              warm_tensorflow=args.warm_tensorflow)
+    try:
+        asyncio.run(_serve_until_terminated(server))
+    except KeyboardInterrupt:
+        pass
+    print("Server stopped")
+
+
+if __name__ == "__main__":
+    main()
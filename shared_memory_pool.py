@@ -0,0 +1,352 @@
+"""
+Process pool that hands images to workers through shared memory.
+
+Sending a NumPy array to a worker process normally pickles it: the bytes
+are copied into a pickle buffer, pushed through a pipe and copied again on
+the other side, and the result makes the same trip back. For large images
+that doubles peak memory and costs more than many of the operations.
+
+SharedMemoryWorkerPool instead keeps inputs and outputs in
+``multiprocessing.shared_memory`` blocks and sends workers only a small
+descriptor (block name, shape and dtype). Blocks come from a SlabPool and
+are recycled once released, so a steady stream of equally sized images
+reuses the same few blocks instead of creating and faulting in new ones.
+"""
+
+import atexit
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+# Constants
+SLAB_ALIGNMENT = 1024 ** 2  # block sizes are rounded up to whole MiB
+MAX_SLACK = 1.5  # a free block is reused for requests down to 1/MAX_SLACK of its size
+DEFAULT_MAX_FREE_BYTES = 1024 ** 3
+WORKER_ATTACH_CACHE = 8
+
+
+class SharedArray(NamedTuple):
+    """Picklable description of an array stored in a shared memory block."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block without taking ownership of it."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Older versions register every attachment with the resource tracker.
+    # Pool workers share the parent's tracker (see SharedMemoryWorkerPool),
+    # where the block is already registered, so this is harmless.
+    return shared_memory.SharedMemory(name=name)
+
+
+def as_array(block: shared_memory.SharedMemory, descriptor: SharedArray) -> np.ndarray:
+    """Return an ndarray view of a descriptor's data in an attached block."""
+    return np.ndarray(descriptor.shape, dtype=np.dtype(descriptor.dtype), buffer=block.buf)
+
+
+class SharedImage:
+    """
+    An array living in a pooled shared memory block.
+
+    The array stays valid until :meth:`release` returns the block to its
+    pool; do not keep views of it after that. Usable as a context manager.
+    """
+
+    def __init__(self, pool: "SlabPool", block: shared_memory.SharedMemory, descriptor: SharedArray):
+        self._pool = pool
+        self._block = block
+        self.descriptor = descriptor
+        self.array = as_array(block, descriptor)
+
+    def release(self) -> None:
+        """Return the block to the pool."""
+        if self._block is not None:
+            self.array = None
+            self._pool.release(self._block)
+            self._block = None
+
+    def __enter__(self) -> "SharedImage":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+
+class SlabPool:
+    """
+    Recycling allocator for shared memory blocks.
+
+    Released blocks are kept on a free list and handed out again for
+    requests of a similar size (within MAX_SLACK). Free blocks beyond
+    max_free_bytes are unlinked, oldest first.
+    """
+
+    def __init__(self, max_free_bytes: int = DEFAULT_MAX_FREE_BYTES):
+        self.max_free_bytes = max_free_bytes
+        self._free: List[shared_memory.SharedMemory] = []
+        self._in_use: Dict[str, shared_memory.SharedMemory] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def allocate(self, shape: Tuple[int, ...], dtype: Any = np.uint8) -> SharedImage:
+        """
+        Allocate an array in shared memory.
+
+        Args:
+            shape: Array shape
+            dtype: Array dtype
+
+        Returns:
+            SharedImage wrapping the array (contents are undefined)
+        """
+        dtype = np.dtype(dtype)
+        nbytes = max(1, int(np.prod(shape)) * dtype.itemsize)
+
+        with self._lock:
+            candidates = [block for block in self._free if nbytes <= block.size <= nbytes * MAX_SLACK]
+            if candidates:
+                block = min(candidates, key=lambda b: b.size)
+                self._free.remove(block)
+                self.reused += 1
+            else:
+                size = -(-nbytes // SLAB_ALIGNMENT) * SLAB_ALIGNMENT
+                block = shared_memory.SharedMemory(create=True, size=size)
+                self.created += 1
+            self._in_use[block.name] = block
+
+        return SharedImage(self, block, SharedArray(block.name, tuple(int(n) for n in shape), dtype.str))
+
+    def share(self, image: np.ndarray) -> SharedImage:
+        """Copy an array into a newly allocated shared block."""
+        shared = self.allocate(image.shape, image.dtype)
+        np.copyto(shared.array, image)
+        return shared
+
+    def release(self, block: shared_memory.SharedMemory) -> None:
+        """Return a block to the free list, unlinking old blocks over the budget."""
+        with self._lock:
+            if self._in_use.pop(block.name, None) is None:
+                return
+            self._free.append(block)
+            while self._free and sum(b.size for b in self._free) > self.max_free_bytes:
+                self._destroy(self._free.pop(0))
+
+    @staticmethod
+    def _destroy(block: shared_memory.SharedMemory) -> None:
+        try:
+            block.close()
+        except BufferError:
+            # A view still references the block; the mapping goes away with it
+            pass
+        block.unlink()
+
+    def stats(self) -> dict:
+        """Return block counts and memory held by the pool."""
+        with self._lock:
+            return {
+                "in_use": len(self._in_use),
+                "free": len(self._free),
+                "free_bytes": sum(b.size for b in self._free),
+                "in_use_bytes": sum(b.size for b in self._in_use.values()),
+                "created": self.created,
+                "reused": self.reused,
+            }
+
+    def close(self) -> None:
+        """Unlink every block, including ones still in use."""
+        with self._lock:
+            for block in self._free + list(self._in_use.values()):
+                self._destroy(block)
+            self._free.clear()
+            self._in_use.clear()
+
+
+# --- Worker side ---
+
+_attached: "OrderedDict[str, shared_memory.SharedMemory]" = OrderedDict()
+
+
+def _worker_array(descriptor: SharedArray) -> np.ndarray:
+    """
+    Map a descriptor in a worker, caching recent attachments.
+
+    Recycled blocks keep their names, so caching the mapping avoids
+    re-mapping and re-faulting the same pages for every task.
+    """
+    block = _attached.get(descriptor.name)
+    if block is None:
+        block = _attach(descriptor.name)
+        _attached[descriptor.name] = block
+        while len(_attached) > WORKER_ATTACH_CACHE:
+            _, stale = _attached.popitem(last=False)
+            try:
+                stale.close()
+            except BufferError:
+                pass
+    else:
+        _attached.move_to_end(descriptor.name)
+    return as_array(block, descriptor)
+
+
+def _run_shared(func: Callable, source: Any, output: SharedArray,
+                args: tuple, kwargs: dict) -> None:
+    """Run func on a shared input (or image path) and write into the shared output."""
+    if isinstance(source, SharedArray):
+        image = _worker_array(source)
+        image.flags.writeable = False
+    else:
+        from image_utils import load_image
+        path, as_grayscale = source
+        image = load_image(path, as_grayscale=as_grayscale)
+
+    result = np.asarray(func(image, *args, **kwargs))
+    out = _worker_array(output)
+    if result.shape != out.shape:
+        raise ValueError(f"Result shape {result.shape} does not match output shape {out.shape}")
+    np.copyto(out, result, casting="same_kind")
+
+
+# --- Pool ---
+
+class SharedMemoryWorkerPool:
+    """
+    Process pool whose tasks read and write images in shared memory.
+
+    Tasks are functions taking an image array (plus extra arguments) and
+    returning an array; they must be importable top-level functions. The
+    result is copied once, inside the worker, into a pooled output block,
+    and returned to the caller as a SharedImage that must be released.
+
+    Args:
+        workers: Number of worker processes (defaults to the CPU count)
+        max_free_bytes: Memory the slab pool may keep in released blocks
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_free_bytes: int = DEFAULT_MAX_FREE_BYTES):
+        self.slabs = SlabPool(max_free_bytes=max_free_bytes)
+        # Start the resource tracker before any worker exists so workers
+        # inherit it; a worker-owned tracker would unlink blocks when the
+        # worker exits
+        resource_tracker.ensure_running()
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        _open_pools.add(self)
+
+    def allocate(self, shape: Tuple[int, ...], dtype: Any = np.uint8) -> SharedImage:
+        """Allocate a shared array the caller can fill (e.g. decode into) before submitting."""
+        return self.slabs.allocate(shape, dtype)
+
+    def submit(self, func: Callable, image: Any, *args,
+               output_shape: Optional[Tuple[int, ...]] = None,
+               output_dtype: Any = None,
+               **kwargs) -> "Future[SharedImage]":
+        """
+        Run func(image, *args, **kwargs) in a worker.
+
+        Args:
+            func: Top-level function taking an image array and returning an array
+            image: SharedImage (passed without copying) or ndarray (copied into
+                a pooled block that is released when the task finishes)
+            *args: Extra positional arguments for func
+            output_shape: Shape of the result (defaults to the input's)
+            output_dtype: Dtype of the result (defaults to the input's)
+            **kwargs: Extra keyword arguments for func
+
+        Returns:
+            Future resolving to a SharedImage holding the result
+        """
+        owned = None
+        if not isinstance(image, SharedImage):
+            owned = image = self.slabs.share(np.asarray(image))
+        source = image.descriptor
+        return self._submit(func, source, output_shape or source.shape,
+                            output_dtype or source.dtype, args, kwargs, owned)
+
+    def submit_path(self, func: Callable, image_path: str, *args,
+                    as_grayscale: bool = False,
+                    output_shape: Optional[Tuple[int, ...]] = None,
+                    output_dtype: Any = np.uint8,
+                    **kwargs) -> "Future[SharedImage]":
+        """
+        Decode an image file in a worker and run func on it.
+
+        Only the path crosses the process boundary on the way in. The
+        output shape defaults to the decoded image's shape, read from the
+        file header.
+
+        Args:
+            func: Top-level function taking an image array and returning an array
+            image_path: Path to the image file
+            *args: Extra positional arguments for func
+            as_grayscale: Whether to decode to grayscale
+            output_shape: Shape of the result (defaults to the decoded shape)
+            output_dtype: Dtype of the result (default uint8)
+            **kwargs: Extra keyword arguments for func
+
+        Returns:
+            Future resolving to a SharedImage holding the result
+        """
+        if output_shape is None:
+            from image_io import image_size
+            width, height = image_size(image_path)
+            output_shape = (height, width) if as_grayscale else (height, width, 3)
+        return self._submit(func, (image_path, as_grayscale), output_shape, output_dtype,
+                            args, kwargs, None)
+
+    def _submit(self, func, source, output_shape, output_dtype, args, kwargs,
+                owned: Optional[SharedImage]) -> "Future[SharedImage]":
+        output = self.slabs.allocate(output_shape, output_dtype)
+        future: "Future[SharedImage]" = Future()
+        task = self._executor.submit(_run_shared, func, source, output.descriptor, args, kwargs)
+
+        def done(task_future):
+            if owned is not None:
+                owned.release()
+            error = task_future.exception()
+            if error is not None:
+                output.release()
+                future.set_exception(error)
+            else:
+                future.set_result(output)
+
+        task.add_done_callback(done)
+        return future
+
+    def map(self, func: Callable, images, **kwargs) -> List[SharedImage]:
+        """Run func over several images and wait for all results, in order."""
+        futures = [self.submit(func, image, **kwargs) for image in images]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Wait for running tasks, stop the workers and unlink all blocks."""
+        self._executor.shutdown(wait=True)
+        self.slabs.close()
+        _open_pools.discard(self)
+
+    def __enter__(self) -> "SharedMemoryWorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+_open_pools = set()
+
+
+@atexit.register
+def _close_pools() -> None:
+    for pool in list(_open_pools):
+        pool.close()
@@ -5,12 +5,18 @@ This module provides implementations of various image sharpening techniques
 including unsharp masking and kernel-based sharpening.
 """
 
+import os
+import threading
+
 import numpy as np
 import cv2
-import tensorflow as tf
-from typing import Tuple, Optional, Union
+from typing import Dict, List, Tuple, Optional, Union
 
+from image_io import AsyncImageWriter
+from image_pyramid import get_pyramid
 from image_utils import load_image, save_image, display_comparison
+from result_cache import ResultCache
+from roi import ROI, operation_halo, process_roi, roi_key
 
 
 # Constants
@@ -21,6 +27,9 @@ GAUSSIAN_BLUR_KERNEL_SIZE = 7
 SHARPENING_AMOUNT = 1.5
 NOISE_THRESHOLD = 10
 
+_tf_sharpener = None
+_tf_lock = threading.Lock()
+
 
 def create_sharpening_kernel_cv2() -> np.ndarray:
     """
@@ -70,6 +79,56 @@ def sharpen_with_cv2(image: np.ndarray) -> np.ndarray:
     return cv2.filter2D(image, -1, sharpening_kernel)
 
 
+def _tensorflow_sharpener():
+    """Return the (session, input, output) triple, building the graph on first use."""
+    global _tf_sharpener
+
+    with _tf_lock:
+        if _tf_sharpener is None:
+            # TensorFlow is only needed for this method, so import it on first use
+            import tensorflow as tf
+
+            graph = tf.Graph()
+            with graph.as_default():
+                x = tf.compat.v1.placeholder('float32', [None, None, None, CHANNEL_COUNT])
+                w = tf.constant(create_sharpening_kernel_tf(), tf.float32)
+                out = tf.nn.depthwise_conv2d(x, w, strides=[1, 1, 1, 1], padding='SAME')
+            _tf_sharpener = (tf.compat.v1.Session(graph=graph), x, out)
+        return _tf_sharpener
+
+
+def sharpen_images_with_tensorflow(images: List[np.ndarray]) -> List[np.ndarray]:
+    """
+    Sharpen several images with TensorFlow, batching images of equal shape.
+
+    The graph and session are built once per process and reused, and images
+    that share a shape go through a single session run.
+
+    Args:
+        images: Input images as numpy arrays
+
+    Returns:
+        Sharpened images as numpy arrays, in input order
+    """
+    sess, x, out = _tensorflow_sharpener()
+
+    groups: Dict[tuple, List[int]] = {}
+    for index, image in enumerate(images):
+        groups.setdefault(np.shape(image), []).append(index)
+
+    results: List[Optional[np.ndarray]] = [None] * len(images)
+    for indices in groups.values():
+        # Convert to float and normalize
+        batch = np.stack([np.asarray(images[i], dtype='float32') / IMAGE_SCALE for i in indices])
+        output = sess.run(out, feed_dict={x: batch})
+
+        for position, index in enumerate(indices):
+            # Normalize each output by its own maximum
+            normalized = output[position] / np.amax(output[position])
+            results[index] = np.squeeze((normalized * 255).round().astype(np.uint8))
+    return results
+
+
 def sharpen_with_tensorflow(image: np.ndarray) -> np.ndarray:
     """
     Sharpen image using TensorFlow implementation.
@@ -80,27 +139,7 @@ def sharpen_with_tensorflow(image: np.ndarray) -> np.ndarray:
     Returns:
         Sharpened image as numpy array
     """
-    # Convert to float and normalize
-    np_img = np.asarray(image, dtype='float32') / IMAGE_SCALE
-    reshaped_img = np_img.reshape(1, *np_img.shape)
-
-    kernel = create_sharpening_kernel_tf()
-    
-    # Use TensorFlow to apply the kernel
-    tf.compat.v1.disable_eager_execution()
-    x = tf.compat.v1.placeholder('float32', [1, None, None, CHANNEL_COUNT])
-    w = tf.Variable(tf.cast(kernel, tf.float32))
-    out = tf.nn.depthwise_conv2d(x, w, strides=[1, 1, 1, 1], padding='SAME')
-    
-    with tf.compat.v1.Session() as sess:
-        sess.run(tf.compat.v1.global_variables_initializer())
-        output = sess.run(out, feed_dict={x: reshaped_img})
-        
-    # Normalize the output
-    max_value = np.amax(output)
-    normalized = output / max_value
-    normalized = (normalized * 255).round().astype(np.uint8)
-    return np.squeeze(normalized)
+    return sharpen_images_with_tensorflow([image])[0]
 
 
 def apply_unsharp_mask(
@@ -142,7 +181,12 @@ def sharpen_image(
         blur_kernel_size: int = GAUSSIAN_BLUR_KERNEL_SIZE,
         sharpening_amount: float = SHARPENING_AMOUNT,
         threshold: int = NOISE_THRESHOLD,
-        display_result: bool = True
+        display_result: bool = False,
+        writer: Optional[AsyncImageWriter] = None,
+        level: int = 0,
+        cache: Optional[ResultCache] = None,
+        roi: Optional[ROI] = None,
+        composite: bool = False
 ) -> np.ndarray:
     """
     Sharpen an image using the specified method.
@@ -155,35 +199,78 @@ def sharpen_image(
         sharpening_amount: Intensity of sharpening effect for unsharp mask
         threshold: Minimum difference for sharpening to reduce noise
         display_result: Whether to display the result
+        writer: Background writer used to save the output without blocking (optional)
+        level: Pyramid level to process at (0 is full resolution, each level
+            halves both dimensions); decoded levels are cached across calls
+        cache: Result cache; with an output path, an identical earlier run is
+            reused and the output is written synchronously (optional)
+        roi: Only sharpen this (x, y, width, height) box or boolean mask, given
+            in full-resolution pixels (optional). The 'tensorflow' method
+            normalises its output over the region rather than the whole image.
+        composite: With an ROI, return the full image with the region
+            sharpened (True) instead of only the sharpened crop (False);
+            this reads and copies the whole frame (see roi.process_roi)
         
     Returns:
-        Sharpened image as numpy array
+        Sharpened image as numpy array (decoded from the cached output on a cache hit)
     """
-    # Load the image
-    image = load_image(image_path)
-    
-    # Apply sharpening
-    if method.lower() == "unsharp_mask":
-        sharpened = apply_unsharp_mask(
-            image, 
-            blur_kernel_size=blur_kernel_size,
-            sharpening_amount=sharpening_amount,
-            threshold=threshold
-        )
-    elif method.lower() == "cv2":
-        sharpened = sharpen_with_cv2(image)
-    elif method.lower() == "tensorflow":
-        sharpened = sharpen_with_tensorflow(image)
+    method_lower = method.lower()
+    if method_lower == "unsharp_mask":
+        def sharpen(image: np.ndarray) -> np.ndarray:
+            return apply_unsharp_mask(
+                image, 
+                blur_kernel_size=blur_kernel_size,
+                sharpening_amount=sharpening_amount,
+                threshold=threshold
+            )
+    elif method_lower == "cv2":
+        sharpen = sharpen_with_cv2
+    elif method_lower == "tensorflow":
+        sharpen = sharpen_with_tensorflow
     else:
         raise ValueError(f"Unsupported sharpening method: {method}")
+
+    # Reuse the output of an identical earlier run
+    cache_key = None
+    if cache is not None and output_path:
+        params = {"method": method, "level": level}
+        if method_lower == "unsharp_mask":
+            params.update(blur_kernel_size=blur_kernel_size, sharpening_amount=sharpening_amount,
+                          threshold=threshold)
+        if roi is not None:
+            params.update(roi=roi_key(roi), composite=composite)
+        cache_key = cache.key(image_path, "sharpen", params, os.path.splitext(output_path)[1])
+        if cache.fetch(cache_key, output_path):
+            sharpened = load_image(output_path)
+            if display_result and roi is None:
+                display_comparison(get_pyramid(image_path).level(level), sharpened,
+                                   "Original", f"Sharpened ({method}, cached)")
+            return sharpened
+
+    if roi is None:
+        # Load the image (shared with other operations through the pyramid cache)
+        image = get_pyramid(image_path).level(level)
+        sharpened = sharpen(image)
+        shown = sharpened
+    else:
+        # Only read and process the ROI plus the halo the kernel needs
+        halo = operation_halo("sharpen", method=method, blur_kernel_size=blur_kernel_size)
+        region = process_roi(image_path, roi, sharpen, halo, composite=composite, level=level)
+        image, sharpened = region.original, region.image
+        x0, y0, x1, y1 = region.bounds
+        shown = sharpened[y0:y1, x0:x1] if composite else sharpened
     
     # Display the result if requested
     if display_result:
-        display_comparison(image, sharpened, "Original", f"Sharpened ({method})")
+        display_comparison(image, shown, "Original", f"Sharpened ({method})")
     
     # Save the result if an output path is provided
     if output_path:
-        save_image(sharpened, output_path)
+        if cache_key is not None:
+            if save_image(sharpened, output_path):
+                cache.store(cache_key, output_path)
+        else:
+            save_image(sharpened, output_path, writer=writer)
     
     return sharpened
 
@@ -0,0 +1,297 @@
+"""
+Strip-based LANCZOS resampling for images too large to hold in memory.
+
+The source is read a strip of rows at a time, typically from a memory map
+(see image_io.memmap_image), so only the pages of the current strip are
+resident. Each strip is resampled horizontally as soon as it is read; the
+vertical pass keeps just the horizontally resampled rows that the filter
+windows of pending output rows still need. Output rows are produced in
+order as soon as their window is complete, and can be written straight into
+a memory-mapped output file.
+
+Peak memory is one source strip plus a few output-width rows, independent of
+the image height; pages of a memory-mapped source are released once their
+strip has been read. Coefficients are computed the way Pillow computes them
+for Image.Resampling.LANCZOS (3-lobe, support scaled by the reduction
+factor), so results match Image.resize to within rounding. Four-channel
+sources are RGBA with straight alpha: like Pillow, colours are premultiplied
+by alpha before resampling and divided by it afterwards, so transparent
+pixels do not bleed their colour into visible edges.
+
+For large reductions, strips are first box-averaged by an integer factor
+that leaves at least reducing_gap times the output size, like Pillow's
+Image.resize(..., reducing_gap=...). This cuts the LANCZOS taps per pixel
+from dozens to about a dozen with no visible difference; pass
+reducing_gap=None for an exact LANCZOS resample.
+
+Example:
+    source = memmap_image("scan.tif")  # 40000 x 30000, never loaded whole
+    resize_to_file(source, "scan_small.tif", 4000, 3000, "TIFF")
+"""
+
+import math
+import mmap
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+# Constants
+LANCZOS_SUPPORT = 3.0
+DEFAULT_STRIP_HEIGHT = 128
+DEFAULT_REDUCING_GAP = 2.0
+STREAMABLE_FORMATS = ("TIFF", "NPY")
+
+
+def _lanczos(x: np.ndarray) -> np.ndarray:
+    """Evaluate the 3-lobe Lanczos kernel."""
+    return np.where(np.abs(x) < LANCZOS_SUPPORT, np.sinc(x) * np.sinc(x / LANCZOS_SUPPORT), 0.0)
+
+
+def lanczos_coefficients(in_size: int, out_size: int,
+                         extent: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute LANCZOS resampling taps along one axis.
+
+    Args:
+        in_size: Source length in pixels
+        out_size: Output length in pixels
+        extent: Source length the output spans, if not in_size (a box-reduced
+            source whose last pixel only partly covers the original)
+
+    Returns:
+        (index, weights): out_size x taps arrays of source positions and
+        normalized weights. Each row's positions are ascending and never
+        past the last pixel its window covers; unused taps have weight 0.
+    """
+    scale = (in_size if extent is None else extent) / out_size
+    filterscale = max(scale, 1.0)
+    support = LANCZOS_SUPPORT * filterscale
+    taps = int(math.ceil(support)) * 2 + 1
+
+    centers = (np.arange(out_size) + 0.5) * scale
+    starts = np.maximum((centers - support + 0.5).astype(np.int64), 0)
+    stops = np.minimum((centers + support + 0.5).astype(np.int64), in_size)
+    positions = starts[:, None] + np.arange(taps)[None, :]
+
+    weights = _lanczos((positions + 0.5 - centers[:, None]) / filterscale)
+    weights[positions >= stops[:, None]] = 0.0
+    weights /= weights.sum(axis=1, keepdims=True)
+    index = np.minimum(positions, stops[:, None] - 1)
+    return index, weights.astype(np.float32)
+
+
+def _apply(rows: np.ndarray, index: np.ndarray, weights: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Resample rows along one axis with precomputed taps.
+
+    Integer results are rounded and clipped to the input's range, as Pillow
+    does after each pass; LANCZOS overshoot near hard edges would otherwise
+    carry into the second pass.
+    """
+    shape = list(rows.shape)
+    shape[axis] = index.shape[0]
+    result = np.zeros(shape, dtype=np.float32)
+    broadcast = (-1,) + (1,) * (rows.ndim - axis - 1)
+    for tap in range(index.shape[1]):
+        result += np.take(rows, index[:, tap], axis=axis) * weights[:, tap].reshape(broadcast)
+    if rows.dtype.kind in "ui":
+        limits = np.iinfo(rows.dtype)
+        return np.clip(np.rint(result), limits.min, limits.max).astype(rows.dtype)
+    return result
+
+
+def _box_reduce(strip: np.ndarray, factor: int) -> np.ndarray:
+    """Average factor x factor blocks; partial blocks at the edges average the pixels they have."""
+    for axis in (0, 1):
+        size = strip.shape[axis]
+        starts = np.arange(0, size, factor)
+        counts = np.minimum(starts + factor, size) - starts
+        sums = np.add.reduceat(strip, starts, axis=axis, dtype=np.float32)
+        strip = sums / counts.reshape((-1,) + (1,) * (strip.ndim - axis - 1))
+    return strip
+
+
+def _release(source: np.ndarray, stop: int) -> None:
+    """Drop the resident pages of a memory-mapped source's rows above stop (best effort)."""
+    mapping = getattr(source, "_mmap", None)
+    if mapping is None or not hasattr(mapping, "madvise") or not source.flags.c_contiguous:
+        return
+    # np.memmap maps from the allocation boundary below its offset
+    end = source.offset % mmap.ALLOCATIONGRANULARITY + stop * source.strides[0]
+    end -= end % mmap.PAGESIZE
+    if end > 0:
+        try:
+            mapping.madvise(mmap.MADV_DONTNEED, 0, end)
+        except (AttributeError, OSError, ValueError):
+            pass
+
+
+def _has_alpha(source: np.ndarray) -> bool:
+    """Whether a source is RGBA whose colours are premultiplied for resampling (integer types only)."""
+    return source.ndim == 3 and source.shape[2] == 4 and source.dtype.kind == "u"
+
+
+def _premultiply(strip: np.ndarray) -> np.ndarray:
+    """Multiply the colour channels of an RGBA strip by alpha, rounding like Pillow's RGBA to RGBa."""
+    peak = np.iinfo(strip.dtype).max
+    wide = strip.astype(np.uint64)
+    wide[..., :3] = (wide[..., :3] * wide[..., 3:] + peak // 2) // peak
+    return wide.astype(strip.dtype)
+
+
+def _unpremultiply(block: np.ndarray) -> np.ndarray:
+    """Divide the colour channels of a premultiplied RGBA block by alpha, like Pillow's RGBa to RGBA."""
+    peak = np.iinfo(block.dtype).max
+    wide = block.astype(np.uint64)
+    alpha = wide[..., 3:]
+    colour = np.minimum(wide[..., :3] * peak // np.maximum(alpha, 1), peak)
+    wide[..., :3] = np.where((alpha == 0) | (alpha == peak), wide[..., :3], colour)
+    return wide.astype(block.dtype)
+
+
+def _read_strips(source: np.ndarray, strip_height: int, factor: int) -> Iterator[np.ndarray]:
+    """Yield the source in strips of rows, premultiplied if RGBA and box-reduced by factor."""
+    strip_height = -(-strip_height // factor) * factor  # keep box rows within one strip
+    alpha = _has_alpha(source)
+    for start in range(0, source.shape[0], strip_height):
+        strip = np.array(source[start:start + strip_height])
+        _release(source, start + strip.shape[0])
+        if alpha:
+            strip = _premultiply(strip)
+        if factor > 1:
+            limits = np.iinfo(source.dtype) if source.dtype.kind in "ui" else None
+            strip = _box_reduce(strip, factor)
+            if limits is not None:
+                strip = np.clip(np.rint(strip), limits.min, limits.max).astype(source.dtype)
+        yield strip
+
+
+def iter_resized_strips(source: np.ndarray, width: int, height: int,
+                        strip_height: int = DEFAULT_STRIP_HEIGHT,
+                        reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Resample an image to width x height, reading and producing it in strips.
+
+    Args:
+        source: Height x width (x channels) array; a memory map is only read
+            strip_height rows at a time. Four unsigned-integer channels are
+            taken as RGBA and resampled with premultiplied alpha.
+        width: Output width
+        height: Output height
+        strip_height: Source rows read per step
+        reducing_gap: Box-reduce first by the largest integer factor that
+            leaves this multiple of the output size (None to disable)
+
+    Yields:
+        (first output row, block of output rows) in order, with the source's dtype
+
+    Raises:
+        ValueError: If a size or the strip height is not positive
+    """
+    if width <= 0 or height <= 0 or strip_height <= 0:
+        raise ValueError("Output size and strip height must be greater than 0")
+
+    in_height, in_width = source.shape[:2]
+    factor = 1
+    if reducing_gap:
+        factor = max(1, int(min(in_width / width, in_height / height) / reducing_gap))
+    x_index, x_weights = lanczos_coefficients(-(-in_width // factor), width, in_width / factor)
+    y_index, y_weights = lanczos_coefficients(-(-in_height // factor), height, in_height / factor)
+    y_stops = y_index[:, -1] + 1  # source rows each output row needs
+
+    alpha = _has_alpha(source)
+    buffered = np.zeros((0, width) + source.shape[2:], dtype=source.dtype)
+    first_buffered = 0  # source row held in buffered[0]
+    read = 0
+    row = 0
+    strips = _read_strips(source, strip_height, factor)
+    while row < height:
+        strip = next(strips)
+        read += strip.shape[0]
+        buffered = np.concatenate([buffered, _apply(strip, x_index, x_weights, axis=1)])
+
+        ready = int(np.searchsorted(y_stops, read, side="right"))
+        if ready > row:
+            block = _apply(buffered, y_index[row:ready] - first_buffered, y_weights[row:ready], axis=0)
+            block = block.astype(source.dtype, copy=False)
+            yield row, _unpremultiply(block) if alpha else block
+            row = ready
+
+        if row < height:
+            # Rows above the next output row's window are no longer needed
+            drop = int(y_index[row, 0]) - first_buffered
+            buffered = buffered[drop:]
+            first_buffered += drop
+
+
+def resize_array(source: np.ndarray, width: int, height: int,
+                 strip_height: int = DEFAULT_STRIP_HEIGHT,
+                 out: Optional[np.ndarray] = None,
+                 reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP) -> np.ndarray:
+    """
+    Resample an image into an array, reading the source in strips.
+
+    Args:
+        source: Height x width (x channels) array, e.g. a memory map
+        width: Output width
+        height: Output height
+        strip_height: Source rows read per step
+        out: Array to write into (e.g. a memory-mapped output); allocated if None
+        reducing_gap: See iter_resized_strips
+
+    Returns:
+        The resampled image
+    """
+    if out is None:
+        out = np.empty((height, width) + source.shape[2:], dtype=source.dtype)
+    for row, block in iter_resized_strips(source, width, height, strip_height, reducing_gap):
+        out[row:row + block.shape[0]] = block
+    return out
+
+
+def resize_to_file(source: np.ndarray, output_path: str, width: int, height: int,
+                   file_format: str, strip_height: int = DEFAULT_STRIP_HEIGHT,
+                   reducing_gap: Optional[float] = DEFAULT_REDUCING_GAP) -> Dict[str, Any]:
+    """
+    Resample an image straight into a memory-mapped output file.
+
+    Output rows are written as they are produced, so neither the source nor
+    the output is ever held in memory as a whole.
+
+    Args:
+        source: Height x width (x channels) array, e.g. a memory map
+        output_path: File to create
+        width: Output width
+        height: Output height
+        file_format: 'TIFF' (uncompressed) or 'NPY'
+        strip_height: Source rows read per step
+        reducing_gap: See iter_resized_strips
+
+    Returns:
+        Dictionary with the output size, number of strips and seconds taken
+
+    Raises:
+        ValueError: If the format cannot be written progressively
+    """
+    shape = (height, width) + source.shape[2:]
+    if file_format == "TIFF":
+        import tifffile
+        photometric = "rgb" if len(shape) == 3 and shape[2] in (3, 4) else "minisblack"
+        out = tifffile.memmap(output_path, shape=shape, dtype=source.dtype, photometric=photometric)
+    elif file_format == "NPY":
+        out = np.lib.format.open_memmap(output_path, mode="w+", dtype=source.dtype, shape=shape)
+    else:
+        raise ValueError(f"Cannot write {file_format} progressively; supported formats: "
+                         f"{', '.join(STREAMABLE_FORMATS)}")
+
+    start = time.perf_counter()
+    strips = 0
+    for row, block in iter_resized_strips(source, width, height, strip_height, reducing_gap):
+        out[row:row + block.shape[0]] = block
+        strips += 1
+    out.flush()
+    del out
+    return {"width": width, "height": height, "strips": strips,
+            "seconds": round(time.perf_counter() - start, 6)}
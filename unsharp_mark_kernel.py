@@ -1,8 +1,7 @@
 from typing import Tuple
 
 import cv2
-import imageio.v3 as iio
-from utils import display_comparison
+from utils import display_comparison, save_image
 import numpy as np
 
 # Constants for image processing
@@ -59,7 +58,7 @@ def apply_unsharp_mask(
 
     # Save if requested
     if save_result:
-        iio.imwrite(output_path, sharp, plugin='tifffile')
+        save_image(sharp, output_path)
 
     return sharp
 
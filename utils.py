@@ -2,9 +2,11 @@ import os
 from typing import Tuple
 
 import imageio.v3 as iio
-import matplotlib.pyplot as plt
 import numpy as np
 
+import image_utils
+from image_io import write_image
+
 
 def save_image(image, output_path):
     """
@@ -12,34 +14,19 @@ def save_image(image, output_path):
 
     Parameters:
         image (numpy.ndarray): The image to save.
-        output_path (str): The file path where the image will be saved.
+        output_path (str): The file path where the image will be saved; the
+            extension selects the format.
 
     Returns:
         None
     """
-    success = iio.imwrite(output_path, image, plugin='tifffile')
-    if success:
-        print(f"Image successfully saved to {output_path}")
-    else:
-        print(f"Error: Unable to save the image to {output_path}")
+    image_utils.save_image(image, output_path)
 
 
 def display_comparison(original: np.ndarray, processed: np.ndarray,
                        original_title: str, processed_title: str, subplot_figsize: Tuple[int, int] = (12, 6)) -> None:
-    """Display original and processed images side by side."""
-    plt.figure(figsize=subplot_figsize)
-
-    plt.subplot(1, 2, 1)
-    plt.title(original_title)
-    plt.imshow(original)
-    plt.axis('off')
-
-    plt.subplot(1, 2, 2)
-    plt.title(processed_title)
-    plt.imshow(processed)
-    plt.axis('off')
-
-    plt.show()
+    """Display original and processed images side by side (honours the display mode)."""
+    image_utils.display_comparison(original, processed, original_title, processed_title, subplot_figsize)
 
 
 def save_image_from_url(image_url: str, output_path: str) -> bool:
@@ -59,7 +46,7 @@ def save_image_from_url(image_url: str, output_path: str) -> bool:
 
         # Read and save the image
         image = iio.imread(image_url)
-        iio.imwrite(output_path, image, plugin='tifffile')
+        write_image(image, output_path)
         print(f"Image successfully saved to {output_path}")
         return True
     except Exception as e:
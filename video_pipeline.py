@@ -0,0 +1,606 @@
+"""
+Streaming video processing with the image operations.
+
+Frames are decoded with ``cv2.VideoCapture`` on a producer thread, run
+through a chain of named operations ('edge', 'sharpen', 'filter') on a
+worker pool, and written in their original order with ``cv2.VideoWriter``
+or by piping raw frames into ffmpeg. Only a bounded number of frames is
+decoded ahead or in flight, so memory stays flat for clips of any length.
+
+With the default process pool, frames are decoded straight into recycled
+shared memory blocks (see shared_memory_pool), so no pixels are pickled
+between the reader, the workers and the writer.
+
+An optional FrameDiffGate skips work on static footage: frames that barely
+differ from the last processed one reuse its output, and with tiling only
+the changed parts of a frame are processed again.
+
+Example:
+    python video_pipeline.py input.mp4 output.mp4 --op sharpen --op filter:filter_name=smooth
+"""
+
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from image_io import prepare_for_encoding
+from operations import GRAYSCALE_OPERATIONS, parse_operation_params, resolve_params, run_operation
+from roi import operation_halo
+from shared_memory_pool import SharedMemoryWorkerPool
+
+
+# Constants
+EXECUTORS = ("process", "thread")
+WRITERS = ("auto", "cv2", "ffmpeg")
+FRAMES_IN_FLIGHT_PER_WORKER = 2
+DEFAULT_CRF = 23
+DEFAULT_SKIP_THRESHOLD = 3.0  # gray levels
+GATE_SCALE = 8  # frames are compared as means of 8x8 blocks
+CV2_FOURCC = {
+    ".mp4": "mp4v",
+    ".m4v": "mp4v",
+    ".mov": "mp4v",
+    ".avi": "MJPG",
+    ".mkv": "XVID",
+}
+
+
+class OperationChain:
+    """
+    A picklable sequence of operations applied to BGR video frames.
+
+    Operations that work on grayscale (edge detection) get a converted
+    frame, and single-channel or boolean results are expanded back to
+    three-channel uint8 frames, so any chain yields writable frames.
+
+    Args:
+        steps: (operation, params) pairs applied in order
+    """
+
+    def __init__(self, steps: Sequence[Tuple[str, Dict[str, Any]]]):
+        if not steps:
+            raise ValueError("An operation chain needs at least one step")
+        self.steps = [(operation, resolve_params(operation, params)) for operation, params in steps]
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        for operation, params in self.steps:
+            if operation in GRAYSCALE_OPERATIONS and frame.ndim == 3:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            result = prepare_for_encoding(run_operation(operation, frame, **params))
+            if result.ndim == 2:
+                result = cv2.cvtColor(result, cv2.COLOR_GRAY2BGR)
+            elif result.shape[2] != 3:
+                raise ValueError(f"Operation '{operation}' produced {result.shape[2]} channels; "
+                                 f"video frames need 3")
+            frame = result
+        return frame
+
+    @property
+    def halo(self) -> int:
+        """Pixels of context the chain needs around a region (see roi.operation_halo)."""
+        return sum(operation_halo(operation, **params) for operation, params in self.steps)
+
+    def __repr__(self) -> str:
+        return " -> ".join(operation for operation, _ in self.steps)
+
+
+def process_regions(frame: np.ndarray, chain: OperationChain,
+                    boxes: Sequence[Tuple[int, int, int, int]], halo: int) -> np.ndarray:
+    """
+    Run an operation chain on regions of a frame.
+
+    Each region is processed with halo pixels of context around it, so the
+    result inside the box matches processing the whole frame.
+
+    Args:
+        frame: BGR frame
+        chain: Operations to apply
+        boxes: (x0, y0, x1, y1) regions with exclusive upper bounds
+        halo: Context pixels to include around each region
+
+    Returns:
+        Frame-sized array holding the processed regions; other pixels are zero
+    """
+    height, width = frame.shape[:2]
+    output = np.zeros((height, width, 3), dtype=np.uint8)
+    for x0, y0, x1, y1 in boxes:
+        px0, py0 = max(0, x0 - halo), max(0, y0 - halo)
+        px1, py1 = min(width, x1 + halo), min(height, y1 + halo)
+        processed = chain(np.ascontiguousarray(frame[py0:py1, px0:px1]))
+        output[y0:y1, x0:x1] = processed[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+    return output
+
+
+class FrameDiffGate:
+    """
+    Decides which frames, or parts of frames, need processing.
+
+    Frames are compared as grayscale signatures at 1/GATE_SCALE resolution,
+    i.e. the mean brightness of each GATE_SCALE x GATE_SCALE block. A tile
+    counts as changed when any of its blocks moved by more than the
+    threshold, so a small object moving over a static scene is not averaged
+    away. Each tile keeps the signature it had when its output was last
+    computed, so slow drift is caught once it adds up to the threshold
+    instead of being skipped frame after frame.
+
+    Args:
+        threshold: Largest block brightness change (gray levels, 0-255) for
+            which a frame, or a tile, still counts as unchanged
+        tile_size: Tile edge in pixels; None compares whole frames only
+        max_changed_fraction: Above this fraction of changed tiles the whole
+            frame is processed instead of its changed regions
+        max_skip: Process the whole frame after this many consecutive frames
+            that were not (optional)
+    """
+
+    def __init__(self, threshold: float = DEFAULT_SKIP_THRESHOLD, tile_size: Optional[int] = None,
+                 max_changed_fraction: float = 0.5, max_skip: Optional[int] = None):
+        if threshold < 0:
+            raise ValueError(f"Skip threshold must be non-negative, got {threshold}")
+        if tile_size is not None and tile_size < GATE_SCALE:
+            raise ValueError(f"Tile size must be at least {GATE_SCALE} pixels, got {tile_size}")
+        self.threshold = threshold
+        self.tile_size = tile_size
+        self.max_changed_fraction = max_changed_fraction
+        self.max_skip = max_skip
+        self._reference: Optional[np.ndarray] = None
+        self._since_full = 0
+        self.frames = 0
+        self.skipped = 0
+        self.partial = 0
+        self.tiles_processed = 0
+        self.tiles_total = 0
+
+    def _signature(self, frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height, width = gray.shape
+        size = (max(1, -(-width // GATE_SCALE)), max(1, -(-height // GATE_SCALE)))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def check(self, frame: np.ndarray) -> Tuple[str, List[Tuple[int, int, int, int]]]:
+        """
+        Classify a frame and update the references.
+
+        Args:
+            frame: BGR or grayscale frame
+
+        Returns:
+            ('full', []) to process the whole frame, ('skip', []) to reuse the
+            previous output, or ('tiles', boxes) to process only the
+            (x0, y0, x1, y1) boxes and keep the previous output elsewhere
+        """
+        self.frames += 1
+        signature = self._signature(frame)
+        height, width = frame.shape[:2]
+        rows, cols = signature.shape
+        step = (self.tile_size // GATE_SCALE) if self.tile_size else max(rows, cols)
+        tile_rows, tile_cols = -(-rows // step), -(-cols // step)
+        self.tiles_total += tile_rows * tile_cols
+
+        forced = self.max_skip is not None and self._since_full > self.max_skip
+        if self._reference is None or self._reference.shape != signature.shape or forced:
+            return self._full(signature, tile_rows * tile_cols)
+
+        # Largest block difference per tile
+        difference = np.abs(signature - self._reference)
+        row_starts, col_starts = np.arange(0, rows, step), np.arange(0, cols, step)
+        peaks = np.maximum.reduceat(np.maximum.reduceat(difference, row_starts, axis=0), col_starts, axis=1)
+        changed = peaks > self.threshold
+
+        changed_tiles = int(changed.sum())
+        self._since_full += 1
+        if changed_tiles == 0:
+            self.skipped += 1
+            return "skip", []
+        if self.tile_size is None or changed_tiles > self.max_changed_fraction * changed.size:
+            return self._full(signature, changed.size)
+
+        # Refresh the references of the changed tiles only
+        pixel_mask = changed[np.arange(rows) // step][:, np.arange(cols) // step]
+        self._reference[pixel_mask] = signature[pixel_mask]
+        self.partial += 1
+        self.tiles_processed += changed_tiles
+
+        # One box per connected group of changed tiles
+        tile = step * GATE_SCALE
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed.astype(np.uint8), connectivity=8)
+        boxes = []
+        for x, y, w, h, _ in stats[1:count]:
+            boxes.append((int(x) * tile, int(y) * tile,
+                          min(width, int(x + w) * tile), min(height, int(y + h) * tile)))
+        return "tiles", boxes
+
+    def _full(self, signature: np.ndarray, tiles: int) -> Tuple[str, list]:
+        self._reference = signature
+        self._since_full = 0
+        self.tiles_processed += tiles
+        return "full", []
+
+    def stats(self) -> dict:
+        """Return frame counts, the skip ratio and the fraction of tiles processed."""
+        return {
+            "frames_checked": self.frames,
+            "frames_skipped": self.skipped,
+            "frames_partial": self.partial,
+            "skip_ratio": round(self.skipped / self.frames, 4) if self.frames else 0.0,
+            "tiles_processed_ratio": round(self.tiles_processed / self.tiles_total, 4) if self.tiles_total else 0.0,
+        }
+
+
+def parse_step(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Parse an operation step such as 'edge' or 'filter:filter_name=blur,...'.
+
+    Args:
+        spec: Operation name, optionally followed by ':' and name=value pairs
+
+    Returns:
+        (operation, params)
+
+    Raises:
+        ValueError: If the operation or a parameter is invalid
+    """
+    operation, _, arguments = spec.partition(":")
+    values = {}
+    for pair in filter(None, arguments.split(",")):
+        name, separator, value = pair.partition("=")
+        if not separator:
+            raise ValueError(f"Expected name=value in step '{spec}', got '{pair}'")
+        values[name.strip()] = value.strip()
+    return operation.strip(), parse_operation_params(operation.strip(), values)
+
+
+# --- Writers ---
+
+class CV2VideoSink:
+    """Writes BGR frames with cv2.VideoWriter (no audio)."""
+
+    def __init__(self, output_path: str, fps: float, size: Tuple[int, int], fourcc: Optional[str] = None):
+        fourcc = fourcc or CV2_FOURCC.get(os.path.splitext(output_path)[1].lower(), "mp4v")
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        self._writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+        if not self._writer.isOpened():
+            raise IOError(f"Unable to open video writer for {output_path} with codec {fourcc}")
+
+    def write(self, frame: np.ndarray) -> None:
+        self._writer.write(frame)
+
+    def close(self) -> None:
+        self._writer.release()
+
+
+class FFmpegVideoSink:
+    """
+    Pipes raw BGR frames into an ffmpeg process.
+
+    Args:
+        output_path: Output file; ffmpeg picks the container from the extension
+        fps: Output frame rate
+        size: (width, height) of the frames
+        ffmpeg_path: ffmpeg executable
+        codec: Video codec passed to -c:v
+        crf: Constant rate factor for x264/x265-style codecs
+        audio_source: Media file whose audio track (if any) is copied into the output
+    """
+
+    def __init__(self, output_path: str, fps: float, size: Tuple[int, int],
+                 ffmpeg_path: str = "ffmpeg", codec: str = "libx264", crf: int = DEFAULT_CRF,
+                 audio_source: Optional[str] = None):
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        command = [ffmpeg_path, "-y", "-loglevel", "error",
+                   "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{size[0]}x{size[1]}", "-r", str(fps),
+                   "-i", "-"]
+        if audio_source:
+            command += ["-i", audio_source, "-map", "0:v", "-map", "1:a?", "-c:a", "copy", "-shortest"]
+        command += ["-c:v", codec, "-crf", str(crf), "-pix_fmt", "yuv420p", output_path]
+        try:
+            self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise IOError(f"Unable to start ffmpeg ({ffmpeg_path}): {str(e)}")
+
+    def write(self, frame: np.ndarray) -> None:
+        try:
+            self._process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast("B"))
+        except BrokenPipeError:
+            raise IOError(f"ffmpeg exited early: {self._process.stderr.read().decode(errors='replace')}")
+
+    def close(self) -> None:
+        self._process.stdin.close()
+        stderr = self._process.stderr.read().decode(errors="replace")
+        if self._process.wait() != 0:
+            raise IOError(f"ffmpeg failed: {stderr.strip()}")
+
+
+def open_sink(output_path: str, fps: float, size: Tuple[int, int], writer: str = "auto",
+              audio_source: Optional[str] = None, crf: int = DEFAULT_CRF):
+    """
+    Open a video writer.
+
+    Args:
+        output_path: Output file
+        fps: Output frame rate
+        size: (width, height) of the frames
+        writer: 'cv2', 'ffmpeg', or 'auto' (ffmpeg when it is on the PATH)
+        audio_source: File to copy audio from (ffmpeg only)
+        crf: Constant rate factor (ffmpeg only)
+
+    Returns:
+        Sink with write(frame) and close()
+    """
+    if writer not in WRITERS:
+        raise ValueError(f"Unsupported writer: {writer}. Available writers: {', '.join(WRITERS)}")
+    ffmpeg_path = shutil.which("ffmpeg")
+    if writer == "ffmpeg" or (writer == "auto" and ffmpeg_path):
+        return FFmpegVideoSink(output_path, fps, size, ffmpeg_path=ffmpeg_path or "ffmpeg",
+                               crf=crf, audio_source=audio_source)
+    return CV2VideoSink(output_path, fps, size)
+
+
+# --- Pipeline ---
+
+class _FrameReader(threading.Thread):
+    """Producer thread that decodes frames into a bounded queue."""
+
+    def __init__(self, capture: cv2.VideoCapture, frames: "queue.Queue", allocate: Optional[Callable],
+                 shape: Tuple[int, ...], end_msec: Optional[float]):
+        super().__init__(name="video-reader", daemon=True)
+        self.capture = capture
+        self.frames = frames
+        self.allocate = allocate
+        self.shape = shape
+        self.end_msec = end_msec
+        self.stop = threading.Event()
+
+    def _put(self, item) -> bool:
+        while not self.stop.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self) -> None:
+        try:
+            while not self.stop.is_set():
+                if self.allocate is not None:
+                    # Decode straight into a pooled shared memory block
+                    shared = self.allocate(self.shape, np.uint8)
+                    ok, frame = self.capture.read(shared.array)
+                    if ok and frame is not shared.array:
+                        np.copyto(shared.array, frame)
+                    item = shared
+                else:
+                    ok, frame = self.capture.read()
+                    item = frame
+                if not ok or (self.end_msec is not None
+                              and self.capture.get(cv2.CAP_PROP_POS_MSEC) > self.end_msec):
+                    if self.allocate is not None:
+                        shared.release()
+                    break
+                if not self._put(item):
+                    break
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(None)
+
+
+def process_video(input_path: str,
+                  output_path: str,
+                  steps: Sequence[Tuple[str, Dict[str, Any]]],
+                  workers: Optional[int] = None,
+                  max_in_flight: Optional[int] = None,
+                  executor: str = "process",
+                  writer: str = "auto",
+                  start_seconds: float = 0.0,
+                  end_seconds: Optional[float] = None,
+                  crf: int = DEFAULT_CRF,
+                  gate: Optional[FrameDiffGate] = None,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """
+    Apply an operation chain to every frame of a video.
+
+    Args:
+        input_path: Input media file
+        output_path: Output video file
+        steps: (operation, params) pairs, e.g. [("sharpen", {}), ("filter", {"filter_name": "smooth"})]
+        workers: Worker count (defaults to the CPU count)
+        max_in_flight: Frames being processed at once (defaults to 2 per worker);
+            the same number can wait decoded in the read-ahead queue
+        executor: 'process' (shared memory process pool) or 'thread'
+        writer: 'cv2', 'ffmpeg' or 'auto'
+        start_seconds: Position to start reading from
+        end_seconds: Position to stop at (optional)
+        crf: Constant rate factor for the ffmpeg writer
+        gate: Frame-difference gate for skipping unchanged frames or tiles (optional)
+        progress: Called with (frames written, estimated total frames) (optional)
+
+    Returns:
+        Statistics: frames, seconds, fps, sustained_fps, input fps, size, workers,
+        plus the gate's skip statistics when a gate is used
+
+    Raises:
+        ValueError: If the input cannot be opened or the arguments are invalid
+        IOError: If the output cannot be written
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unsupported executor: {executor}. Available executors: {', '.join(EXECUTORS)}")
+    chain = OperationChain(steps)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * FRAMES_IN_FLIGHT_PER_WORKER
+
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise ValueError(f"Unable to open video: {input_path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    if start_seconds:
+        capture.set(cv2.CAP_PROP_POS_MSEC, start_seconds * 1000)
+        total = max(0, total - int(start_seconds * fps))
+    if end_seconds is not None:
+        total = min(total, int((end_seconds - start_seconds) * fps))
+
+    pool = SharedMemoryWorkerPool(workers) if executor == "process" else None
+    threads = ThreadPoolExecutor(max_workers=workers) if executor == "thread" else None
+    frames: "queue.Queue" = queue.Queue(maxsize=max_in_flight)
+    reader = _FrameReader(capture, frames, pool.allocate if pool else None, (height, width, 3),
+                          end_seconds * 1000 if end_seconds is not None else None)
+
+    sink = None
+    # (decision, future, boxes) per frame, in frame order
+    pending: deque = deque()
+    # Last written frame, which skipped frames and unchanged tiles reuse
+    last_output = np.zeros((height, width, 3), dtype=np.uint8) if gate is not None else None
+    halo = chain.halo if gate is not None and gate.tile_size else 0
+    written = 0
+    first_write = last_write = None
+    started = time.perf_counter()
+
+    def write_oldest() -> None:
+        nonlocal written, first_write, last_write
+        decision, future, boxes = pending.popleft()
+        if future is None:
+            frame = last_output
+        else:
+            result = future.result()
+            frame = result.array if pool is not None else result
+            if decision == "tiles":
+                for x0, y0, x1, y1 in boxes:
+                    last_output[y0:y1, x0:x1] = frame[y0:y1, x0:x1]
+                frame = last_output
+            elif last_output is not None:
+                np.copyto(last_output, frame)
+        sink.write(frame)
+        if pool is not None and future is not None:
+            result.release()
+        written += 1
+        last_write = time.perf_counter()
+        if first_write is None:
+            first_write = last_write
+        if progress is not None:
+            progress(written, total)
+
+    try:
+        sink = open_sink(output_path, fps, (width, height), writer=writer, audio_source=input_path, crf=crf)
+        reader.start()
+        while True:
+            item = frames.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise ValueError(f"Error decoding {input_path}: {str(item)}")
+
+            if len(pending) >= max_in_flight:
+                write_oldest()
+            frame = item.array if pool is not None else item
+            decision, boxes = gate.check(frame) if gate is not None else ("full", [])
+            if decision == "tiles":
+                # Outputs within the kernel reach of a change change too
+                boxes = [(max(0, x0 - halo), max(0, y0 - halo), min(width, x1 + halo), min(height, y1 + halo))
+                         for x0, y0, x1, y1 in boxes]
+            if decision == "skip":
+                future = None
+                if pool is not None:
+                    item.release()
+            else:
+                task = (chain,) if decision == "full" else (process_regions, chain, boxes, halo)
+                if pool is not None:
+                    future = pool.submit(task[0], item, *task[1:], output_shape=(height, width, 3))
+                    future.add_done_callback(lambda _, shared=item: shared.release())
+                else:
+                    future = threads.submit(task[0], item, *task[1:])
+            pending.append((decision, future, boxes))
+
+        while pending:
+            write_oldest()
+    finally:
+        reader.stop.set()
+        reader.join()
+        for _, future, _ in pending:
+            if future is not None:
+                future.cancel()
+        if sink is not None:
+            sink.close()
+        if pool is not None:
+            pool.close()
+        if threads is not None:
+            threads.shutdown(wait=True)
+        capture.release()
+
+    elapsed = time.perf_counter() - started
+    sustained = (written - 1) / (last_write - first_write) if written > 1 and last_write > first_write else 0.0
+    stats = {
+        "frames": written,
+        "seconds": round(elapsed, 3),
+        "fps": round(written / elapsed, 2) if elapsed else 0.0,
+        "sustained_fps": round(sustained, 2),
+        "input_fps": fps,
+        "size": [width, height],
+        "workers": workers,
+        "executor": executor,
+        "chain": repr(chain),
+    }
+    if gate is not None:
+        stats.update(gate.stats())
+    return stats
+
+
+def main() -> None:
+    """Run the video pipeline from the command line."""
+    parser = argparse.ArgumentParser(description="Apply image operations to every frame of a video")
+    parser.add_argument("input", help="Input media file")
+    parser.add_argument("output", help="Output video file")
+    parser.add_argument("--op", action="append", required=True, dest="steps",
+                        help="Operation step, e.g. 'sharpen' or 'edge:blur=1.5' (repeat to chain)")
+    parser.add_argument("--workers", type=int, help="Worker count (default: CPU count)")
+    parser.add_argument("--max-in-flight", type=int, help="Frames processed at once (default: 2 per worker)")
+    parser.add_argument("--executor", choices=EXECUTORS, default="process")
+    parser.add_argument("--writer", choices=WRITERS, default="auto")
+    parser.add_argument("--start", type=float, default=0.0, help="Start position in seconds")
+    parser.add_argument("--end", type=float, help="End position in seconds")
+    parser.add_argument("--crf", type=int, default=DEFAULT_CRF, help="ffmpeg constant rate factor")
+    parser.add_argument("--skip-threshold", type=float,
+                        help=f"Reuse the previous output for frames in which no {GATE_SCALE}x{GATE_SCALE} "
+                             "block's mean brightness changed by more than this many gray levels "
+                             f"(e.g. {DEFAULT_SKIP_THRESHOLD})")
+    parser.add_argument("--tile-size", type=int,
+                        help="With --skip-threshold, reprocess only changed tiles of this size")
+    parser.add_argument("--max-skip", type=int, help="Process the whole frame at least every N+1 frames")
+    args = parser.parse_args()
+
+    gate = None
+    if args.skip_threshold is not None:
+        gate = FrameDiffGate(args.skip_threshold, tile_size=args.tile_size, max_skip=args.max_skip)
+
+    def report(done: int, total: int) -> None:
+        if done % 25 == 0 or done == total:
+            print(f"\rProcessed {done}/{total or '?'} frames", end="", flush=True)
+
+    stats = process_video(args.input, args.output, [parse_step(spec) for spec in args.steps],
+                          workers=args.workers, max_in_flight=args.max_in_flight,
+                          executor=args.executor, writer=args.writer,
+                          start_seconds=args.start, end_seconds=args.end, crf=args.crf,
+                          gate=gate, progress=report)
+    print(f"\nWrote {stats['frames']} frames to {args.output} in {stats['seconds']:.2f}s "
+          f"({stats['fps']:.1f} fps overall, {stats['sustained_fps']:.1f} fps sustained)")
+    if gate is not None:
+        print(f"Skipped {stats['frames_skipped']} frames ({stats['skip_ratio']:.1%}), "
+              f"{stats['frames_partial']} partially processed, "
+              f"{stats['tiles_processed_ratio']:.1%} of tiles processed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,595 @@
+"""
+Watch a directory and resize images as they arrive.
+
+New or changed images in the watched directory are resized into one or
+more sizes with the batch resizer (see image_resizer.resize_file) on a pool
+of worker processes, writing one JSON result line per image to stdout.
+
+Changes are picked up with inotify on Linux (through ctypes, no extra
+packages) and by rescanning the directory elsewhere or with --poll; with
+inotify the directory is still rescanned every RESCAN_INTERVAL seconds in
+case an event was lost. A file is only queued once its size and
+modification time have stayed the same for --settle seconds, so files that
+are still being copied in are never read half written. Hidden files (such
+as the '.name.part' files many uploaders write first) are ignored.
+
+Processed files are recorded in a small SQLite database together with
+their size, modification time and the resize settings, so a restarted
+watcher only resizes files that are new, changed or were resized with
+other settings. Files that failed are retried once they change.
+
+Queue depth (files settling, queued and in flight) and latency from
+detection to finished outputs are printed to stderr every few seconds
+and, with --metrics, written to a JSON file for monitoring.
+
+Example:
+    python watch_folder.py --input incoming --output resized --size 1600x1600 --size 400x400 --format webp
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import signal
+import sqlite3
+import statistics
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Set, TextIO, Tuple
+
+from batch_inputs import IMAGE_EXTENSIONS
+from image_resizer import (DEFAULT_OUTPUT_DIR, DEFAULT_PROFILE, ENCODER_PROFILES, ResizeSpec, parse_size,
+                           resize_targets, run_resize_job)
+
+
+# Constants
+DEFAULT_POLL_INTERVAL = 2.0  # seconds between rescans when polling
+DEFAULT_SETTLE_SECONDS = 2.0  # a file must be unchanged this long before it is resized
+DEFAULT_STATE_FILE = ".watch-state.sqlite"  # created in the output directory
+RESCAN_INTERVAL = 60.0  # seconds between safety rescans when using inotify
+COLLECT_INTERVAL = 0.2  # seconds to wait for finished jobs per loop while any are in flight
+REPORT_INTERVAL = 5.0  # seconds between metrics lines
+LATENCY_WINDOW = 1000  # recent jobs the latency percentiles cover
+IN_FLIGHT_PER_WORKER = 2
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+INOTIFY_READ_BYTES = 64 * 1024
+
+
+class PollingMonitor:
+    """Ask for a full rescan of the watched directory at a fixed interval."""
+
+    name = "polling"
+
+    def __init__(self, interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self._next_scan = time.monotonic()
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Wait until the next rescan is due or the timeout passes.
+
+        Returns:
+            None when the directory should be rescanned, otherwise an empty set
+        """
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(max(timeout, 0.0))
+            return set()
+        time.sleep(max(delay, 0.0))
+        self._next_scan = time.monotonic() + self.interval
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyMonitor:
+    """Report changed paths under the watched directory with Linux inotify."""
+
+    name = "inotify"
+
+    def __init__(self, directory: str, recursive: bool = False, exclude: Tuple[str, ...] = ()):
+        """
+        Args:
+            directory: Directory to watch
+            recursive: Whether to watch subdirectories, including new ones
+            exclude: Directories not to watch (e.g. an output directory inside the watched one)
+
+        Raises:
+            OSError: If inotify is not available or the directory cannot be watched
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self.exclude = exclude
+        self._directories: Dict[int, str] = {}
+        self._next_scan = time.monotonic() + RESCAN_INTERVAL
+        try:
+            self._add_tree(directory)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"Could not watch {directory}: {os.strerror(error)}")
+        self._directories[wd] = directory
+
+    def _add_tree(self, directory: str) -> None:
+        """Watch a directory and, when recursive, the subdirectories below it."""
+        directories = [directory]
+        while directories:
+            current = directories.pop()
+            if os.path.abspath(current) in self.exclude:
+                continue
+            self._add_watch(current)
+            if self.recursive:
+                with os.scandir(current) as entries:
+                    directories.extend(entry.path for entry in entries
+                                       if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."))
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """
+        Wait up to timeout seconds for changes.
+
+        Returns:
+            Changed file paths, or None when the directory should be rescanned
+            (events were lost, a directory appeared, or a safety rescan is due)
+        """
+        timeout = min(timeout, max(self._next_scan - time.monotonic(), 0.0))
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            if time.monotonic() >= self._next_scan:
+                self._next_scan = time.monotonic() + RESCAN_INTERVAL
+                return None
+            return set()
+
+        changed: Set[str] = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self._fd, INOTIFY_READ_BYTES)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                offset += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                elif mask & IN_IGNORED:
+                    self._directories.pop(wd, None)
+                elif wd in self._directories and name:
+                    path = os.path.join(self._directories[wd], os.fsdecode(name))
+                    if not mask & IN_ISDIR:
+                        changed.add(path)
+                    elif self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith(b"."):
+                        # Files may have landed before the watch was added
+                        try:
+                            self._add_tree(path)
+                        except OSError:
+                            pass
+                        rescan = True
+        return None if rescan else changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class WatchState:
+    """SQLite record of the files a watcher has processed."""
+
+    def __init__(self, path: str, settings: str):
+        """
+        Args:
+            path: Database file (created if missing)
+            settings: Resize settings; files processed with other settings are redone
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.settings = settings
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                settings TEXT NOT NULL,
+                status TEXT NOT NULL,
+                error TEXT,
+                seconds REAL,
+                finished_at REAL
+            )
+        """)
+        self._db.commit()
+
+    def is_current(self, path: str, size: int, mtime_ns: int) -> bool:
+        """Return whether this version of a file was already processed with the current settings."""
+        row = self._db.execute("SELECT size, mtime_ns, settings FROM files WHERE path = ?", (path,)).fetchone()
+        return row is not None and tuple(row) == (size, mtime_ns, self.settings)
+
+    def record(self, path: str, size: int, mtime_ns: int, status: str,
+               error: Optional[str] = None, seconds: Optional[float] = None) -> None:
+        """Store the outcome of processing a file."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, settings, status, error, seconds, finished_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, self.settings, status, error, seconds, time.time()))
+        self._db.commit()
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of recorded files per status."""
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM files GROUP BY status").fetchall())
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _restore_default_signals() -> None:
+    """Pool initializer: let workers die on SIGTERM instead of running the parent's stop handler."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+class FolderWatcher:
+    """Resize images that appear or change in a directory."""
+
+    def __init__(self, directory: str, sizes: List[ResizeSpec],
+                 output_dir: str = DEFAULT_OUTPUT_DIR,
+                 output_format: Optional[str] = None,
+                 recursive: bool = False,
+                 workers: int = 1,
+                 max_in_flight: Optional[int] = None,
+                 quality: Optional[int] = None,
+                 profile: str = DEFAULT_PROFILE,
+                 settle: float = DEFAULT_SETTLE_SECONDS,
+                 poll: bool = False,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 state_path: Optional[str] = None,
+                 metrics_path: Optional[str] = None,
+                 stream: Optional[TextIO] = None,
+                 progress: bool = True):
+        """
+        Args:
+            directory: Directory to watch
+            sizes: Output sizes
+            output_dir: Output root directory (ignored when inside the watched directory)
+            output_format: Output extension, e.g. 'webp' (defaults to the input's)
+            recursive: Whether to watch subdirectories
+            workers: Number of worker processes
+            max_in_flight: Maximum number of jobs handed to the pool at once (defaults to 2 per worker)
+            quality: Overrides the profile's JPEG/WebP/AVIF quality
+            profile: Encoder profile (see image_resizer.ENCODER_PROFILES)
+            settle: Seconds a file must stay unchanged before it is resized
+            poll: Rescan the directory instead of using inotify
+            poll_interval: Seconds between rescans when polling
+            state_path: SQLite state database (defaults to DEFAULT_STATE_FILE in output_dir)
+            metrics_path: JSON file to keep up to date with the metrics (optional)
+            stream: Text stream for result lines (defaults to stdout)
+            progress: Print metrics to stderr every few seconds
+
+        Raises:
+            ValueError: If the directory does not exist
+        """
+        if not os.path.isdir(directory):
+            raise ValueError(f"Not a directory: {directory}")
+        self.directory = directory
+        self.sizes = sizes
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.recursive = recursive
+        self.workers = max(1, workers)
+        self.max_in_flight = max_in_flight or self.workers * IN_FLIGHT_PER_WORKER
+        self.quality = quality
+        self.profile = profile
+        self.settle = settle
+        self.metrics_path = metrics_path
+        self.stream = stream or sys.stdout
+        self.progress = progress
+        self._exclude = (os.path.abspath(output_dir),)
+
+        settings = json.dumps({"sizes": [list(size) for size in sizes], "output": os.path.abspath(output_dir),
+                               "format": output_format, "quality": quality, "profile": profile})
+        self.state = WatchState(state_path or os.path.join(output_dir, DEFAULT_STATE_FILE), settings)
+
+        self.monitor = None
+        if not poll:
+            try:
+                self.monitor = InotifyMonitor(directory, recursive, self._exclude)
+            except OSError as e:
+                print(f"inotify unavailable ({e}); polling every {poll_interval:g}s instead", file=sys.stderr)
+        if self.monitor is None:
+            self.monitor = PollingMonitor(poll_interval)
+
+        # path -> (size, mtime_ns, unchanged since, first seen)
+        self._settling: Dict[str, Tuple[int, int, float, float]] = {}
+        # (path, size, mtime_ns, first seen) waiting for a worker
+        self._queue: Deque[Tuple[str, int, int, float]] = deque()
+        self._queued: Set[str] = set()
+        self._in_flight: Dict[Future, Tuple[str, int, int, float]] = {}
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {"processed": 0, "failed": 0}
+        self._index = 0
+        self._start = time.monotonic()
+        self._stopping = False
+
+    def _is_candidate(self, path: str) -> bool:
+        name = os.path.basename(path)
+        if name.startswith(".") or os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+            return False
+        return not any(os.path.abspath(path).startswith(excluded + os.sep) for excluded in self._exclude)
+
+    def _scan(self) -> List[str]:
+        """List every candidate image under the watched directory."""
+        paths = []
+        directories = [self.directory]
+        while directories:
+            directory = directories.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if (self.recursive and not entry.name.startswith(".")
+                                    and os.path.abspath(entry.path) not in self._exclude):
+                                directories.append(entry.path)
+                        elif self._is_candidate(entry.path):
+                            paths.append(entry.path)
+            except OSError:
+                continue  # removed while scanning
+        return paths
+
+    def _observe(self, path: str, now: float) -> None:
+        """Start or restart the settle timer of a new or changed file."""
+        if path in self._queued or not self._is_candidate(path):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._settling.pop(path, None)
+            return
+        if stat.st_size == 0 or self.state.is_current(path, stat.st_size, stat.st_mtime_ns):
+            self._settling.pop(path, None)
+            return
+        previous = self._settling.get(path)
+        if previous is None:
+            self._settling[path] = (stat.st_size, stat.st_mtime_ns, now, now)
+        elif previous[:2] != (stat.st_size, stat.st_mtime_ns):
+            self._settling[path] = (stat.st_size, stat.st_mtime_ns, now, previous[3])
+
+    def _promote_settled(self, now: float) -> None:
+        """Queue files that have stopped changing; restart the timer of those that have not."""
+        for path, (size, mtime_ns, since, first_seen) in list(self._settling.items()):
+            if now - since < self.settle:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._settling[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._settling[path] = (stat.st_size, stat.st_mtime_ns, now, first_seen)
+                continue
+            del self._settling[path]
+            self._queue.append((path, size, mtime_ns, first_seen))
+            self._queued.add(path)
+
+    def _submit(self, executor: ProcessPoolExecutor) -> None:
+        while self._queue and len(self._in_flight) < self.max_in_flight:
+            path, size, mtime_ns, first_seen = self._queue.popleft()
+            root = self.directory if self.recursive else None
+            job = {"index": self._index, "input": path,
+                   "outputs": resize_targets(path, self.sizes, self.output_dir, root, self.output_format)}
+            self._index += 1
+            future = executor.submit(run_resize_job, job, self.quality, False, True, True, self.profile)
+            self._in_flight[future] = (path, size, mtime_ns, first_seen)
+
+    def _collect(self, timeout: float) -> None:
+        """Record jobs that finish within timeout seconds."""
+        if not self._in_flight:
+            return
+        done, _ = wait(self._in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, size, mtime_ns, first_seen = self._in_flight.pop(future)
+            self._queued.discard(path)
+            try:
+                record = future.result()
+                self.state.record(path, size, mtime_ns, record["status"], record.get("error"),
+                                  record.get("seconds"))
+            except Exception as e:
+                # The worker died (e.g. killed for memory or interrupted); not recorded, so a
+                # restarted watcher tries again
+                record = {"input": path, "status": "error", "error": f"Worker failed: {str(e)}"}
+            latency = time.monotonic() - first_seen
+            record["latency_seconds"] = round(latency, 6)
+            self._latencies.append(latency)
+            self._counts["processed" if record["status"] == "ok" else "failed"] += 1
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+            if not self._stopping:
+                self._observe(path, time.monotonic())  # it may have changed while it was resized
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return the current queue depth, throughput and latency.
+
+        Returns:
+            Dictionary with the files settling, queued and in flight, counts of
+            processed and failed files since start, the
+            monitor in use, uptime, and latency percentiles (seconds from
+            detection to finished outputs) over the last LATENCY_WINDOW jobs
+        """
+        latencies = sorted(self._latencies)
+        latency = None
+        if latencies:
+            latency = {"p50": round(statistics.median(latencies), 3),
+                       "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                       "max": round(latencies[-1], 3)}
+        return {"monitor": self.monitor.name, "uptime_seconds": round(time.monotonic() - self._start, 3),
+                "settling": len(self._settling), "queued": len(self._queue), "in_flight": len(self._in_flight),
+                **self._counts, "latency_seconds": latency}
+
+    def _report(self) -> None:
+        metrics = self.metrics()
+        if self.progress:
+            latency = metrics["latency_seconds"]
+            print(f"Watching {self.directory}: {metrics['settling']} settling, {metrics['queued']} queued, "
+                  f"{metrics['in_flight']} in flight; {metrics['processed']} resized, {metrics['failed']} failed"
+                  + (f"; latency p50 {latency['p50']:.2f}s p95 {latency['p95']:.2f}s" if latency else ""),
+                  file=sys.stderr)
+        if self.metrics_path:
+            temporary = f"{self.metrics_path}.{os.getpid()}.tmp"
+            with open(temporary, "w") as f:
+                json.dump(metrics, f, indent=2)
+            os.replace(temporary, self.metrics_path)
+
+    def stop(self, *_) -> None:
+        """Stop watching once the jobs in flight have finished (also a signal handler)."""
+        self._stopping = True
+
+    def run(self, once: bool = False) -> Dict[str, Any]:
+        """
+        Watch and resize until stopped.
+
+        Args:
+            once: Resize what is in the directory now and return once it is done
+
+        Returns:
+            The final metrics (see metrics)
+        """
+        print(f"Watching {self.directory} with {self.monitor.name}, writing to {self.output_dir}", file=sys.stderr)
+        last_report = time.monotonic()
+        changed: Optional[Set[str]] = None  # start with a full scan
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_restore_default_signals) as executor:
+            try:
+                while not self._stopping:
+                    now = time.monotonic()
+                    paths = self._scan() if changed is None else changed
+                    for path in paths:
+                        self._observe(path, now)
+                    self._promote_settled(now)
+                    self._submit(executor)
+
+                    if once and not (self._settling or self._queue or self._in_flight):
+                        break
+                    if now - last_report >= REPORT_INTERVAL:
+                        self._report()
+                        last_report = now
+
+                    # Wake up for the next settled file, finished job or metrics line
+                    timeout = REPORT_INTERVAL - (now - last_report)
+                    if self._settling:
+                        next_settled = min(since for _, _, since, _ in self._settling.values()) + self.settle
+                        timeout = min(timeout, max(next_settled - now, 0.0))
+                    if self._in_flight:
+                        self._collect(min(timeout, COLLECT_INTERVAL))
+                        timeout = 0.0
+                    changed = self.monitor.wait(timeout)
+                    if once and changed is None:
+                        changed = set()  # nothing new is expected; only finish what was found
+            except KeyboardInterrupt:
+                print("Stopping; finishing images in flight", file=sys.stderr)
+            self._queue.clear()
+            while self._in_flight:
+                self._collect(None)
+        self._report()
+        self.monitor.close()
+        self.state.close()
+        return self.metrics()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the watcher's argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="image-watcher",
+        description="Resize images as they arrive in a directory. "
+                    "Writes one JSON result line per image to stdout."
+    )
+    parser.add_argument("--input", "-i", required=True, help="Directory to watch")
+    parser.add_argument("--output", "-o", default=DEFAULT_OUTPUT_DIR,
+                        help=f"Output directory (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--size", "-s", action="append", required=True,
+                        help="Output size: 50%%, 800x600 (fit inside), 800x, x600 or a file size "
+                             "such as 150kb (can be repeated)")
+    parser.add_argument("--exact", action="store_true",
+                        help="Stretch to WIDTHxHEIGHT instead of keeping the aspect ratio")
+    parser.add_argument("--format", help="Output format extension, e.g. jpg, webp or avif (default: same as input)")
+    parser.add_argument("--profile", choices=sorted(ENCODER_PROFILES), default=DEFAULT_PROFILE,
+                        help="Encoder settings: web (default), quality, small or fast")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP/AVIF quality instead of the profile's")
+    parser.add_argument("--recursive", "-r", action="store_true", help="Also watch subdirectories")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help=f"Seconds a file must stay unchanged before it is resized "
+                             f"(default: {DEFAULT_SETTLE_SECONDS:g})")
+    parser.add_argument("--poll", action="store_true", help="Rescan the directory instead of using inotify")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"Seconds between rescans when polling (default: {DEFAULT_POLL_INTERVAL:g})")
+    parser.add_argument("--state", help=f"State database (default: {DEFAULT_STATE_FILE} in the output directory)")
+    parser.add_argument("--metrics", help="JSON file to keep up to date with queue depth and latency")
+    parser.add_argument("--once", action="store_true",
+                        help="Resize what is in the directory now and exit instead of watching")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Do not report metrics to stderr")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the watcher from the command line.
+
+    Args:
+        argv: Command-line arguments (defaults to sys.argv[1:])
+
+    Returns:
+        Process exit code: 0 unless an image failed in --once mode
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        sizes = [parse_size(spec, maintain_aspect=not args.exact) for spec in args.size]
+    except ValueError as e:
+        parser.error(str(e))
+    if len({size.label for size in sizes}) != len(sizes):
+        parser.error("sizes must be distinct")
+
+    try:
+        watcher = FolderWatcher(args.input, sizes, args.output, output_format=args.format,
+                                recursive=args.recursive, workers=args.workers, quality=args.quality,
+                                profile=args.profile, settle=args.settle, poll=args.poll,
+                                poll_interval=args.poll_interval, state_path=args.state,
+                                metrics_path=args.metrics, progress=not args.quiet)
+    except ValueError as e:
+        parser.error(str(e))
+    signal.signal(signal.SIGTERM, watcher.stop)
+    metrics = watcher.run(once=args.once)
+    return 1 if args.once and metrics["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())